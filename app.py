@@ -1,7 +1,11 @@
 import streamlit as st
-from modules import image_generator, document_generator, state_manager
+from modules import state_manager, image_cache, model_client, request_scheduler, job_engine, stream_renderer, history_view, context_builder, prompts, image_matcher, asset_store, export_assets, metrics, resumable_stream, model_router
 import time
+import os
+import hmac
 from google.api_core import exceptions
+# Operator token: process-wide panels (Memory, Metrics) are shown only when the URL carries ?admin=<token>
+ADMIN_TOKEN = os.environ.get("GRANT_ARCHITECT_ADMIN_TOKEN", "")
 # Page Configuration
 st.set_page_config(
     page_title="AI Grant Architect",
@@ -9,58 +13,13 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-# --- MASTER AI PERSONA SYSTEM PROMPT ---
-SYSTEM_PROMPT = """
-# 🧠 MASTER AI PERSONA: The High-Stakes Business Plan & Grant Architect
-**Role:** You are a world-class Professional Business Proposal & Grant Plan Consultant. You have previously served as the Chairman of a grant-giving organization, giving you "insider" knowledge of what funders require. You have helped clients secure over $750M in funding.
-**The Objective:**
-Your goal is to guide the user through a consultation to produce a **comprehensive, award-winning Business Plan** that strictly follows the provided "Business Plan Template" structure.
-**CRITICAL CONSTRAINTS:**
-1.  **Volume:** The final Business Plan must be a **MINIMUM of 60 pages**. There is no upper limit. If the user provides extensive details, the plan should expand accordingly to 80, 100, or more pages. You must elaborate, expound, and provide deep market analysis to ensure this volume is met.
-2.  **Format:** The final output MUST be provided as a **downloadable .docx file**. You will use your Code Interpreter / Data Analysis tool to write the content into a Word document.
-3.  **Sequencing:** You must complete the Business Plan **first**. Only after the user has downloaded, reviewed, and approved the .docx file will you proceed to the Pitch Deck phase.
----
-### 📚 THE MANDATED BUSINESS PLAN STRUCTURE
-You must ensure the final output covers every single section below. To meet the 60+ page requirement, you must generate extensive content for each:
-1.  **Cover Page:** Business Name, Contact Info, Logo placeholder, Brand Slogan.
-2.  **Executive Summary:** A snapshot of the core essence, business goals, investment proposition (Funding Amount), and impact/returns.
-3.  **Introduction:** Overview, Stage of Business (Idea/Market Entry/Growth), and Progress to date.
-4.  **Company Description:** History, Legal Structure, Location/Facilities, Vision (inspiring & timed), Mission, and SMART Objectives.
-5.  **The Product & Service:** Product Line, R&D plans, Production Process, Value Proposition, and IP/Trademarks.
-6.  **Market Research:** Industry Background (Trends/Players), Market Analysis (Size/Growth), Target Market/Segmentation, Competitive Analysis (SWOT/PESTLE), and Regulatory Environment. *Note: This section requires significant expansion with simulated or real data to add bulk and value.*
-7.  **Organization and Management:** Org Structure (Organogram), Management Team & Skills, HR Plan (Hiring/Training).
-8.  **Marketing and Sales Strategy:** Marketing Plan, Sales Strategy/Tactics, Pricing Strategy, Advertising/Promotion, Customer Service, Unit Economics (CAC/LTV).
-9.  **Operational Plan:** Key Processes, Location/Tech requirements, Supply Chain, Quality Control, Risk Management, Scalability.
-10. **Funding Request:** Requirements, Future Needs, Founder’s Equity, Use of Funds (Budget), Expected Outcomes (Impact), Exit/Sustainability Strategy.
-11. **Financial Projections:** 3-5 Year Revenue Forecast, Expense Forecast, P&L Statement, Cash Flow, Balance Sheet, Break-even Analysis.
-12. **Implementation Plan:** Key Actions (3/6/12 months), Execution Monitoring, KPIs/Milestones.
-13. **Appendix:** Resumes, Permits/Licenses, Legal Docs, Product Photos, References.
----
-### ⚙️ OPERATIONAL PROTOCOL (The Consultation Process)
-You will conduct this consultation in **Phases**.
-* **Interaction Rule:** Ask **ONE** question at a time. Wait for the user's answer. Do not overwhelm the user.
-* **Tone:** Professional, empathetic, visionary, and thorough.
-#### 🗓️ PHASE 1: The Deep-Dive Discovery (Meetings 1-3)
-* **Meeting 1 (Foundation):** Establish the Business Name, Legal Structure, Vision, Mission, and **Specific Grant/Funding Details** (Amount, Organization, Purpose).
-* **Meeting 2 (Strategy & Operations):** Deep dive into the "Market Research," "Operational Plan," and "Marketing Strategy." *Ask probing questions to gather enough detail to write 10-15 pages for this section alone.*
-* **Meeting 3 (Financials & Logic):** Solidify the Budget (based on the Funding Amount), Revenue Projections, and Implementation Timeline.
-#### 🗓️ PHASE 2: The Business Plan Generation (Min 60 Pages)
-* Once the meetings are done, you will compile the content.
-* You will use **Python/Code Interpreter** to generate a **.docx file** containing the full plan.
-* **Formatting:** Use professional headers, clear tables for financials, and standard business formatting.
-* **Check:** Ask the user to download and review. If they need changes, revise the .docx file.
-#### 🗓️ PHASE 3: The Pitch Deck (Post-Approval)
-* **Start Condition:** ONLY begin this phase after the user says the Business Plan .docx is approved.
-* **Process:** Initiate a new mini-discovery for the deck. Ask about:
-    1.  Visual Style (Corporate, Creative, Minimalist).
-    2.  Key focus areas for the presentation (Team vs. Product vs. Financials).
-* **Generation:** Generate the Pitch Deck content (Slide by Slide) and offer it as a **downloadable .pptx file** (using Python) or a PDF.
-"""
+# Prometheus endpoint / metrics file, if configured (once per process)
+metrics.start_exporters()
 # Session State Initialization
 if 'plan_generated' not in st.session_state:
     st.session_state['plan_generated'] = False
-if 'generated_plan_text' not in st.session_state:
-    st.session_state['generated_plan_text'] = ""
+if 'plan_asset_id' not in st.session_state:
+    st.session_state['plan_asset_id'] = None # Plan text is kept in the asset store
 if 'generated_images' not in st.session_state:
     st.session_state['generated_images'] = {}
     # Load Saved Session
@@ -72,13 +31,21 @@ if 'generated_images' not in st.session_state:
             st.session_state['messages'] = [
                 {"role": "assistant", "content": "Hello. I am your Professional Consultant. I acknowledge the strict 60-page minimum requirement. Let's begin Meeting 1. What is the proposed Business Name and the specific nature of your business?"}
             ]
+def is_admin():
+    """True if this visitor opened the app with the operator token (never when GRANT_ARCHITECT_ADMIN_TOKEN is unset)."""
+    token = st.query_params.get("admin", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
 def main():
     st.title("AI Grant Architect")
     st.subheader("Your AI-Powered Business Plan & Grant Consultant")
     
     # --- API Key Management ---
     api_key = None
-    if "GOOGLE_API_KEY" in st.secrets:
+    if model_client.is_offline():
+        # Local stand-in backend needs no credentials
+        api_key = "offline"
+    elif "GOOGLE_API_KEY" in st.secrets:
         api_key = st.secrets["GOOGLE_API_KEY"]
     else:
         # Fallback for when running locally without secrets.toml or if specific key is desired
@@ -93,13 +60,7 @@ def main():
     @st.cache_data(ttl=3600)
     def get_available_models(api_key):
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-            models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    models.append(m.name)
-            return models
+            return model_client.get_client(api_key).list_models()
         except Exception as e:
             return ["models/gemini-1.5-flash", "models/gemini-1.5-pro"] # Fallback
     available_models = get_available_models(api_key) if api_key else ["models/gemini-1.5-flash"]
@@ -130,10 +91,120 @@ def main():
         
         if st.button("Check My Access"):
              st.write(available_models)
+        # Latency-aware routing: requests go to whichever model of the chosen
+        # family is answering fastest, falling back when one fails or is rate-limited
+        with st.expander("Model Routing"):
+            family_models = model_router.family_members(selected_model, available_models)
+            auto_route = st.checkbox(
+                f"Route within the {model_router.model_family(selected_model)} family",
+                value=True,
+                key="auto_route",
+                help="Sends each chat turn to the fastest healthy model of this family: " + ", ".join(family_models)
+            )
+            st.checkbox(
+                "Hedge slow first tokens",
+                value=model_router.HEDGE_REQUESTS,
+                key="hedge_requests",
+                help="If the first token is later than usual (p95), sends a second request and keeps whichever answers first."
+            )
+            router_stats = model_router.get_router().stats()
+            if router_stats:
+                st.dataframe(
+                    [
+                        {
+                            "model": row["model"].split("/")[-1],
+                            "requests": row["requests"],
+                            "p50 s": round(row["p50"], 2) if row["p50"] is not None else None,
+                            "p95 s": round(row["p95"], 2) if row["p95"] is not None else None,
+                            "errors": f"{row['error_rate']:.0%}",
+                            "cooldown s": round(row["cooldown"])
+                        }
+                        for row in router_stats
+                    ],
+                    hide_index=True
+                )
+        st.session_state['approved_models'] = family_models if auto_route else [selected_model]
+        # Image cache effectiveness
+        with st.expander("Image Cache"):
+            cache_stats = image_cache.get_default_cache().stats()
+            st.caption(
+                f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · "
+                f"Evictions: {cache_stats['evictions']} · Hit rate: {cache_stats['hit_rate']:.0%}"
+            )
+            st.caption(f"{cache_stats['entries']} images, {cache_stats['size_bytes'] / (1024 * 1024):.1f} MB on disk")
+        # Decoded images and plan text held in memory, per session and for this process, and their blobs on disk
+        # (operator only, like Metrics: these cover every visitor of the process)
+        admin = is_admin()
+        if admin:
+            with st.expander("Memory"):
+                asset_stats = asset_store.get_store().stats()
+                session_bytes = asset_stats["sessions"].get(state_manager.get_session_id(), {}).get("resident_bytes", 0)
+                st.caption(
+                    f"This session: {session_bytes / (1024 * 1024):.1f} of {asset_stats['session_budget'] / (1024 * 1024):.0f} MB · "
+                    f"Process: {asset_stats['resident_bytes'] / (1024 * 1024):.1f} of {asset_stats['process_budget'] / (1024 * 1024):.0f} MB"
+                )
+                st.caption(f"Loads: {asset_stats['loads']} · Hits: {asset_stats['hits']} · Spilled: {asset_stats['spills']}")
+                st.caption(
+                    f"Disk: {asset_stats['disk_entries']} assets, {asset_stats['disk_bytes'] / (1024 * 1024):.1f} of "
+                    f"{asset_stats['disk_budget'] / (1024 * 1024):.0f} MB · Evicted: {asset_stats['evictions']}"
+                )
+                if asset_stats["sessions"]:
+                    # Sessions are listed by size alone; their IDs restore their plans and are never shown
+                    st.dataframe(
+                        [
+                            {"MB": round(row["resident_bytes"] / (1024 * 1024), 1), "assets": row["assets"]}
+                            for row in sorted(asset_stats["sessions"].values(), key=lambda row: -row["resident_bytes"])
+                        ],
+                        hide_index=True
+                    )
+        # Shared request scheduler (rate limits across all sessions in this process)
+        with st.expander("Request Queue"):
+            scheduler_stats = request_scheduler.get_scheduler().stats()
+            st.caption(
+                f"Queued: {scheduler_stats['queue_depth']['interactive']} chat · "
+                f"{scheduler_stats['queue_depth']['batch']} batch (peak {scheduler_stats['max_queue_depth']})"
+            )
+            st.caption(
+                f"429s: {scheduler_stats['rate_limited']} · Retries: {scheduler_stats['retries']} · "
+                f"Failed: {scheduler_stats['failed']}"
+            )
+        # Live latency of each pipeline stage in this process (also exported for Prometheus)
+        if admin:
+            with st.expander("Metrics"):
+                metric_rows = metrics.snapshot()
+                timings = [row for row in metric_rows if row["kind"] == "histogram" and row["count"]]
+                if timings:
+                    st.dataframe(
+                        [
+                            {
+                                "stage": row["name"].replace("grant_architect_", ""),
+                                "count": row["count"],
+                                "p50": round(row["p50"], 3),
+                                "p95": round(row["p95"], 3)
+                            }
+                            for row in timings
+                        ],
+                        hide_index=True
+                    )
+                    st.caption("Seconds, except tokens_per_second; percentiles over recent calls.")
+                else:
+                    st.caption("No timings recorded yet.")
+                counts = [row for row in metric_rows if row["kind"] == "counter" and row["value"]]
+                if counts:
+                    st.caption(" · ".join(f"{row['name'].replace('grant_architect_', '')}: {row['value']:g}" for row in counts))
+        # Size of the last chat request after context packing
+        if 'context_report' in st.session_state:
+            context_report = st.session_state['context_report']
+            st.caption(
+                f"Last prompt: ~{context_report['prompt_tokens']:,} tokens "
+                f"({context_report['messages_included']} recent messages, "
+                f"{context_report['messages_summarised']} summarised)"
+            )
         # Reset Conversation Button
         st.markdown("---")
         if st.button("Reset Conversation", type="primary"):
             state_manager.clear_session()
+            history_view.reset()
             st.rerun()
     # Sidebar: Navigation & Design Studio
     with st.sidebar:
@@ -172,16 +243,254 @@ def main():
             )
         else:
             st.info("Complete the consultation phase to unlock the Design Studio.")
+    # Background job status. The fragments rerun on a timer only while a job is
+    # active, so polling never blocks or repeats the rest of the page.
+    def job_poll_interval(kind):
+        job = job_engine.get_engine().latest(state_manager.get_session_id(), kind)
+        return 1.0 if job and job["status"] in job_engine.ACTIVE_STATUSES else None
+    
+    def render_job_progress(job, label):
+        st.progress(job["progress"], text=job["message"] or f"{label} queued...")
+        if st.button("Cancel", key=f"cancel_{job['kind']}"):
+            job_engine.get_engine().cancel(job["job_id"])
+    
+    def render_plan_job():
+        job = job_engine.get_engine().latest(state_manager.get_session_id(), "plan")
+        if (job and job["status"] in job_engine.FINISHED_STATUSES
+                and st.session_state.get('plan_job_id') != job_engine.run_id(job)):
+            # Adopt the finished plan once; plan_job_id is persisted so a refresh doesn't re-apply it
+            state_manager.set_plan_text(job_engine.load_plan_result(job))
+            st.session_state['plan_generated'] = True
+            st.session_state['plan_job_id'] = job_engine.run_id(job)
+            state_manager.save_session()
+        
+        @st.fragment(run_every=job_poll_interval("plan"))
+        def plan_job_status():
+            job = job_engine.get_engine().latest(state_manager.get_session_id(), "plan")
+            if not job:
+                return
+            if job["status"] in job_engine.ACTIVE_STATUSES:
+                render_job_progress(job, "Plan generation")
+                # Sections appear as they finish, in plan order
+                for section_name, section_text in job_engine.load_plan_sections(job):
+                    with st.expander(f"✅ {section_name}"):
+                        st.markdown(section_text)
+            elif job["status"] in job_engine.FINISHED_STATUSES:
+                if st.session_state.get('plan_job_id') != job_engine.run_id(job):
+                    # Finished since the last full run: rerun the page to adopt the plan
+                    st.rerun()
+                st.success("Business plan written. Open Review Plan to read it.")
+                if job["status"] == job_engine.STATUS_PARTIAL:
+                    st.warning(f"{job['message']}. Generate the plan again to retry them.")
+            elif job["status"] == job_engine.STATUS_FAILED:
+                st.error(f"Plan generation failed: {job['error']}")
+            elif job["status"] == job_engine.STATUS_CANCELLED:
+                st.info("Plan generation was cancelled.")
+        plan_job_status()
+    
+    def render_visuals_job():
+        job = job_engine.get_engine().latest(state_manager.get_session_id(), "visuals")
+        if (job and job["status"] in job_engine.FINISHED_STATUSES
+                and st.session_state.get('visuals_job_id') != job_engine.run_id(job)):
+            # Load the finished job's images (also after a page refresh)
+            st.session_state['generated_images'] = job_engine.load_visuals_result(job)
+            st.session_state['visuals_job_id'] = job_engine.run_id(job)
+        
+        @st.fragment(run_every=job_poll_interval("visuals"))
+        def visuals_job_status():
+            job = job_engine.get_engine().latest(state_manager.get_session_id(), "visuals")
+            if not job:
+                return
+            if job["status"] in job_engine.ACTIVE_STATUSES:
+                render_job_progress(job, "Visual generation")
+            elif job["status"] in job_engine.FINISHED_STATUSES:
+                if st.session_state.get('visuals_job_id') != job_engine.run_id(job):
+                    # Finished since the last full run: rerun the page to show the gallery
+                    st.rerun()
+                st.success(f"Generated {len(st.session_state['generated_images'])} images!")
+                if job["status"] == job_engine.STATUS_PARTIAL:
+                    st.warning(f"{job['message']}. Generate the visuals again to retry them.")
+            elif job["status"] == job_engine.STATUS_FAILED:
+                st.error(f"Visual generation failed: {job['error']}")
+            elif job["status"] == job_engine.STATUS_CANCELLED:
+                st.info("Visual generation was cancelled.")
+        visuals_job_status()
+    
+    def render_export_job():
+        job = job_engine.get_engine().latest(state_manager.get_session_id(), "export")
+        if job and job["status"] == job_engine.STATUS_DONE:
+            st.session_state['export_job_id'] = job["job_id"]
+        
+        @st.fragment(run_every=job_poll_interval("export"))
+        def export_job_status():
+            job = job_engine.get_engine().latest(state_manager.get_session_id(), "export")
+            if not job:
+                return
+            if job["status"] in job_engine.ACTIVE_STATUSES:
+                render_job_progress(job, "Compilation")
+            elif job["status"] == job_engine.STATUS_DONE:
+                if st.session_state.get('export_job_id') != job["job_id"]:
+                    # Finished since the last full run: rerun the page so polling stops
+                    st.rerun()
+                downloads = [
+                    ("docx", "Business Plan (.docx)", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+                    ("pptx", "Pitch Deck (.pptx)", "application/vnd.openxmlformats-officedocument.presentationml.presentation")
+                ]
+                for column, (export_format, title, mime) in zip(st.columns(len(downloads)), downloads):
+                    path = job_engine.export_result_path(job, export_format)
+                    if not os.path.exists(path):
+                        continue
+                    with column:
+                        st.subheader(title)
+                        with open(path, "rb") as export_file:
+                            st.download_button(
+                                label=f"Download .{export_format}",
+                                data=export_file,
+                                file_name=job_engine.EXPORT_FILES[export_format],
+                                mime=mime,
+                                key=f"download_{export_format}"
+                            )
+            elif job["status"] == job_engine.STATUS_FAILED:
+                st.error(f"Compilation failed: {job['error']}")
+            elif job["status"] == job_engine.STATUS_CANCELLED:
+                st.info("Compilation was cancelled.")
+        export_job_status()
+    
     # Main Content Area
     if step == "Consultation":
         st.write("## 1. Consultation Phase")
         st.write("Chat with the AI to build your plan.")
-        # Display chat messages from history
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+        # Display the most recent chat messages; older turns load on demand
+        history_view.render_history(st.session_state.messages)
+
+        def reply_to_latest(message_placeholder, resume_turn=None):
+            """
+            Streams the assistant's reply to the latest user message.
+
+            The reply is checkpointed to the session as it arrives. Returns its
+            text, or None if the stream failed partway; the partial reply then
+            stays checkpointed so it can be resumed (pass it as resume_turn).
+            """
+            if not api_key:
+                message_placeholder.warning("Please provide an API Key to chat.")
+                return "Please provide an API Key to chat."
+            stream = None
+            try:
+                client = model_client.get_client(api_key)
+                
+                # Use selected model from session state (an interrupted reply continues on its own model)
+                current_model_name = st.session_state.get('selected_model', 'gemini-1.5-flash')
+                if resume_turn and resume_turn.get("model"):
+                    current_model_name = resume_turn["model"]
+                
+                # Prepare context for the model: recent turns within the token
+                # budget, older turns folded into a rolling summary
+                builder = context_builder.ContextBuilder(
+                    summarize=context_builder.model_summarizer(client, api_key, current_model_name)
+                )
+                system_instruction, chat_history, summary_state, context_report = builder.build(
+                    st.session_state.messages,
+                    st.session_state.get('context_summary'),
+                    system_prompt=prompts.SYSTEM_PROMPT
+                )
+                st.session_state['context_summary'] = summary_state
+                st.session_state['context_report'] = context_report
+                
+                # Generate response on the approved model the router expects to
+                # answer first. Each request it sends (fallbacks and hedges
+                # included) is rate-limited per key and per model it targets;
+                # the shared scheduler retries the turn on a 429 with backoff.
+                # The stream keeps what has arrived across failures: dropped
+                # connections and scheduler retries continue from it rather
+                # than starting over. The renderer refreshes the placeholder on
+                # a time/size budget instead of re-sending the whole reply per chunk.
+                resume_text = resume_turn["text"] if resume_turn else ""
+                routed_client = model_router.RoutedClient(
+                    client,
+                    st.session_state.get('approved_models') or [current_model_name],
+                    hedge=st.session_state.get('hedge_requests', model_router.HEDGE_REQUESTS),
+                    scheduler=request_scheduler.get_scheduler(),
+                    api_key=api_key
+                )
+                stream = resumable_stream.ResumableStream(
+                    routed_client,
+                    current_model_name,
+                    chat_history,
+                    system_instruction=system_instruction,
+                    text=resume_text,
+                    on_checkpoint=lambda text: state_manager.checkpoint_turn(text, routed_client.last_model or current_model_name)
+                )
+                request_started = time.monotonic() # Time-to-first-token includes queueing
+                renderer = stream_renderer.StreamRenderer(message_placeholder, started=None if resume_text else request_started)
+                renderer.write(resume_text)
+                def stream_reply():
+                    for text in stream.chunks():
+                        renderer.write(text)
+                    return renderer.finish()
+                
+                try:
+                    full_response = request_scheduler.get_scheduler().submit(
+                        stream_reply,
+                        api_key,
+                        current_model_name,
+                        priority=request_scheduler.PRIORITY_INTERACTIVE,
+                        acquire=False
+                    )
+                except Exception as e:
+                    if stream.text:
+                        return None # Interrupted partway; the checkpoint keeps what arrived
+                    # Check for 429 or ResourceExhausted
+                    if request_scheduler.is_rate_limit_error(e):
+                        full_response = "⚠️ System is currently overloaded (429). Please try again in a moment."
+                        message_placeholder.error(full_response)
+                    else:
+                        # Other errors (like 404 if model is invalid)
+                        raise e
+                
+                # The consultant signals the consultation is complete: write the
+                # plan section by section in the background
+                if prompts.PLAN_MARKER in full_response:
+                    job_engine.submit_plan_job(
+                        state_manager.get_session_id(),
+                        list(st.session_state.messages),
+                        st.session_state.get('context_summary'),
+                        api_key=api_key,
+                        model_name=current_model_name
+                    )
+            except Exception as e:
+                if stream is not None and stream.text:
+                    return None
+                full_response = f"I encountered an error: {str(e)}"
+                message_placeholder.error(full_response)
+            return full_response
+
+        # A reply cut off by a failed stream or a page reload: offer to resume it from its checkpoint
+        pending_turn = state_manager.get_pending_turn()
+        if pending_turn:
+            with st.chat_message("assistant"):
+                message_placeholder = st.empty()
+                message_placeholder.markdown(pending_turn["text"])
+                controls = st.empty()
+                with controls.container():
+                    st.caption("This reply was interrupted before it finished.")
+                    resume_col, keep_col = st.columns(2)
+                    resume = resume_col.button("Resume reply", key="resume_reply", disabled=not api_key)
+                    keep = keep_col.button("Keep as is", key="keep_reply")
+                if resume:
+                    controls.empty()
+                    full_response = reply_to_latest(message_placeholder, resume_turn=pending_turn)
+                    if full_response is not None:
+                        state_manager.finish_turn(full_response)
+                    st.rerun()
+                elif keep:
+                    state_manager.finish_turn(pending_turn["text"])
+                    st.rerun()
+
         # Accept user input
         if prompt := st.chat_input("Describe your business idea..."):
+            if pending_turn:
+                # Moving on settles the interrupted reply as it stands
+                state_manager.finish_turn(pending_turn["text"])
             # Add user message to chat history
             st.session_state.messages.append({"role": "user", "content": prompt})
             state_manager.save_session() # Auto-Save after user input
@@ -191,75 +500,28 @@ def main():
             # Display assistant response in chat message container
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
-                full_response = ""
-                
-                if api_key:
-                    try:
-                        import google.generativeai as genai
-                        genai.configure(api_key=api_key)
-                        
-                        # Use selected model from session state
-                        current_model_name = st.session_state.get('selected_model', 'gemini-1.5-flash')
-                        
-                        # Initialize Model
-                        model = genai.GenerativeModel(current_model_name, system_instruction=SYSTEM_PROMPT)
-                        
-                        # Prepare context for the model
-                        chat_history = []
-                        for msg in st.session_state.messages[-10:]: # Last 10 messages
-                            role = "user" if msg["role"] == "user" else "model"
-                            chat_history.append({"role": role, "parts": [msg["content"]]})
-                        
-                        # Generate response with Retry Logic
-                        max_retries = 3
-                        retry_delay = 5 # seconds
-                        
-                        for attempt in range(max_retries):
-                            try:
-                                response = model.generate_content(chat_history, stream=True)
-                                
-                                for chunk in response:
-                                    if chunk.text:
-                                        full_response += chunk.text
-                                        message_placeholder.markdown(full_response + "▌")
-                                # If successful, break the retry loop
-                                break
-                            except Exception as e:
-                                # Check for 429 or ResourceExhausted
-                                error_str = str(e)
-                                if "429" in error_str or "ResourceExhausted" in error_str:
-                                    if attempt < max_retries - 1:
-                                        wait_time = 2 ** (attempt + 1) # Exponential Backoff: 2, 4, 8...
-                                        time.sleep(wait_time)
-                                        continue
-                                    else:
-                                        full_response = "⚠️ System is currently overloaded (429). Please try again in partial moment."
-                                        message_placeholder.error(full_response)
-                                        break
-                                else:
-                                    # Other errors (like 404 if model is invalid)
-                                    raise e
-                        message_placeholder.markdown(full_response)
-                        
-                        # Check if the plan is ready (heuristic)
-                        if "BUSINESS PLAN GENERATED" in full_response:
-                             st.session_state['plan_generated'] = True
-                             # Extract plan text logic could go here
-                             st.session_state['generated_plan_text'] = full_response # Simplified for now
-                    except Exception as e:
-                        full_response = f"I encountered an error: {str(e)}"
-                        message_placeholder.error(full_response)
-                else:
-                    full_response = "Please provide an API Key to chat."
-                    message_placeholder.warning(full_response)
+                full_response = reply_to_latest(message_placeholder)
+            if full_response is None:
+                st.rerun() # Show the interrupted reply with its resume controls
             # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": full_response})
-            state_manager.save_session() # Auto-Save after AI response
+            state_manager.finish_turn(full_response) # Auto-Save after AI response
+        
+        # Plan generation: one request per mandated section, several at a time
+        if len(st.session_state.messages) > 1 and api_key:
+            if st.button("Generate Business Plan"):
+                job_engine.submit_plan_job(
+                    state_manager.get_session_id(),
+                    list(st.session_state.messages),
+                    st.session_state.get('context_summary'),
+                    api_key=api_key,
+                    model_name=st.session_state.get('selected_model', 'gemini-1.5-flash')
+                )
+        render_plan_job()
         
         # Temporary button to simulate plan generation for testing the UI
         if st.button("Simulate Plan Generation (Dev Only)"):
             st.session_state['plan_generated'] = True
-            st.session_state['generated_plan_text'] = """
+            state_manager.set_plan_text("""
 # Execution Summary
 This is the executive summary of the business plan.
 ## Mission Statement
@@ -270,41 +532,80 @@ To revolutionize the grant writing process.
 Our financial projections are robust.
 # Operational Plan
 We plan to operate globally.
-"""
+""")
             state_manager.save_session()
             st.rerun()
     elif step == "Review Plan":
         st.write("## 2. Review Your Plan")
         if st.session_state['plan_generated']:
             st.success("Plan Generated Successfully!")
-            st.text_area("Draft Plan", value=st.session_state['generated_plan_text'], height=300)
-            
+
+            # One section at a time: the heading index is built once per plan, only the
+            # selected section is sent to the browser, and edits are saved as section diffs
+            review_units = state_manager.get_plan_index()
+            plan_edits = st.session_state.get('plan_edits') or {}
+            st.caption(
+                f"{len(review_units)} sections · {sum(unit.words for unit in review_units):,} words generated · "
+                f"{len(plan_edits)} edited"
+            )
+            if st.session_state.get('review_section', 0) >= len(review_units):
+                st.session_state['review_section'] = 0 # A new plan with fewer sections
+
+            def move_section(step):
+                st.session_state['review_section'] = min(max(st.session_state.get('review_section', 0) + step, 0), len(review_units) - 1)
+
+            def section_label(number):
+                unit = review_units[number]
+                title = (unit.title or "(untitled)") if unit.level else "(before the first heading)"
+                edited = " · ✎ edited" if str(number) in plan_edits else ""
+                return f"{'—' * max(unit.level - 1, 0)} {title} · {unit.words:,} words{edited}".strip()
+
+            nav_prev, nav_select, nav_next = st.columns([1, 10, 1])
+            with nav_prev:
+                st.button("◀", key="review_prev", on_click=move_section, args=(-1,), help="Previous section")
+            with nav_select:
+                section_number = st.selectbox(
+                    "Section", range(len(review_units)), key="review_section",
+                    format_func=section_label, label_visibility="collapsed"
+                )
+            with nav_next:
+                st.button("▶", key="review_next", on_click=move_section, args=(1,), help="Next section")
+
+            section_key = f"review_text_{st.session_state['plan_asset_id']}_{section_number}"
+
+            def save_section(number, key):
+                state_manager.set_section_text(number, st.session_state[key])
+
+            def revert_section(number, key):
+                st.session_state.pop(key, None)
+                state_manager.revert_section(number)
+
+            st.text_area(
+                "Draft Plan", value=state_manager.get_section_text(section_number), height=400,
+                key=section_key, on_change=save_section, args=(section_number, section_key),
+                help="Edits are saved when you click away from the text box."
+            )
+            if state_manager.is_section_edited(section_number):
+                st.button("Revert to generated text", key="review_revert", on_click=revert_section,
+                          args=(section_number, section_key))
+
             # Button to trigger image generation from Design Studio settings
             st.markdown("### 🖼️ Visual Assets")
             if st.button("Generate Visual Assets"):
                 # Use current visual style from session state (via key='visual_style')
                 current_style = st.session_state.get("visual_style", "Photorealistic")
                 
-                # Progress bar
-                progress_bar = st.progress(0, text="Starting visual generation...")
-                
-                # Callback to update progress bar
-                def update_progress(p, text):
-                    progress_bar.progress(p, text=text)
-                
-                # Call the background function
-                with st.spinner("AI is analyzing your plan and creating images..."):
-                    images = image_generator.analyze_and_generate_visuals(
-                        st.session_state['generated_plan_text'],
-                        current_style,
-                        api_key=api_key,
-                        model_name=st.session_state.get('selected_model', 'gemini-1.5-flash'),
-                        progress_callback=update_progress
-                    )
-                
-                # Save to session state
-                st.session_state['generated_images'] = images
-                st.success(f"Generated {len(images)} images!")
+                # Runs in the background job engine; clicking again with the same
+                # inputs returns the existing job instead of starting another
+                job_engine.submit_visuals_job(
+                    state_manager.get_session_id(),
+                    state_manager.get_plan_text(),
+                    current_style,
+                    api_key=api_key,
+                    model_name=st.session_state.get('selected_model', 'gemini-1.5-flash')
+                )
+            
+            render_visuals_job()
             
             # Display generated images if they exist - GALLERY PREVIEW
             if st.session_state['generated_images']:
@@ -312,16 +613,54 @@ We plan to operate globally.
                 st.info("Review your generated assets before exporting.")
                 
                 # Create a grid layout for images
-                images_list = list(st.session_state['generated_images'].items())
+                generated_images = st.session_state['generated_images']
+                section_names = list(generated_images.keys())
+
+                @st.dialog("Full-size image", width="large")
+                def show_full_image(section_name):
+                    image = generated_images.get(section_name) # None once the asset store has evicted it
+                    if image is None:
+                        st.warning(f"{section_name}: this image is no longer stored. Generate the visuals again to restore it.")
+                        return
+                    st.image(image, caption=section_name, use_container_width=True)
+
+                # Where the exporter will put each image (cover, a '# ' heading, or nowhere),
+                # matched against the headings alone and again only when they or the images change
+                plan_headings = state_manager.get_plan_headings()
+                placement_key = (plan_headings, tuple(section_names))
+                cached_placement = st.session_state.get('_review_placement')
+                if not cached_placement or cached_placement[0] != placement_key:
+                    cached_placement = st.session_state['_review_placement'] = (placement_key, image_matcher.match_images(
+                        plan_headings, generated_images.keys()
+                    ))
+                placement_plan = cached_placement[1]
+                placed_under = {row["key"]: row["placement"] for row in image_matcher.placement_report(placement_plan)}
+                if placement_plan.unplaced:
+                    st.caption(f"{len(placement_plan.unplaced)} image(s) match no section heading and will not be exported.")
                 
                 # Display in rows of 3
-                for i in range(0, len(images_list), 3):
+                for i in range(0, len(section_names), 3):
                     cols = st.columns(3)
                     for j in range(3):
-                        if i + j < len(images_list):
-                            section_name, img_obj = images_list[i+j]
+                        if i + j < len(section_names):
+                            section_name = section_names[i+j]
                             with cols[j]:
-                                st.image(img_obj, caption=section_name, use_container_width=True)
+                                # Small JPEG preview; the full image is decoded only when opened
+                                if isinstance(generated_images, asset_store.ImageSet):
+                                    preview = generated_images.preview(section_name)
+                                else:
+                                    preview = generated_images[section_name]
+                                if preview is None:
+                                    st.warning(f"{section_name}: image could not be loaded. Generate the visuals again to restore it.")
+                                    continue
+                                st.image(
+                                    preview,
+                                    caption=f"{section_name} → {placed_under.get(section_name) or 'not placed'}",
+                                    width=export_assets.PREVIEW_SIZE,
+                                    output_format="JPEG"
+                                )
+                                if st.button("View full size", key=f"view_full_{i + j}"):
+                                    show_full_image(section_name)
         else:
             st.warning("No plan generated yet. Go to Consultation.")
     elif step == "Export":
@@ -329,34 +668,25 @@ We plan to operate globally.
         if st.session_state['plan_generated']:
             st.write("Ready to export.")
             
-            col1, col2 = st.columns(2)
+            if st.button("Compile Business Plan & Pitch Deck"):
+                # Gather inputs
+                business_name = "My Startup" # Placeholder or from session state if available
+                slogan = "Innovating the Future" 
+                
+                # One job compiles the .docx and .pptx side by side from a single parse
+                job_engine.submit_export_job(
+                    state_manager.get_session_id(),
+                    business_name=business_name,
+                    slogan=slogan,
+                    plan_text=state_manager.get_plan_text(),
+                    theme_color=st.session_state.get('theme_color', 'Corporate Blue'),
+                    generated_images=st.session_state.get('generated_images', {}),
+                    use_3d_assets=st.session_state.get('use_3d_assets', False),
+                    images_key=st.session_state.get('visuals_job_id'),
+                    font_style=st.session_state.get('font_style')
+                )
             
-            with col1:
-                st.subheader("Business Plan (.docx)")
-                if st.button("Compile & Download Business Plan"):
-                    # Gather inputs
-                    business_name = "My Startup" # Placeholder or from session state if available
-                    slogan = "Innovating the Future" 
-                    
-                    with st.spinner("Compiling document..."):
-                        docx_file = document_generator.generate_docx(
-                            business_name=business_name,
-                            slogan=slogan,
-                            plan_text=st.session_state['generated_plan_text'],
-                            theme_color=st.session_state.get('theme_color', 'Corporate Blue'),
-                            generated_images=st.session_state.get('generated_images', {}),
-                            use_3d_assets=st.session_state.get('use_3d_assets', False)
-                        )
-                        
-                    st.download_button(
-                        label="Download .docx",
-                        data=docx_file,
-                        file_name="Business_Plan.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-            with col2:
-                st.subheader("Pitch Deck (.pptx)")
-                st.button("Download .pptx", disabled=True, help="Coming in Phase 5")
+            render_export_job()
         else:
             st.warning("Generate a plan first.")
 if __name__ == "__main__":
@@ -0,0 +1,352 @@
+"""
+Headless batch mode: business plans for many clients without the Streamlit UI.
+
+Each client brief goes through the same pipeline as the app: section-parallel
+plan generation from the brief (standing in for the consultation), then
+analyze_and_generate_visuals, then .docx compilation. Model-bound stages of
+up to --concurrency clients run at once on a bounded asyncio pool (all model
+calls still share the request scheduler's rate limits, so set
+GRANT_ARCHITECT_RPM_PER_KEY / GRANT_ARCHITECT_RPM_PER_MODEL to your quota);
+documents compile on a pool of --processes worker processes, so a compile
+never holds up the next client's generation.
+
+Briefs are either a JSONL file (one object per line) or a directory of
+.json, .md and .txt files. Objects may set: id, business_name, slogan, brief
+(free text) or messages (a consultation transcript as {"role", "content"}
+dicts), visual_style, theme_color, font_style, use_3d_assets. A .md/.txt file
+is the brief text, with its file name as the ID.
+
+Results go to OUT/<client id>/ (plan.md, images/, Business_Plan.docx).
+OUT/manifest.json records each finished stage, so re-running the same command
+resumes where it stopped; a changed brief starts that client over, and a plan
+with failed sections has just those sections written again.
+
+Usage:
+    python batch.py BRIEFS [--out batch_output] [--concurrency 4] [--processes N] [--offline]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MANIFEST_NAME = "manifest.json"
+STAGES = ("plan", "visuals", "docx")
+DEFAULTS = {
+    "slogan": "Innovating the Future", # The app's cover-page slogan
+    "visual_style": "Photorealistic",
+    "theme_color": "Corporate Blue",
+    "font_style": None,
+    "use_3d_assets": False
+}
+
+# --- Briefs ---
+
+def _client_id(value):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", str(value)).strip("-") or "client"
+
+def load_briefs(path):
+    """
+    Reads client briefs from a JSONL file or a directory.
+
+    Returns:
+        list: Brief dicts with an "id" unique within the batch, in input order.
+    """
+    briefs = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            file_path = os.path.join(path, name)
+            if ext == ".json":
+                with open(file_path, "r", encoding="utf-8") as f:
+                    brief = json.load(f)
+            elif ext in (".md", ".txt"):
+                with open(file_path, "r", encoding="utf-8") as f:
+                    brief = {"brief": f.read()}
+            else:
+                continue
+            brief.setdefault("id", stem)
+            briefs.append(brief)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    brief = json.loads(line)
+                    brief.setdefault("id", f"brief-{number:04d}")
+                    briefs.append(brief)
+
+    seen = set()
+    for brief in briefs:
+        client_id = _client_id(brief["id"])
+        while client_id in seen:
+            client_id += "-1"
+        seen.add(client_id)
+        brief["id"] = client_id
+        brief.setdefault("business_name", brief["id"].replace("-", " ").title())
+        for field, default in DEFAULTS.items():
+            brief.setdefault(field, default)
+    return briefs
+
+def consultation_messages(brief):
+    """The brief as a consultation transcript for plan_engine."""
+    if brief.get("messages"):
+        return brief["messages"]
+    return [{"role": "user", "content": f"Business name: {brief['business_name']}\n\n{brief.get('brief', '')}"}]
+
+def _fingerprint(brief, model_name):
+    return hashlib.sha256(json.dumps([brief, model_name], sort_keys=True).encode("utf-8")).hexdigest()
+
+# --- Manifest ---
+
+class Manifest:
+    """
+    Per-client stage records in OUT/manifest.json, rewritten atomically after every change.
+
+    Only the event loop thread touches it, so it needs no lock.
+    """
+
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        self.clients = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.clients = json.load(f).get("clients", {})
+
+    def entry(self, brief, fingerprint):
+        """Returns the client's record, starting it over if the brief or model changed."""
+        entry = self.clients.get(brief["id"])
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            entry = self.clients[brief["id"]] = {"fingerprint": fingerprint, "stages": {}}
+        return entry
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"clients": self.clients}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+def _stage_done(entry, stage, client_dir):
+    """True if the stage's file exists and, for the plan, no section failed."""
+    record = entry["stages"].get(stage)
+    return bool(record and os.path.exists(os.path.join(client_dir, record["file"]))
+                and not record.get("failed_sections"))
+
+def _retry_sections(entry, client_dir):
+    """Sections of an existing plan to write again, or None if the whole plan is needed."""
+    record = entry["stages"].get("plan")
+    if record and record.get("failed_sections") and os.path.exists(os.path.join(client_dir, record["file"])):
+        return record["failed_sections"]
+    return None
+
+# --- Stages ---
+
+_SECTION_HEADING = re.compile(r"^# (.+)$", re.MULTILINE)
+
+def _section_texts(plan_text):
+    """Section name -> body of a plan written by plan_engine.assemble_plan (bodies hold no '# ' headings)."""
+    parts = _SECTION_HEADING.split(plan_text)
+    return {name.strip(): body.strip() for name, body in zip(parts[1::2], parts[2::2])}
+
+def write_plan(brief, client_dir, api_key, model_name, retry_sections=None):
+    """
+    Generates the plan (network-bound, runs in a thread). Returns (file, sections that failed).
+
+    With retry_sections, only those sections are written again and replace
+    their placeholders in the existing plan.md.
+    """
+    from modules import plan_engine, prompts
+    path = os.path.join(client_dir, "plan.md")
+    plan = plan_engine.generate_plan(consultation_messages(brief), api_key, model_name, only=retry_sections)
+    plan_text = plan.text
+    if retry_sections:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = _section_texts(f.read())
+        texts.update((result.name, result.text) for result in plan.sections)
+        plan_text = plan_engine.assemble_plan(prompts.PLAN_SECTIONS, [texts.get(s["name"]) for s in prompts.PLAN_SECTIONS])
+    _write_text(path, plan_text)
+    return "plan.md", [result.name for result in plan.sections if result.status != plan_engine.SECTION_DONE]
+
+def make_visuals(brief, client_dir, api_key, model_name):
+    """Generates the plan's images (network-bound, runs in a thread) and saves them as PNGs."""
+    from modules import image_generator
+    with open(os.path.join(client_dir, "plan.md"), "r", encoding="utf-8") as f:
+        plan_text = f.read()
+    images = image_generator.analyze_and_generate_visuals(plan_text, brief["visual_style"], api_key=api_key, model_name=model_name)
+    images_dir = os.path.join(client_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    manifest = []
+    for index, (section_name, img) in enumerate(images.items()):
+        filename = f"{index:03d}.png"
+        img.save(os.path.join(images_dir, filename), format="PNG")
+        manifest.append({"section": section_name, "file": filename})
+    _write_text(os.path.join(images_dir, "manifest.json"), json.dumps(manifest))
+    return os.path.join("images", "manifest.json"), len(manifest)
+
+def compile_docx(brief, client_dir):
+    """Compiles the .docx (CPU-bound, runs in a worker process). Returns compile seconds."""
+    from PIL import Image
+    from modules import document_generator
+    with open(os.path.join(client_dir, "plan.md"), "r", encoding="utf-8") as f:
+        plan_text = f.read()
+    images = {}
+    images_manifest = os.path.join(client_dir, "images", "manifest.json")
+    if os.path.exists(images_manifest):
+        with open(images_manifest, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                with Image.open(os.path.join(client_dir, "images", entry["file"])) as img:
+                    img.load() # Decoded now, so the file is closed when the block ends
+                images[entry["section"]] = img
+    start = time.perf_counter()
+    path = os.path.join(client_dir, "Business_Plan.docx")
+    document_generator.write_docx(
+        path + ".tmp",
+        business_name=brief["business_name"],
+        slogan=brief["slogan"],
+        plan_text=plan_text,
+        theme_color=brief["theme_color"],
+        generated_images=images,
+        use_3d_assets=brief["use_3d_assets"],
+        font_style=brief["font_style"]
+    )
+    os.replace(path + ".tmp", path)
+    return time.perf_counter() - start
+
+def _write_text(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# --- Runner ---
+
+class BatchRun:
+    """Runs the pipeline for every brief and keeps the manifest and the run's timings."""
+
+    def __init__(self, briefs, out_dir, api_key, model_name, concurrency, processes, visuals=True):
+        self.briefs = briefs
+        self.out_dir = out_dir
+        self.api_key = api_key
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.processes = processes
+        self.visuals = visuals
+        self.manifest = Manifest(out_dir)
+        self.stage_seconds = {stage: [] for stage in STAGES}
+        self.completed = 0
+        self.skipped = 0
+        self.failed = []
+
+    def _log(self, brief, message):
+        done = self.completed + self.skipped + len(self.failed)
+        print(f"[{done}/{len(self.briefs)}] {brief['id']}: {message}", flush=True)
+
+    async def _stage(self, stage, run):
+        start = time.perf_counter()
+        result = await run
+        seconds = time.perf_counter() - start
+        self.stage_seconds[stage].append(seconds)
+        return result, seconds
+
+    async def run_client(self, brief, network, processes):
+        client_dir = os.path.join(self.out_dir, brief["id"])
+        os.makedirs(client_dir, exist_ok=True)
+        entry = self.manifest.entry(brief, _fingerprint(brief, self.model_name))
+        if all(_stage_done(entry, stage, client_dir) for stage in STAGES if self.visuals or stage != "visuals"):
+            self.skipped += 1
+            self._log(brief, "already done")
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            async with network:
+                if not _stage_done(entry, "plan", client_dir):
+                    retry_sections = _retry_sections(entry, client_dir)
+                    entry["stages"].pop("visuals", None) # A new plan needs new visuals
+                    (filename, failed_sections), seconds = await self._stage("plan", asyncio.to_thread(
+                        write_plan, brief, client_dir, self.api_key, self.model_name, retry_sections
+                    ))
+                    entry["stages"]["plan"] = {"file": filename, "seconds": round(seconds, 2), "failed_sections": failed_sections}
+                    entry["stages"].pop("docx", None)
+                    self.manifest.save()
+                    written = f"{len(retry_sections)} failed section(s) rewritten" if retry_sections else "plan written"
+                    self._log(brief, f"{written} in {seconds:.1f}s")
+                    if failed_sections:
+                        self._log(brief, f"{len(failed_sections)} section(s) failed and will be retried on the next run")
+                if self.visuals and not _stage_done(entry, "visuals", client_dir):
+                    (filename, count), seconds = await self._stage("visuals", asyncio.to_thread(
+                        make_visuals, brief, client_dir, self.api_key, self.model_name
+                    ))
+                    entry["stages"]["visuals"] = {"file": filename, "seconds": round(seconds, 2), "images": count}
+                    entry["stages"].pop("docx", None)
+                    self.manifest.save()
+                    self._log(brief, f"{count} visuals in {seconds:.1f}s")
+            # Compiling needs no model calls, so it releases the network slot for the next client
+            compile_seconds, seconds = await self._stage("docx", loop.run_in_executor(
+                processes, compile_docx, brief, client_dir
+            ))
+            entry["stages"]["docx"] = {"file": "Business_Plan.docx", "seconds": round(seconds, 2), "compile_seconds": round(compile_seconds, 2)}
+            entry.pop("error", None)
+            self.manifest.save()
+            self.completed += 1
+            self._log(brief, f"document compiled in {compile_seconds:.1f}s ({seconds:.1f}s with queueing)")
+        except Exception as e:
+            entry["error"] = str(e)
+            self.manifest.save()
+            self.failed.append(brief["id"])
+            self._log(brief, f"failed: {e}")
+
+    async def run(self):
+        network = asyncio.Semaphore(self.concurrency)
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+        # Spawned (not forked) workers: the parent runs scheduler and generation threads
+        with ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn")) as processes:
+            await asyncio.gather(*(self.run_client(brief, network, processes) for brief in self.briefs))
+
+    def summary(self, elapsed):
+        """Returns the throughput summary printed at the end of a run."""
+        lines = [
+            f"Plans: {self.completed} completed, {self.skipped} already done, {len(self.failed)} failed "
+            f"in {elapsed:.1f}s -> {self.completed / elapsed * 3600 if elapsed else 0:.1f} plans/hour"
+        ]
+        for stage, seconds in self.stage_seconds.items():
+            if seconds:
+                lines.append(f"  {stage:<8} {len(seconds):>4} runs, mean {sum(seconds) / len(seconds):.1f}s, total {sum(seconds):.1f}s")
+        if self.failed:
+            lines.append(f"Failed: {', '.join(self.failed)} (see {self.manifest.path})")
+        return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("briefs", help="JSONL file or directory of client briefs")
+    parser.add_argument("--out", default="batch_output", help="output directory (also holds the manifest)")
+    parser.add_argument("--concurrency", type=int, default=4, help="clients in model-bound stages at once")
+    parser.add_argument("--processes", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)), help="document compile processes")
+    parser.add_argument("--model", help="text model (default: models/gemini-1.5-flash, or the stand-in's with --offline)")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Google API key (default: $GOOGLE_API_KEY)")
+    parser.add_argument("--offline", action="store_true", help="use the offline stand-in model backend (GRANT_ARCHITECT_OFFLINE_* settings apply)")
+    parser.add_argument("--no-visuals", action="store_true", help="skip image generation")
+    args = parser.parse_args(argv)
+
+    from modules import model_client
+    if args.offline:
+        model_client.set_offline_client(model_client.OfflineClient.from_env())
+    api_key = "offline" if model_client.is_offline() else args.api_key
+    if not api_key:
+        parser.error("an API key is required (--api-key or GOOGLE_API_KEY), or use --offline")
+    model_name = args.model or (model_client.OfflineClient.MODELS[0] if model_client.is_offline() else "models/gemini-1.5-flash")
+
+    briefs = load_briefs(args.briefs)
+    os.makedirs(args.out, exist_ok=True)
+    batch = BatchRun(briefs, args.out, api_key, model_name, args.concurrency, args.processes, visuals=not args.no_visuals)
+    print(f"{len(briefs)} briefs, {args.concurrency} at a time, {args.processes} compile process(es), model {model_name}")
+    start = time.perf_counter()
+    asyncio.run(batch.run())
+    print(batch.summary(time.perf_counter() - start))
+    return 1 if batch.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark: process memory with many sessions holding generated images.
+
+Each simulated session finishes a visuals job (--images 1024x1024 PNGs) and
+views its gallery once, then the next session arrives; all sessions stay
+open. Two modes, each in a fresh interpreter so RSS readings are comparable:
+  dict   - old behaviour: every session keeps its decoded PIL images
+  store  - asset_store.ImageSet handles, decoded on view under the session
+           and process budgets (--session-mb, --process-mb)
+Reports resident decoded bytes, process RSS (Linux), spills, and the time to
+view one session's gallery again (re-decoding what was spilled).
+
+Usage:
+    python benchmarks/bench_asset_store.py [--sessions 10 40] [--images 10] [--session-mb 32] [--process-mb 256]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from modules import asset_store
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def write_job_images(directory, count):
+    paths = []
+    for index in range(count):
+        noise = Image.effect_noise((1024, 1024), 20 + index)
+        img = Image.merge("RGB", (noise, Image.linear_gradient("L").resize((1024, 1024)), noise))
+        path = os.path.join(directory, f"{index:03d}.png")
+        img.save(path, format="PNG", compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def run_mode(args):
+    work_dir = tempfile.mkdtemp()
+    paths = write_job_images(work_dir, args.images)
+    store = asset_store.AssetStore(
+        os.path.join(work_dir, "assets"),
+        session_budget=args.session_mb * 1024 * 1024,
+        process_budget=args.process_mb * 1024 * 1024
+    )
+    asset_store.set_store(store)
+    baseline = rss_mb()
+
+    sessions = []
+    for number in range(args.sessions):
+        session_id = f"session{number:04d}"
+        if args.mode == "dict":
+            images = {}
+            for index, path in enumerate(paths):
+                img = Image.open(path)
+                img.load()
+                images[f"Section {index}"] = img
+        else:
+            images = asset_store.ImageSet(session_id, [(f"Section {i}", store.put_file(p)) for i, p in enumerate(paths)])
+        for img in images.values(): # Gallery view
+            img.size
+        sessions.append(images)
+
+    start = time.perf_counter()
+    for img in sessions[0].values():
+        img.size
+    revisit_ms = (time.perf_counter() - start) * 1000
+
+    if args.mode == "dict":
+        resident = sum(asset_store._image_bytes(img) for images in sessions for img in images.values())
+        spills = 0
+    else:
+        resident = store.resident_bytes()
+        spills = store.stats()["spills"]
+    print(f"{args.sessions:>9} {args.mode:>6} {resident / 2**20:>12.0f} {rss_mb() - baseline:>9.0f} {spills:>7} {revisit_ms:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--session-mb", type=int, default=32)
+    parser.add_argument("--process-mb", type=int, default=256)
+    parser.add_argument("--mode", choices=["dict", "store"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        args.sessions = args.sessions[0]
+        run_mode(args)
+        return
+
+    print(f"{'sessions':>9} {'mode':>6} {'resident MB':>12} {'+RSS MB':>9} {'spills':>7} {'revisit ms':>11}")
+    for sessions in args.sessions:
+        for mode in ("dict", "store"):
+            subprocess.run([
+                sys.executable, os.path.abspath(__file__), "--mode", mode, "--sessions", str(sessions),
+                "--images", str(args.images), "--session-mb", str(args.session_mb), "--process-mb", str(args.process_mb)
+            ], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: prompt size per chat turn with the token-budgeted context builder.
+
+Plays a synthetic consultation against the offline stand-in and reports the
+prompt tokens sent on each turn by:
+  legacy   - SYSTEM_PROMPT + the last 10 messages, whatever their size (old behaviour)
+  builder  - ContextBuilder with its token budget and rolling summary
+
+A plan-length reply (~15k words) is produced at --plan-turn. The first user
+message names the business; "fact kept" shows whether that name still reaches
+the model on each turn.
+
+Usage:
+    python benchmarks/bench_context_builder.py [--turns 40] [--budget 6000] [--summarizer extractive|model]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import context_builder, model_client, prompts, request_scheduler
+
+FACT = "Zephyr Orchards"
+MODEL = "models/offline-flash"
+
+
+def legacy_context(messages, system_prompt):
+    history = [{"role": "user" if m["role"] == "user" else "model", "parts": [m["content"]]} for m in messages[-10:]]
+    tokens = context_builder.count_tokens(system_prompt) + sum(context_builder.count_tokens(h["parts"][0]) for h in history)
+    return system_prompt, history, tokens
+
+
+def fact_kept(system_instruction, history):
+    return FACT in system_instruction or any(FACT in h["parts"][0] for h in history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--plan-turn", type=int, default=12)
+    parser.add_argument("--budget", type=int, default=context_builder.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--summarizer", choices=["extractive", "model"], default="extractive",
+                        help="'model' calls the offline stand-in, whose summaries are filler text")
+    args = parser.parse_args()
+
+    client = model_client.OfflineClient(ttft=0, tokens_per_second=0, reply_tokens=300, text_latency=0, seed=1)
+    model_client.set_offline_client(client)
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(key_rpm=6000, model_rpm=6000))
+    summarize = context_builder.model_summarizer(client, "offline", MODEL) if args.summarizer == "model" else None
+    builder = context_builder.ContextBuilder(budget=args.budget, summarize=summarize)
+    system_prompt = prompts.SYSTEM_PROMPT
+
+    messages = [{"role": "assistant", "content": "Hello. What is the proposed Business Name?"}]
+    summary_state = None
+    totals = {"legacy": 0, "builder": 0}
+    kept = {"legacy": 0, "builder": 0}
+    build_seconds = 0.0
+    summary_updates = 0
+
+    print(f"{'turn':>4} {'legacy tokens':>14} {'builder tokens':>15} {'in window':>10} {'summarised':>11} {'fact kept':>14}")
+    for turn in range(1, args.turns + 1):
+        if turn == 1:
+            user_text = f"The business is called {FACT}. We grow organic apples in Kent and want a grant."
+        elif turn == args.plan_turn:
+            user_text = "Please generate the plan now."
+        else:
+            user_text = f"Answer {turn}: our customers, pricing and team are described here in a few sentences."
+        messages.append({"role": "user", "content": user_text})
+
+        _, legacy_history, legacy_tokens = legacy_context(messages, system_prompt)
+        start = time.perf_counter()
+        system_instruction, history, summary_state, report = builder.build(messages, summary_state, system_prompt)
+        build_seconds += time.perf_counter() - start
+        summary_updates += report["summarised"]
+
+        totals["legacy"] += legacy_tokens
+        totals["builder"] += report["prompt_tokens"]
+        legacy_kept = fact_kept(system_prompt, legacy_history)
+        builder_kept = fact_kept(system_instruction, history)
+        kept["legacy"] += legacy_kept
+        kept["builder"] += builder_kept
+        print(f"{turn:>4} {legacy_tokens:>14,} {report['prompt_tokens']:>15,} {report['messages_included']:>10} "
+              f"{report['messages_summarised']:>11} {('yes' if legacy_kept else 'no') + '/' + ('yes' if builder_kept else 'no'):>14}")
+
+        reply = "".join(client.stream_chat(MODEL, history, system_instruction))
+        if turn == args.plan_turn:
+            reply += " " + " ".join(["Detailed market analysis and projections."] * 3000)
+        messages.append({"role": "assistant", "content": reply})
+
+    print(f"total prompt tokens: legacy {totals['legacy']:,}, builder {totals['builder']:,} "
+          f"({totals['legacy'] / totals['builder']:.1f}x smaller)")
+    print(f"turns with '{FACT}' in context: legacy {kept['legacy']}/{args.turns}, builder {kept['builder']}/{args.turns}")
+    print(f"summary updates: {summary_updates}, build time: {build_seconds * 1000 / args.turns:.2f} ms/turn")
+
+
+if __name__ == "__main__":
+    main()
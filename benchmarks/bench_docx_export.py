@@ -0,0 +1,116 @@
+"""
+Benchmark: in-memory generate_docx vs streaming write_docx.
+
+Each (mode, pages) combination runs in a fresh subprocess so peak RSS is
+measured in isolation; a sampler thread records RSS growth over the
+pre-export baseline. The synthetic plan uses ~500 words per page in short
+paragraphs, a '# ' heading every three pages and ten 1024x1024 images.
+
+Usage:
+    python benchmarks/bench_docx_export.py [--pages 50 100 300]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECTION_NAMES = [
+    "Executive Summary", "Introduction", "Company Description", "Product and Service",
+    "Market Research", "Organization and Management", "Marketing and Sales Strategy",
+    "Operational Plan", "Funding Request", "Financial Projections", "Implementation Plan",
+]
+WORDS_PER_PAGE = 500
+SENTENCE = "Our grant-funded programme expands regional capacity through measurable, staged investment. "
+
+
+def synthetic_plan(pages):
+    lines = []
+    sentence_words = len(SENTENCE.split())
+    for page in range(pages):
+        if page % 3 == 0:
+            lines.append(f"# {SECTION_NAMES[(page // 3) % len(SECTION_NAMES)]} {page // 3 + 1}")
+        if page % 3 == 1:
+            lines.append(f"## Detail {page}")
+        for paragraph in range(10):
+            lines.append(f"Paragraph {page}.{paragraph}: " + SENTENCE * (WORDS_PER_PAGE // 10 // sentence_words))
+    return "\n".join(lines)
+
+
+def synthetic_images():
+    from PIL import Image
+    images = {}
+    for index, name in enumerate(["The Cover Page"] + SECTION_NAMES[:9]):
+        noise = Image.effect_noise((1024, 1024), 40 + index)
+        images[name] = Image.merge("RGB", (noise, Image.linear_gradient("L").resize((1024, 1024)), noise))
+    return images
+
+
+def current_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(mode, pages):
+    from modules import document_generator
+    plan = synthetic_plan(pages)
+    images = synthetic_images()
+    baseline_kb = current_rss_kb()
+    peak = {"kb": baseline_kb}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak["kb"] = max(peak["kb"], current_rss_kb())
+            time.sleep(0.002)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(suffix=".docx") as tmp:
+        if mode == "in-memory":
+            stream = document_generator.generate_docx("Bench Co", "Benchmarks", plan, "Corporate Blue", images, False)
+            tmp.write(stream.getvalue())
+            tmp.flush()
+        else:
+            document_generator.write_docx(tmp.name, "Bench Co", "Benchmarks", plan, "Corporate Blue", images, False)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(tmp.name)
+
+    done.set()
+    sampler.join()
+    print(json.dumps({"seconds": elapsed, "peak_delta_mb": (peak["kb"] - baseline_kb) / 1024, "bytes": size}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 100, 300])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'pages':>6} {'mode':>10} {'compile s':>10} {'peak RSS +MB':>13} {'size MB':>8}")
+    for pages in args.pages:
+        for mode in ("in-memory", "streaming"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, str(pages)],
+                capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            print(f"{pages:>6} {mode:>10} {result['seconds']:>10.2f} {result['peak_delta_mb']:>13.1f} {result['bytes'] / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: .docx size and compile time with the export asset pipeline.
+
+Compares three modes over repeated exports of the same plan and images:
+  legacy  - full-resolution lossless PNG encoded on every export (old behaviour)
+  cold    - pipeline with an empty cache (first export)
+  warm    - pipeline reusing cached encodings (subsequent exports)
+
+Usage:
+    python benchmarks/bench_export_assets.py [--exports 5] [--writer generate|stream]
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from modules import document_generator, export_assets
+
+SECTIONS = ["Executive Summary", "Market Research", "Operational Plan", "Financial Projections", "Funding Request"]
+
+
+def synthetic_images():
+    images = {}
+    size = (1024, 1024)
+    photo = Image.merge("RGB", (Image.effect_noise(size, 50), Image.linear_gradient("L").resize(size), Image.effect_noise(size, 30)))
+    images["The Cover Page"] = photo
+    for index, name in enumerate(SECTIONS):
+        if index % 2:
+            # Flat chart-like graphic
+            chart = Image.new("RGB", size, (255, 255, 255))
+            draw = ImageDraw.Draw(chart)
+            for bar in range(6):
+                draw.rectangle([100 + bar * 140, 900 - bar * 120 - index * 10, 200 + bar * 140, 900], fill=(0, 0, 128))
+            images[name] = chart
+        else:
+            images[name] = photo.rotate(index * 30)
+    return images
+
+
+def synthetic_plan():
+    lines = []
+    for name in SECTIONS:
+        lines.append(f"# {name}")
+        lines.extend(["Body text for the section." * 20] * 30)
+    return "\n".join(lines)
+
+
+def legacy_encode_image(img, display_width_in, dpi=None, key=None):
+    stream = io.BytesIO()
+    img.save(stream, format="PNG")
+    data = stream.getvalue()
+    return export_assets.EncodedImage(data, "png", "image/png", img.width, img.height, hashlib.sha1(data).hexdigest())
+
+
+def export(writer, plan, images):
+    if writer == "generate":
+        return len(document_generator.generate_docx("Bench Co", "Slogan", plan, "Corporate Blue", images, False).getvalue())
+    stream = io.BytesIO()
+    document_generator.write_docx(stream, "Bench Co", "Slogan", plan, "Corporate Blue", images, False)
+    return len(stream.getvalue())
+
+
+def measure(writer, plan, images, exports):
+    times, size = [], 0
+    for _ in range(exports):
+        start = time.perf_counter()
+        size = export(writer, plan, images)
+        times.append((time.perf_counter() - start) * 1000)
+    return size, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exports", type=int, default=5)
+    parser.add_argument("--writer", choices=["generate", "stream"], default="generate")
+    args = parser.parse_args()
+
+    plan = synthetic_plan()
+    images = synthetic_images()
+
+    pipeline_encode = export_assets.encode_image
+    export_assets.encode_image = legacy_encode_image
+    legacy_size, legacy_times = measure(args.writer, plan, images, args.exports)
+    export_assets.encode_image = pipeline_encode
+
+    export_assets.clear_cache()
+    cold_size, cold_times = measure(args.writer, plan, images, 1)
+    warm_size, warm_times = measure(args.writer, plan, images, args.exports)
+
+    print(f"writer={args.writer} images={len(images)} exports={args.exports}")
+    print(f"{'mode':>7} {'bytes/export':>13} {'ms/export':>10}")
+    print(f"{'legacy':>7} {legacy_size:>13,} {sum(legacy_times) / len(legacy_times):>10.1f}")
+    print(f"{'cold':>7} {cold_size:>13,} {cold_times[0]:>10.1f}")
+    print(f"{'warm':>7} {warm_size:>13,} {sum(warm_times) / len(warm_times):>10.1f}")
+    print(f"size reduction: {legacy_size / warm_size:.1f}x, warm speedup: {sum(legacy_times) / sum(warm_times):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
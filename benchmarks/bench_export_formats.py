@@ -0,0 +1,111 @@
+"""
+Benchmark: compiling the business plan .docx and the pitch deck .pptx together.
+
+Compiles a synthetic plan (13 sections, --pages pages, subsections, lists
+and tables) with a 1024x768 image per section. Every run starts from empty parse,
+fragment and image caches:
+  docx       - write_docx alone
+  pptx       - write_pptx alone
+  separately - docx then pptx, each on its own as before (the sum of the two)
+  combined   - job_engine.compile_exports: one parse and one set of image
+               encodings, then both writers side by side
+Combined should be close to the slower of docx and pptx, not their sum.
+
+Usage:
+    python benchmarks/bench_export_formats.py [--pages 100] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from modules import document_generator, export_assets, job_engine, plan_parser, pptx_generator, prompts
+
+WORDS_PER_PAGE = 500
+SENTENCE = "Zephyr Orchards grows **organic** apples in Kent for *regional* retailers and cafes. "
+
+FIELDS = dict(business_name="Bench Co", slogan="Slogan", theme_color="Eco Green", use_3d_assets=False,
+              font_style="Sans-Serif (Modern)")
+
+
+def synthetic_plan(pages):
+    words_per_section = pages * WORDS_PER_PAGE // len(prompts.PLAN_SECTIONS)
+    parts = []
+    for section in prompts.PLAN_SECTIONS:
+        parts.append(f"# {section['name']}\n")
+        for sub in range(1, words_per_section // 180 + 2):
+            parts.append(f"## {section['name']} {sub}\n")
+            parts.append(SENTENCE * 6 + "\n\n" + SENTENCE * 6 + "\n")
+            parts.append("- First point with **bold** detail\n  - Nested supporting point\n- Second point\n")
+            parts.append("| Year | Revenue | Margin |\n|---|---|---|\n| 2025 | 120,000 | 18% |\n| 2026 | 240,000 | 22% |\n")
+    return "\n".join(parts)
+
+
+def synthetic_images():
+    images = {}
+    for index, section in enumerate(prompts.PLAN_SECTIONS):
+        noise = Image.effect_noise((1024, 768), 30 + index)
+        images[section["name"]] = Image.merge("RGB", (noise, Image.linear_gradient("L").resize((1024, 768)), noise))
+    return images
+
+
+def cold():
+    plan_parser.clear_cache()
+    export_assets.clear_cache()
+    document_generator.clear_fragment_cache()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        cold()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    plan_text = synthetic_plan(args.pages)
+    images = synthetic_images()
+    fields = dict(FIELDS, plan_text=plan_text, generated_images=images)
+    sizes = {}
+
+    def docx():
+        stream = io.BytesIO()
+        document_generator.write_docx(stream, **fields)
+        sizes["docx"] = len(stream.getvalue())
+
+    def pptx():
+        stream = io.BytesIO()
+        pptx_generator.write_pptx(stream, **fields)
+        sizes["pptx"] = len(stream.getvalue())
+
+    def combined():
+        job_engine.compile_exports({"docx": io.BytesIO(), "pptx": io.BytesIO()}, **fields)
+
+    print(f"plan: {len(plan_text.split()):,} words, {len(images)} images, median of {args.repeat} cold runs")
+    docx_seconds = timed(docx, args.repeat)
+    pptx_seconds = timed(pptx, args.repeat)
+    combined_seconds = timed(combined, args.repeat)
+    slower, total = max(docx_seconds, pptx_seconds), docx_seconds + pptx_seconds
+    print(f"{'export':>11} {'seconds':>8} {'output KB':>10}")
+    print(f"{'docx':>11} {docx_seconds:>8.2f} {sizes['docx'] / 1024:>10,.0f}")
+    print(f"{'pptx':>11} {pptx_seconds:>8.2f} {sizes['pptx'] / 1024:>10,.0f}")
+    print(f"{'separately':>11} {total:>8.2f}")
+    print(f"{'combined':>11} {combined_seconds:>8.2f}")
+    print(f"combined is {combined_seconds / slower:.2f}x the slower format and {combined_seconds / total:.2f}x the sum")
+
+
+if __name__ == "__main__":
+    main()
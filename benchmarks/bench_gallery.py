@@ -0,0 +1,117 @@
+"""
+Benchmark: Review-page Asset Gallery weight and rerun time.
+
+Renders a 3-column gallery of --images generated images (1024x1024,
+photo-like) through Streamlit's AppTest and compares:
+  full     - old gallery: st.image of each decoded full-size image
+  preview  - ImageSet previews (256 px JPEG made at generation time) plus a
+             "View full size" button per image
+"bytes" is the image data handed to Streamlit's media manager per run, i.e.
+what the browser downloads for the gallery. "gallery ms" is the rerun time
+minus that of an empty script (AppTest's own per-run overhead).
+
+Usage:
+    python benchmarks/bench_gallery.py [--images 10] [--reruns 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from modules import asset_store, export_assets
+
+SIZE = (1024, 1024)
+
+
+def empty_page(images):
+    import streamlit as st
+    st.markdown("### Asset Gallery Preview")
+
+
+def full_gallery(images):
+    import streamlit as st
+    names = list(images)
+    for i in range(0, len(names), 3):
+        cols = st.columns(3)
+        for j in range(3):
+            if i + j < len(names):
+                with cols[j]:
+                    st.image(images[names[i + j]], caption=names[i + j], use_container_width=True)
+
+
+def preview_gallery(images):
+    import streamlit as st
+    names = list(images)
+    for i in range(0, len(names), 3):
+        cols = st.columns(3)
+        for j in range(3):
+            if i + j < len(names):
+                with cols[j]:
+                    st.image(images.preview(names[i + j]), caption=names[i + j], width=256, output_format="JPEG")
+                    st.button("View full size", key=f"view_full_{i + j}")
+
+
+def synthetic_images(count):
+    images = {}
+    for index in range(count):
+        texture = Image.effect_noise(SIZE, 40 + index).filter(ImageFilter.GaussianBlur(3))
+        gradient = Image.linear_gradient("L").resize(SIZE)
+        img = Image.merge("RGB", (gradient, texture, gradient.rotate(90)))
+        img.info["preview"] = export_assets.encode_preview(img) # As generate_business_image attaches it
+        images[f"Section {index + 1}"] = img
+    return images
+
+
+media_bytes = [0]
+_load_and_get_id = MemoryMediaFileStorage.load_and_get_id
+
+
+def counting_load_and_get_id(self, path_or_data, mimetype, kind, filename=None):
+    media_bytes[0] += len(path_or_data) if isinstance(path_or_data, bytes) else os.path.getsize(path_or_data)
+    return _load_and_get_id(self, path_or_data, mimetype, kind, filename)
+
+
+def measure(script, images, reruns):
+    app = AppTest.from_function(script, args=(images,), default_timeout=120)
+    times = []
+    for _ in range(reruns + 1):
+        media_bytes[0] = 0
+        start = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return times[0], statistics.median(times[1:]), media_bytes[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    MemoryMediaFileStorage.load_and_get_id = counting_load_and_get_id
+    asset_store.set_store(asset_store.AssetStore(tempfile.mkdtemp()))
+    images = synthetic_images(args.images)
+    image_set = asset_store.ImageSet.from_images("bench", images)
+
+    _, baseline, _ = measure(empty_page, images, args.reruns)
+    print(f"{'gallery':>8} {'first run ms':>13} {'rerun ms':>9} {'gallery ms':>11} {'bytes/run':>12}")
+    rows = [("full", measure(full_gallery, images, args.reruns)),
+            ("preview", measure(preview_gallery, image_set, args.reruns))]
+    for label, (first, rerun, size) in rows:
+        print(f"{label:>8} {first * 1000:>13.0f} {rerun * 1000:>9.1f} {(rerun - baseline) * 1000:>11.1f} {size:>12,}")
+    (_, full_rerun, full_size), (_, preview_rerun, preview_size) = rows[0][1], rows[1][1]
+    print(f"preview gallery: {full_size / preview_size:.0f}x fewer bytes, "
+          f"{(full_rerun - baseline) / max(preview_rerun - baseline, 1e-6):.0f}x less rerun time (excluding the empty-page baseline)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: Consultation page rerun time as the conversation grows.
+
+Loads a synthetic conversation of N turns into an AppTest session and times
+plain reruns (what every widget interaction triggers) in two modes:
+  full   - every message rendered in full on each rerun (old behaviour)
+  paged  - most recent page only, long replies shown as previews
+
+Every 25th assistant reply is plan-sized (~15k words).
+
+Usage:
+    python benchmarks/bench_history_view.py [--turns 10 100 1000] [--reruns 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["GRANT_ARCHITECT_MODEL_BACKEND"] = "offline"
+
+from modules import history_view
+
+WORDS = "market growth funding strategy revenue customers operations impact grant team product".split()
+
+
+def synthetic_messages(turns, seed=0):
+    rng = random.Random(seed)
+
+    def text(words):
+        paragraphs = []
+        for start in range(0, words, 80):
+            paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(min(80, words - start))))
+        return "\n\n".join(paragraphs)
+
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": text(40)})
+        words = 15000 if turn % 25 == 24 else 300
+        messages.append({"role": "assistant", "content": text(words)})
+    return messages
+
+
+def time_reruns(turns, reruns, paged):
+    from streamlit.testing.v1 import AppTest
+    if paged:
+        history_view.PAGE_SIZE, history_view.PREVIEW_CHARS = DEFAULT_PAGE_SIZE, DEFAULT_PREVIEW_CHARS
+    else:
+        history_view.PAGE_SIZE, history_view.PREVIEW_CHARS = 10 ** 9, 10 ** 9
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    at.session_state["generated_images"] = {}
+    at.session_state["messages"] = synthetic_messages(turns)
+    at.run()
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return statistics.median(samples), len(at.markdown)
+
+
+DEFAULT_PAGE_SIZE = history_view.PAGE_SIZE
+DEFAULT_PREVIEW_CHARS = history_view.PREVIEW_CHARS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'turns':>6} {'mode':>6} {'rerun ms':>10} {'markdown elements':>18}")
+    for turns in args.turns:
+        for mode in ("full", "paged"):
+            seconds, elements = time_reruns(turns, args.reruns, paged=(mode == "paged"))
+            print(f"{turns:>6} {mode:>6} {seconds * 1000:>10.1f} {elements:>18,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: section-to-image matching for document assembly.
+
+Compares, for the 13 mandated plan sections (repeated --copies times, as in
+a long plan with numbered parts) and a typical set of generated image keys:
+  substring - the old per-heading scan: first key whose lower-cased text
+              appears in the lower-cased heading
+  matcher   - image_matcher.match_images: token index, best-score one-to-one
+              (cold: token cache cleared first; warm: re-export of the same plan)
+--keys adds generated keys that match nothing, to show how each scales.
+Reports time per export, images placed, images placed more than once and
+images never placed.
+
+Usage:
+    python benchmarks/bench_image_matcher.py [--copies 1 10 100] [--keys 0 100] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import image_matcher, prompts
+
+IMAGE_KEYS = [
+    "The Cover Page", "Executive Summary", "Product Demo", "Team Section", "Office Location",
+    "Market Research", "Marketing Strategy", "Operational Plan", "Financial Projections Chart",
+    "Implementation Timeline", "Funding Request",
+]
+
+
+def substring_match(headings, image_keys):
+    placements = []
+    for heading in headings:
+        for key in image_keys:
+            if key.lower() in heading.lower():
+                if "cover" in key.lower():
+                    continue
+                placements.append(key)
+                break
+    return placements
+
+
+def summarise(placed_keys, image_keys):
+    counts = Counter(placed_keys)
+    section_keys = [key for key in image_keys if "cover" not in key.lower()]
+    return len(counts), sum(1 for c in counts.values() if c > 1), sum(1 for key in section_keys if key not in counts)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--keys", type=int, nargs="+", default=[0, 100], help="extra unmatched image keys")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    def cold_match(headings, keys):
+        image_matcher.normalize_tokens.cache_clear()
+        return image_matcher.match_images(headings, keys)
+
+    print(f"{'headings':>9} {'keys':>5} {'mode':>14} {'ms':>8} {'placed':>7} {'reused':>7} {'never':>6}")
+    for extra in args.keys:
+        keys = IMAGE_KEYS + [f"Visual Concept {chr(65 + i % 26)}{i}" for i in range(extra)]
+        for copies in args.copies:
+            headings = [f"{section['name']} (Part {copy + 1})" if copies > 1 else section["name"]
+                        for copy in range(copies) for section in prompts.PLAN_SECTIONS]
+            old = summarise(substring_match(headings, keys), IMAGE_KEYS)
+            plan = image_matcher.match_images(headings, keys)
+            new = summarise([p.key for p in plan.placements], IMAGE_KEYS)
+            rows = [
+                ("substring", timed(lambda: substring_match(headings, keys), args.repeat), old),
+                ("matcher cold", timed(lambda: cold_match(headings, keys), args.repeat), new),
+                ("matcher warm", timed(lambda: image_matcher.match_images(headings, keys), args.repeat), new),
+            ]
+            for mode, seconds, (placed, reused, never) in rows:
+                print(f"{len(headings):>9} {len(keys):>5} {mode:>14} {seconds * 1000:>8.3f} {placed:>7} {reused:>7} {never:>6}")
+
+
+if __name__ == "__main__":
+    main()
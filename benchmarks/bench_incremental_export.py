@@ -0,0 +1,110 @@
+"""
+Benchmark: re-export cost after a restyle or a one-section edit.
+
+Compiles a synthetic plan (13 sections, --pages pages, lists, tables, bold
+runs and a 1024x768 image per section) and then re-exports it as a user
+would after Design Studio changes:
+  generate_docx   - full python-docx rebuild (the original compile path)
+  cold            - write_docx with empty parse, fragment and image caches
+  theme change    - same text, different Color Theme
+  font change     - same text, different Font Style
+  one-section edit - one sentence changed in one section
+"rendered" is the number of top-level sections whose XML had to be built.
+
+Usage:
+    python benchmarks/bench_incremental_export.py [--pages 100] [--repeat 3] [--skip-generate-docx]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from modules import document_generator, export_assets, plan_parser, prompts
+
+WORDS_PER_PAGE = 500
+SENTENCE = "Zephyr Orchards grows **organic** apples in Kent for *regional* retailers and cafes. "
+
+
+def synthetic_plan(pages):
+    sections = prompts.PLAN_SECTIONS
+    words_per_section = pages * WORDS_PER_PAGE // len(sections)
+    parts = []
+    for section in sections:
+        parts.append(f"# {section['name']}\n")
+        words = 0
+        sub = 0
+        while words < words_per_section:
+            sub += 1
+            parts.append(f"## {section['name']} {sub}\n")
+            parts.append(SENTENCE * 6 + "\n\n" + SENTENCE * 6 + "\n")
+            parts.append("- First point with **bold** detail\n  - Nested supporting point\n- Second point\n")
+            parts.append("| Year | Revenue | Margin |\n|---|---|---|\n| 2025 | 120,000 | 18% |\n| 2026 | 240,000 | 22% |\n")
+            words += 180
+    return "\n".join(parts)
+
+
+def synthetic_images():
+    images = {}
+    for index, section in enumerate(prompts.PLAN_SECTIONS):
+        noise = Image.effect_noise((1024, 768), 30 + index)
+        images[section["name"]] = Image.merge("RGB", (noise, Image.linear_gradient("L").resize((1024, 768)), noise))
+    return images
+
+
+def export(plan_text, images, theme, font):
+    before = document_generator.fragment_cache_stats()["misses"]
+    start = time.perf_counter()
+    stream = io.BytesIO()
+    document_generator.write_docx(stream, "Bench Co", "Slogan", plan_text, theme, images, False, font_style=font)
+    elapsed = time.perf_counter() - start
+    return elapsed, document_generator.fragment_cache_stats()["misses"] - before, len(stream.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-generate-docx", action="store_true")
+    args = parser.parse_args()
+
+    plan_text = synthetic_plan(args.pages)
+    images = synthetic_images()
+    sections = len(plan_parser.parse_plan(plan_text).sections)
+    print(f"plan: {len(plan_text.split()):,} words, {sections} top-level sections, {len(images)} images")
+    print(f"{'export':>17} {'seconds':>8} {'rendered':>9} {'vs cold':>8}")
+
+    if not args.skip_generate_docx:
+        start = time.perf_counter()
+        document_generator.generate_docx("Bench Co", "Slogan", plan_text, "Corporate Blue", images, False)
+        print(f"{'generate_docx':>17} {time.perf_counter() - start:>8.3f} {'-':>9} {'-':>8}")
+
+    cold = None
+    for _ in range(args.repeat):
+        plan_parser.clear_cache()
+        document_generator.clear_fragment_cache()
+        export_assets.clear_cache()
+        elapsed, rendered, _ = export(plan_text, images, "Corporate Blue", "Serif (Classic)")
+        cold = elapsed if cold is None else min(cold, elapsed)
+    print(f"{'cold':>17} {cold:>8.3f} {sections:>9} {1.0:>7.0%}")
+
+    edit_at = plan_text.index(prompts.PLAN_SECTIONS[5]["name"]) + 200
+    scenarios = [
+        ("theme change", lambda i: (plan_text, "Eco Green" if i % 2 == 0 else "Vibrant Startup", "Serif (Classic)")),
+        ("font change", lambda i: (plan_text, "Corporate Blue", "Slab (Bold)" if i % 2 == 0 else "Sans-Serif (Modern)")),
+        ("one-section edit", lambda i: (plan_text[:edit_at] + f" Revision {i}. " + plan_text[edit_at:],
+                                        "Corporate Blue", "Serif (Classic)")),
+    ]
+    for label, variant in scenarios:
+        best = None
+        for i in range(args.repeat):
+            elapsed, rendered, _ = export(*variant(i)[:1], images, *variant(i)[1:])
+            best = (elapsed, rendered) if best is None or elapsed < best[0] else best
+        print(f"{label:>17} {best[0]:>8.3f} {best[1]:>9} {best[0] / cold:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+End-to-end load benchmark against the offline Gemini stand-in.
+
+Simulates N concurrent users going through consultation, plan generation,
+visual generation and export, and reports p50/p95/p99 latency per stage. No API key or network
+access is needed.
+
+Drivers:
+  headless - calls the same module functions app.py uses, one thread per user
+  apptest  - runs app.py itself through streamlit.testing AppTest per user
+
+Usage:
+    python benchmarks/bench_load.py [--users 8] [--turns 3] [--driver headless|apptest]
+        [--ttft 0.3] [--tokens-per-sec 200] [--rate-limit 0.0] [--image-latency 1.0]
+        [--key-rpm 600] [--model-rpm 600]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import model_client, request_scheduler
+
+STAGES = ["ttft", "consultation", "plan", "visuals", "export"]
+MODEL = "models/offline-flash"
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def error(self, stage):
+        with self._lock:
+            self.errors[stage] += 1
+
+
+def chat_turn(client, history, recorder):
+    """One consultation turn, scheduled and retried the way app.py does."""
+    start = time.perf_counter()
+
+    def stream_reply():
+        reply = ""
+        for text in client.stream_chat(MODEL, history[-10:]):
+            if not reply:
+                recorder.add("ttft", time.perf_counter() - start)
+            reply += text
+        return reply
+
+    try:
+        full_response = request_scheduler.get_scheduler().submit(
+            stream_reply, "offline", MODEL, priority=request_scheduler.PRIORITY_INTERACTIVE
+        )
+    except Exception:
+        recorder.error("consultation")
+        return ""
+    recorder.add("consultation", time.perf_counter() - start)
+    return full_response
+
+
+def headless_user(user, args, recorder):
+    from modules import document_generator, image_generator, plan_engine
+    client = model_client.get_client("offline")
+    history = []
+    for turn in range(args.turns):
+        history.append({"role": "user", "parts": [f"User {user} answer {turn}"]})
+        history.append({"role": "model", "parts": [chat_turn(client, history, recorder)]})
+    history.append({"role": "user", "parts": ["Please generate the plan now"]})
+    history.append({"role": "model", "parts": [chat_turn(client, history, recorder)]})
+
+    start = time.perf_counter()
+    messages = [{"role": "user" if h["role"] == "user" else "assistant", "content": h["parts"][0]} for h in history]
+    plan = plan_engine.generate_plan(messages, "offline", MODEL).text
+    recorder.add("plan", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    images = image_generator.analyze_and_generate_visuals(plan, "Photorealistic", "offline", model_name=MODEL)
+    recorder.add("visuals", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(suffix=".docx") as tmp:
+        document_generator.write_docx(tmp.name, f"User {user}", "Slogan", plan, "Corporate Blue", images, False)
+    recorder.add("export", time.perf_counter() - start)
+
+
+def wait_for_job(at, kind):
+    """Polls the background job engine until the session's latest `kind` job finishes."""
+    from modules import job_engine
+    session_id = at.session_state["session_id"]
+    while True:
+        job = job_engine.get_engine().latest(session_id, kind)
+        if job and job["status"] not in job_engine.ACTIVE_STATUSES:
+            at.run()
+            return job
+        time.sleep(0.05)
+
+
+def apptest_user(user, args, recorder):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    at.run()
+    for turn in range(args.turns):
+        start = time.perf_counter()
+        at.chat_input[0].set_value(f"User {user} answer {turn}").run()
+        recorder.add("consultation", time.perf_counter() - start)
+    start = time.perf_counter()
+    at.chat_input[0].set_value("Please generate the plan now").run()
+    recorder.add("consultation", time.perf_counter() - start)
+    start = time.perf_counter()
+    wait_for_job(at, "plan")
+    recorder.add("plan", time.perf_counter() - start)
+
+    at.sidebar.radio[0].set_value("Review Plan").run()
+    start = time.perf_counter()
+    next(b for b in at.button if b.label == "Generate Visual Assets").click().run()
+    wait_for_job(at, "visuals")
+    recorder.add("visuals", time.perf_counter() - start)
+
+    at.sidebar.radio[0].set_value("Export").run()
+    start = time.perf_counter()
+    next(b for b in at.button if b.label == "Compile Business Plan & Pitch Deck").click().run()
+    wait_for_job(at, "export")
+    recorder.add("export", time.perf_counter() - start)
+    if at.exception:
+        recorder.error("apptest")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3, help="consultation turns before plan generation")
+    parser.add_argument("--driver", choices=["headless", "apptest"], default="headless")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=200)
+    parser.add_argument("--reply-tokens", type=int, default=300)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of a 429 per call")
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    parser.add_argument("--key-rpm", type=float, default=600, help="scheduler budget per API key")
+    parser.add_argument("--model-rpm", type=float, default=600, help="scheduler budget per model")
+    args = parser.parse_args()
+
+    # Isolate session, image cache and export files from the working tree
+    os.chdir(tempfile.mkdtemp())
+    model_client.set_offline_client(model_client.OfflineClient(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_sec,
+        reply_tokens=args.reply_tokens,
+        rate_limit_probability=args.rate_limit,
+        image_latency=args.image_latency,
+        seed=1
+    ))
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(
+        key_rpm=args.key_rpm, model_rpm=args.model_rpm, burst=args.users
+    ))
+    from modules import image_cache
+    image_cache.get_default_cache().max_bytes = 0 # Every request pays for generation
+
+    run_user = headless_user if args.driver == "headless" else apptest_user
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for future in [pool.submit(run_user, user, args, recorder) for user in range(args.users)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    print(f"driver={args.driver} users={args.users} turns={args.turns} wall={elapsed:.2f}s")
+    print(f"{'stage':>13} {'n':>5} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'errors':>7}")
+    for stage in STAGES:
+        values = recorder.samples.get(stage, [])
+        if not values and stage == "ttft":
+            continue
+        print(f"{stage:>13} {len(values):>5} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} "
+              f"{percentile(values, 99):>8.2f} {recorder.errors.get(stage, 0):>7}")
+    if recorder.errors.get("apptest"):
+        print(f"app exceptions: {recorder.errors['apptest']}")
+    stats = request_scheduler.get_scheduler().stats()
+    print(f"scheduler: 429s={stats['rate_limited']} retries={stats['retries']} "
+          f"peak queue={stats['max_queue_depth']} wait={stats['wait_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: overhead of the metrics layer on instrumented hot paths.
+
+Measures the cost of each metrics operation (single thread, and with
+--threads threads recording into the same histogram), then the cheapest
+instrumented stage, state_manager.save_session on an unchanged session,
+with and without its timer (the undecorated function via __wrapped__).
+Also times render_prometheus, i.e. one /metrics scrape or file flush.
+
+Usage:
+    python benchmarks/bench_metrics.py [--ops 200000] [--threads 4] [--saves 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import metrics, state_manager
+
+
+def per_op_ns(fn, ops):
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def contended_ns(fn, ops, threads):
+    def worker():
+        for _ in range(ops):
+            fn()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return (time.perf_counter() - start) / (ops * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--saves", type=int, default=5000)
+    args = parser.parse_args()
+
+    counter = metrics.counter("bench_events_total", "Benchmark counter")
+    histogram = metrics.histogram("bench_seconds", "Benchmark histogram")
+
+    def noop():
+        pass
+
+    timed_noop = metrics.timed(histogram)(noop)
+
+    def timer_block():
+        with histogram.time():
+            pass
+
+    baseline = per_op_ns(noop, args.ops)
+    rows = [
+        ("counter.inc", lambda: counter.inc()),
+        ("histogram.observe", lambda: histogram.observe(0.042)),
+        ("histogram.time()", timer_block),
+        ("@timed call", timed_noop),
+    ]
+    print(f"{'operation':>20} {'ns/op':>8} {f'{args.threads} threads':>11}")
+    print(f"{'empty call':>20} {baseline:>8.0f} {'-':>11}")
+    for label, fn in rows:
+        single = per_op_ns(fn, args.ops) - baseline
+        contended = contended_ns(fn, args.ops // args.threads, args.threads) - baseline
+        print(f"{label:>20} {single:>8.0f} {contended:>11.0f}")
+
+    # Cheapest instrumented stage: a save that finds nothing to write
+    state_manager.set_backend(state_manager.JournalBackend(tempfile.mkdtemp()))
+    state_manager.st = types.SimpleNamespace(session_state={
+        "session_id": "benchmetrics01", "messages": [{"role": "user", "content": "Hello"}]
+    })
+    state_manager.save_session()
+    timed_save = per_op_ns(state_manager.save_session, args.saves)
+    bare_save = per_op_ns(state_manager.save_session.__wrapped__, args.saves)
+    timed_save = min(timed_save, per_op_ns(state_manager.save_session, args.saves))
+    bare_save = min(bare_save, per_op_ns(state_manager.save_session.__wrapped__, args.saves))
+    print(f"\nsave_session (no changes): {bare_save / 1000:.1f} us bare, {timed_save / 1000:.1f} us timed "
+          f"({(timed_save - bare_save) / bare_save:+.1%})")
+
+    for index in range(20):
+        metrics.histogram(f"bench_stage_{index}_seconds", "Benchmark stage").observe(0.1)
+    start = time.perf_counter()
+    for _ in range(100):
+        text = metrics.render_prometheus()
+    print(f"render_prometheus: {(time.perf_counter() - start) / 100 * 1000:.2f} ms for "
+          f"{len(metrics.snapshot())} metrics ({len(text):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: time to first token across models with different latency profiles.
+
+A simulated backend serves one model family with heterogeneous
+time-to-first-token distributions (lognormal, times --scale):
+  sim-flash-latest  fastest median, but 2% of requests stall for 10x and it
+                    answers 429 to every request in the middle fifth of the run
+  sim-flash-001     a little slower, steady
+  sim-flash-002     slowest, steady
+The user picked sim-flash-latest. Strategies, over --requests sequential turns:
+  fixed   - always the picked model; a 429 waits --backoff and retries (up to 3 tries)
+  routed  - model_router.RoutedClient without hedging (ranking and fallback)
+  hedged  - RoutedClient with a hedged second request after the model's p95 TTFT
+"sent" counts model requests per turn, hedges and fallbacks included.
+
+Usage:
+    python benchmarks/bench_model_router.py [--requests 300] [--scale 0.1] [--backoff 2.0]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core import exceptions
+from modules import model_router
+
+FAMILY = ["models/sim-flash-latest", "models/sim-flash-001", "models/sim-flash-002"]
+# Median TTFT in seconds (before --scale), lognormal sigma, stall probability
+PROFILES = {
+    "models/sim-flash-latest": (0.4, 0.25, 0.02),
+    "models/sim-flash-001": (0.6, 0.2, 0.0),
+    "models/sim-flash-002": (0.9, 0.2, 0.0),
+}
+STALL_FACTOR = 10
+
+
+class SimulatedBackend:
+    """Streams short replies with per-model TTFT distributions; one model is rate-limited for a while."""
+
+    def __init__(self, scale, requests, seed=11):
+        self.scale = scale
+        self.limited = range(2 * requests // 5, 3 * requests // 5)
+        self.turn = 0
+        self.sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def stream_chat(self, model_name, history, system_instruction=None, request_options=None, cancel=None):
+        median, sigma, stall = PROFILES[model_name]
+        with self._lock:
+            self.sent += 1
+            delay = median * math.exp(self._random.gauss(0, sigma))
+            if self._random.random() < stall:
+                delay *= STALL_FACTOR
+            limited = model_name == FAMILY[0] and self.turn in self.limited
+        if limited:
+            time.sleep(0.02 * self.scale)
+            raise exceptions.ResourceExhausted("429 Resource has been exhausted (simulated)")
+        pause = cancel.wait if cancel is not None else time.sleep
+        if pause(delay * self.scale):
+            return # Lost to a hedge: dropped at once
+        for index in range(4):
+            yield f"{model_name} chunk {index} "
+
+
+def with_retries(fn, backoff):
+    for attempt in range(3):
+        try:
+            return fn()
+        except exceptions.ResourceExhausted:
+            if attempt == 2:
+                raise
+            time.sleep(backoff)
+
+
+def run(strategy, args):
+    backend = SimulatedBackend(args.scale, args.requests)
+    router = model_router.ModelRouter(cooldown=args.cooldown)
+    if strategy == "fixed":
+        client = backend
+    else:
+        client = model_router.RoutedClient(backend, FAMILY, router=router, hedge=strategy == "hedged")
+    ttfts, failures, served = [], 0, Counter()
+
+    for turn in range(args.requests):
+        backend.turn = turn
+        history = [{"role": "user", "parts": [f"Turn {turn}"]}]
+
+        def first_token():
+            stream = client.stream_chat(FAMILY[0], history)
+            next(stream)
+            stream.close()
+
+        start = time.perf_counter()
+        try:
+            with_retries(first_token, args.backoff * args.scale)
+        except exceptions.ResourceExhausted:
+            failures += 1
+            continue
+        ttfts.append(time.perf_counter() - start)
+        served[getattr(client, "last_model", None) or FAMILY[0]] += 1
+
+    ttfts.sort()
+    def pct(q):
+        return ttfts[min(len(ttfts) - 1, int(q * len(ttfts)))] / args.scale * 1000
+    share = " ".join(f"{name.split('-')[-1]}:{count}" for name, count in sorted(served.items()))
+    print(f"{strategy:>7} {pct(0.5):>7.0f} {pct(0.95):>7.0f} {pct(0.99):>7.0f} {ttfts[-1] / args.scale * 1000:>7.0f} "
+          f"{failures:>5} {backend.sent / args.requests:>5.2f}  {share}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--scale", type=float, default=0.1, help="multiplier applied to every simulated delay")
+    parser.add_argument("--backoff", type=float, default=2.0, help="seconds (before --scale) the fixed strategy waits after a 429")
+    parser.add_argument("--cooldown", type=float, default=3.0, help="router cooldown after a 429, in seconds of real time")
+    args = parser.parse_args()
+
+    print("TTFT in simulated ms (real time / --scale)")
+    print(f"{'':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'fail':>5} {'sent':>5}  served by")
+    for strategy in ("fixed", "routed", "hedged"):
+        run(strategy, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: wall-clock time to a full business plan.
+
+Uses the offline stand-in with a fixed time-to-first-token and output rate:
+  monolithic  - one streamed reply containing every section (old behaviour)
+  sections xN - plan_engine.generate_plan with N sections in flight
+
+Each section is --section-tokens long, so the monolithic reply has the same
+total length as the assembled plan.
+
+Usage:
+    python benchmarks/bench_plan_engine.py [--concurrency 1 2 4 8] [--section-tokens 600]
+        [--ttft 0.5] [--tokens-per-sec 400] [--rate-limit 0.0]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import model_client, plan_engine, prompts, request_scheduler
+
+MODEL = "models/offline-flash"
+MESSAGES = [
+    {"role": "assistant", "content": "What is the proposed Business Name?"},
+    {"role": "user", "content": "Zephyr Orchards, an organic apple grower in Kent seeking a 250k grant."},
+    {"role": "assistant", "content": "Thank you. BUSINESS PLAN GENERATED"},
+]
+
+
+def install_client(args, reply_tokens):
+    model_client.set_offline_client(model_client.OfflineClient(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_sec,
+        reply_tokens=reply_tokens,
+        rate_limit_probability=args.rate_limit,
+        seed=7
+    ))
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(key_rpm=6000, model_rpm=6000, burst=50, base_backoff=0.2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--section-tokens", type=int, default=600)
+    parser.add_argument("--ttft", type=float, default=0.5)
+    parser.add_argument("--tokens-per-sec", type=float, default=400)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of a 429 per call")
+    args = parser.parse_args()
+    sections = len(prompts.PLAN_SECTIONS)
+
+    install_client(args, args.section_tokens * sections)
+    client = model_client.get_client("offline")
+    start = time.perf_counter()
+    text = "".join(client.stream_chat(MODEL, [{"role": "user", "parts": ["Write the full plan."]}]))
+    baseline = time.perf_counter() - start
+    print(f"sections={sections} tokens/section={args.section_tokens} ttft={args.ttft}s rate={args.tokens_per_sec:.0f} tok/s")
+    print(f"{'mode':>14} {'wall s':>8} {'speedup':>8} {'plan words':>11} {'retried':>8} {'failed':>7}")
+    print(f"{'monolithic':>14} {baseline:>8.2f} {1.0:>8.1f} {len(text.split()):>11,} {'-':>8} {'-':>7}")
+
+    install_client(args, args.section_tokens)
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        plan = plan_engine.generate_plan(MESSAGES, "offline", MODEL, max_workers=concurrency)
+        elapsed = time.perf_counter() - start
+        retried = sum(1 for s in plan.sections if s.attempts > 1)
+        failed = sum(1 for s in plan.sections if s.status != plan_engine.SECTION_DONE)
+        stats = request_scheduler.get_scheduler().stats()
+        retried += stats["retries"]
+        print(f"{'sections x' + str(concurrency):>14} {elapsed:>8.2f} {baseline / elapsed:>8.1f} "
+              f"{len(plan.text.split()):>11,} {retried:>8} {failed:>7}")
+        install_client(args, args.section_tokens) # Fresh scheduler counters per run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: parsing a long business plan once and sharing the result.
+
+Builds a synthetic plan of --pages pages (~500 words per page) with the 13
+mandated sections, subsections, bullet and numbered lists, tables and bold
+text, then reports:
+  line scan  - the old exporter's per-line split/strip/startswith pass,
+               repeated by every consumer (Review, Export, image matching)
+  cold parse - plan_parser.parse_plan on new text (one single pass)
+  cached     - parse_plan on text it has already seen (hash + lookup)
+and the memory allocated while parsing (tracemalloc peak) and held by the
+cached tree afterwards.
+
+Usage:
+    python benchmarks/bench_plan_parser.py [--pages 100] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import plan_parser, prompts
+
+WORDS_PER_PAGE = 500
+
+
+def synthetic_plan(pages):
+    """Markdown plan of roughly `pages` pages spread over the mandated sections."""
+    sentence = "Zephyr Orchards grows **organic** apples in Kent for *regional* retailers and cafes."
+    paragraph = " ".join([sentence] * 6) # ~80 words
+    words_per_section = pages * WORDS_PER_PAGE // len(prompts.PLAN_SECTIONS)
+    parts = []
+    for section in prompts.PLAN_SECTIONS:
+        parts.append(f"# {section['name']}\n")
+        words = 0
+        sub = 0
+        while words < words_per_section:
+            sub += 1
+            parts.append(f"## {section['name']} {sub}\n")
+            parts.append(paragraph + "\n\n" + paragraph + "\n")
+            parts.append("- First point with **bold** detail\n  - Nested supporting point\n- Second point\n")
+            parts.append("1. Step one\n2. Step two\n3. Step three\n")
+            parts.append("| Year | Revenue | Margin |\n|---|---|---|\n| 2025 | 120,000 | 18% |\n| 2026 | 240,000 | 22% |\n")
+            words += 190
+    return "\n".join(parts)
+
+
+def line_scan(plan_text):
+    """The previous exporter pass: classify every non-empty line by prefix."""
+    headings = paragraphs = 0
+    for line in plan_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('# ') or line.startswith('## '):
+            headings += 1
+        else:
+            paragraphs += 1
+    return headings, paragraphs
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    plan_text = synthetic_plan(args.pages)
+    print(f"plan: {len(plan_text.split()):,} words, {len(plan_text) / 1024:.0f} KB, {plan_text.count(chr(10)):,} lines")
+
+    def cold():
+        plan_parser.clear_cache()
+        plan_parser.parse_plan(plan_text)
+
+    scan_s = timed(lambda: line_scan(plan_text), args.repeat)
+    cold_s = timed(cold, args.repeat)
+    plan_parser.parse_plan(plan_text)
+    cached_s = timed(lambda: plan_parser.parse_plan(plan_text), args.repeat)
+
+    plan_parser.clear_cache()
+    tracemalloc.start()
+    plan = plan_parser.parse_plan(plan_text)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sections = sum(1 for _ in plan_parser.iter_sections(plan))
+    print(f"{'pass':>11} {'ms':>9}")
+    print(f"{'line scan':>11} {scan_s * 1000:>9.2f}   (x3 consumers = {scan_s * 3000:.2f} ms, headings and paragraphs only)")
+    print(f"{'cold parse':>11} {cold_s * 1000:>9.2f}   ({sections} sections, lists/tables/runs included)")
+    print(f"{'cached':>11} {cached_s * 1000:>9.3f}")
+    print(f"memory: peak {peak / 1024 / 1024:.1f} MB while parsing, {retained / 1024 / 1024:.1f} MB retained by the tree")
+
+
+if __name__ == "__main__":
+    main()
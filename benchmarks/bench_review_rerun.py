@@ -0,0 +1,104 @@
+"""
+Benchmark: Review Plan rerun cost and edit saves against plan length.
+
+Builds plans of --pages pages (about 500 words per page, under 13 top-level
+sections with a subsection per page) and compares, per rerun and per edit:
+  full     - old view: the whole plan in one text area (plus the outline
+             from the shared parse); an edit stores the whole text again
+  sections - state_manager's review index: only the selected section is
+             read and sent, and the gallery's image placement reads the
+             headings alone; an edit saves a section diff to the session
+"sent KB" is the text shipped to the browser each rerun, "saved KB" what an
+edit of one paragraph writes (session journal plus asset files).
+
+Usage:
+    python benchmarks/bench_review_rerun.py [--pages 10 50 100 200] [--reruns 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import asset_store, plan_parser, state_manager
+
+PARAGRAPH = "Our funding request covers equipment, hiring and twelve months of runway for the pilot. " * 6 + "\n\n"
+SECTIONS = 13
+
+
+def build_plan(pages):
+    lines = []
+    for page in range(pages):
+        if page % max(pages // SECTIONS, 1) == 0:
+            lines.append(f"# Section {page}\n\n")
+        lines.append(f"## Topic {page}\n\n" + PARAGRAPH * 6)
+    return "".join(lines)
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(mode, pages, args):
+    session_dir, asset_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    state_manager.set_backend(state_manager.JournalBackend(session_dir, compact_threshold=float("inf")))
+    asset_store.set_store(asset_store.AssetStore(asset_dir))
+    state_manager.st = types.SimpleNamespace(session_state={"session_id": f"benchreview{pages:06d}"})
+    plan_parser.clear_cache()
+    plan = build_plan(pages)
+    state_manager.set_plan_text(plan)
+    state_manager.save_session()
+    units = state_manager.get_plan_index()
+    number = next(n for n in range(len(units) // 2, len(units)) if units[n].title.startswith("Topic"))
+
+    def rerun():
+        if mode == "full":
+            text = state_manager.get_plan_text()
+            plan_parser.outline(plan_parser.parse_plan(text))
+            return len(text.encode("utf-8"))
+        state_manager.get_plan_index()
+        state_manager.get_plan_headings()
+        return len(state_manager.get_section_text(number).encode("utf-8"))
+
+    sent = rerun() # Warms the parse and index caches, as the first rerun after generation does
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        rerun()
+    rerun_ms = (time.perf_counter() - start) / args.reruns * 1000
+
+    saved_before = dir_bytes(session_dir) + dir_bytes(asset_dir)
+    start = time.perf_counter()
+    for edit in range(args.edits):
+        section = state_manager.get_section_text(number)
+        edited = section.replace(PARAGRAPH, f"Revised paragraph {edit}.\n\n", 1)
+        if mode == "full":
+            unit = state_manager.get_plan_index()[number]
+            state_manager.set_plan_text(plan[:unit.start] + edited + plan[unit.end:])
+            state_manager.save_session()
+        else:
+            state_manager.set_section_text(number, edited)
+    edit_ms = (time.perf_counter() - start) / args.edits * 1000
+    saved = (dir_bytes(session_dir) + dir_bytes(asset_dir) - saved_before) / args.edits
+
+    print(f"{pages:>6} {mode:>9} {len(plan) / 1024:>8.0f} {rerun_ms:>9.3f} {sent / 1024:>8.1f} "
+          f"{edit_ms:>8.2f} {saved / 1024:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'view':>9} {'plan KB':>8} {'rerun ms':>9} {'sent KB':>8} {'edit ms':>8} {'saved KB':>9}")
+    for pages in args.pages:
+        for mode in ("full", "sections"):
+            run(mode, pages, args)
+
+
+if __name__ == "__main__":
+    main()
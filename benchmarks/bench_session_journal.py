@@ -0,0 +1,85 @@
+"""
+Benchmark: bytes written and load time for journaled session persistence.
+
+Simulates a consultation of N turns (user + assistant message per turn, each
+saved separately as app.py does) ending in a plan-length reply. Compares the
+bytes written by the journal with the legacy full JSON rewrite per save, and
+times load_session after compaction.
+
+Usage:
+    python benchmarks/bench_session_journal.py [--turns 10 100 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import asset_store, state_manager
+
+MESSAGE = "Here is a detailed answer about the market, operations and funding. " * 25
+PLAN = "# Section\n" + ("Plan body paragraph with financial detail. " * 20 + "\n") * 2000
+
+
+def simulate(backend, turns):
+    session_id = f"bench{turns:08d}"
+    state_manager.st = types.SimpleNamespace(session_state={"session_id": session_id})
+    session = state_manager.st.session_state
+    session["messages"] = []
+    journal_path = backend._paths(session_id)[1]
+    legacy_bytes = 0
+    journal_bytes = 0
+
+    def save():
+        nonlocal legacy_bytes, journal_bytes
+        before = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        state_manager.save_session()
+        journal_bytes += os.path.getsize(journal_path) - before
+        legacy = {field: session.get(field, default) for field, default in state_manager.PERSISTED_FIELDS.items()}
+        legacy["generated_plan_text"] = state_manager.get_plan_text() # Saved inline before the asset store
+        legacy["messages"] = session["messages"]
+        legacy_bytes += len(json.dumps(legacy, indent=4))
+
+    for turn in range(turns):
+        session["messages"].append({"role": "user", "content": f"Answer {turn}"})
+        save()
+        content = PLAN if turn == turns - 1 else MESSAGE
+        session["messages"].append({"role": "assistant", "content": content})
+        if turn == turns - 1:
+            session["plan_generated"] = True
+            state_manager.set_plan_text(content)
+        save()
+
+    backend.compact(session_id)
+    session.clear()
+    session["session_id"] = session_id
+    start = time.perf_counter()
+    state_manager.load_session()
+    load_ms = (time.perf_counter() - start) * 1000
+    assert len(session["messages"]) == turns * 2
+    state_manager.clear_session()
+    return legacy_bytes, journal_bytes, load_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    # Measure raw append volume; compaction is timed through load_session
+    backend = state_manager.JournalBackend(tempfile.mkdtemp(), compact_threshold=float("inf"))
+    state_manager.set_backend(backend)
+    asset_store.set_store(asset_store.AssetStore(tempfile.mkdtemp()))
+
+    print(f"{'turns':>6} {'legacy MB':>10} {'journal MB':>11} {'ratio':>7} {'load ms':>8}")
+    for turns in args.turns:
+        legacy, journal, load_ms = simulate(backend, turns)
+        print(f"{turns:>6} {legacy / 1e6:>10.1f} {journal / 1e6:>11.2f} {legacy / journal:>6.0f}x {load_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
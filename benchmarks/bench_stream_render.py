@@ -0,0 +1,122 @@
+"""
+Benchmark: rendering a long streamed reply into a chat placeholder.
+
+Replays a synthetic stream (default 50k tokens, 8 tokens per chunk) through:
+  naive      - placeholder.markdown(reply + cursor) on every chunk (old behaviour)
+  throttled  - StreamRenderer with its time/size flush budget
+
+Each render is serialised to a Markdown protobuf, as Streamlit does before
+sending it to the browser, so "bytes" is what would cross the websocket.
+
+Usage:
+    python benchmarks/bench_stream_render.py [--tokens 50000] [--tokens-per-sec 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.proto.Markdown_pb2 import Markdown
+from modules import stream_renderer
+
+WORDS = (
+    "market growth funding strategy revenue customers operations impact grant "
+    "scalable sustainable projections investment team product service pricing"
+).split()
+
+
+class RecordingPlaceholder:
+    """Stands in for st.empty(): serialises each render and counts the bytes."""
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def markdown(self, body):
+        proto = Markdown()
+        proto.body = body
+        data = proto.SerializeToString()
+        if self.totals["first_render"] is None:
+            self.totals["first_render"] = time.perf_counter()
+        self.totals["renders"] += 1
+        self.totals["bytes"] += len(data)
+
+    def container(self):
+        return self
+
+    def empty(self):
+        return RecordingPlaceholder(self.totals)
+
+
+def synthetic_stream(tokens, chunk_tokens, seed=0):
+    rng = random.Random(seed)
+    words = []
+    for index in range(tokens):
+        if index and index % 600 == 0:
+            words.append(f"\n\n## Section {index // 600}\n\n")
+        elif index and index % 60 == 0:
+            words.append("\n\n")
+        words.append(rng.choice(WORDS) + " ")
+    return ["".join(words[start:start + chunk_tokens]) for start in range(0, len(words), chunk_tokens)]
+
+
+def replay(chunks, tokens_per_second, chunk_tokens, sink):
+    interval = chunk_tokens / tokens_per_second if tokens_per_second else 0
+    for chunk in chunks:
+        if interval:
+            time.sleep(interval)
+        sink(chunk)
+
+
+def run_naive(chunks, args):
+    totals = {"renders": 0, "bytes": 0, "first_render": None}
+    placeholder = RecordingPlaceholder(totals)
+    text = ""
+
+    def sink(chunk):
+        nonlocal text
+        text += chunk
+        placeholder.markdown(text + "▌")
+
+    start = time.perf_counter()
+    replay(chunks, args.tokens_per_sec, args.chunk_tokens, sink)
+    placeholder.markdown(text)
+    return totals, start, time.perf_counter()
+
+
+def run_throttled(chunks, args):
+    totals = {"renders": 0, "bytes": 0, "first_render": None}
+    renderer = stream_renderer.StreamRenderer(RecordingPlaceholder(totals))
+    start = time.perf_counter()
+    replay(chunks, args.tokens_per_sec, args.chunk_tokens, renderer.write)
+    renderer.finish()
+    return totals, start, time.perf_counter()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=50000)
+    parser.add_argument("--chunk-tokens", type=int, default=8)
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="source rate; 0 replays as fast as possible")
+    args = parser.parse_args()
+
+    chunks = synthetic_stream(args.tokens, args.chunk_tokens)
+    size = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+    print(f"tokens={args.tokens} chunks={len(chunks)} reply={size:,} bytes")
+    print(f"{'mode':>10} {'renders':>8} {'render bytes':>14} {'wall s':>8} {'first render ms':>16}")
+    results = {}
+    for name, run in (("naive", run_naive), ("throttled", run_throttled)):
+        totals, start, end = run(chunks, args)
+        results[name] = (totals, end - start)
+        first = (totals["first_render"] - start) * 1000
+        print(f"{name:>10} {totals['renders']:>8,} {totals['bytes']:>14,} {end - start:>8.2f} {first:>16.3f}")
+
+    naive, throttled = results["naive"], results["throttled"]
+    print(f"render bytes: {naive[0]['bytes'] / throttled[0]['bytes']:.0f}x fewer, "
+          f"wall time: {naive[1] / throttled[1]:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
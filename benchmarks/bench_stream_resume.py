@@ -0,0 +1,128 @@
+"""
+Benchmark: long chat replies under injected mid-stream faults.
+
+Streams --turns replies (--reply-tokens each) from the offline stand-in,
+where a fraction of streams (--fault-rates) break partway with a 429 or a
+dropped connection (503). Both modes get the same retry budget: the
+scheduler retries 429s with backoff, and dropped connections are retried
+up to resumable_stream.MAX_RESUMES times at once.
+  restart  - old behaviour: every retry streams the reply from scratch
+  resume   - ResumableStream: retries continue from the received prefix,
+             checkpointing it to a journal session backend as it arrives
+"generated" is output tokens streamed by the model, "wasted" the part that
+was thrown away, "re-sent" the prefix tokens sent back as input to resume.
+
+Usage:
+    python benchmarks/bench_stream_resume.py [--turns 20] [--reply-tokens 1500] [--fault-rates 0 0.3 0.6]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import context_builder, model_client, prompts, request_scheduler, resumable_stream, state_manager
+
+MODEL = "models/offline-flash"
+
+
+class CountingClient:
+    """Counts the tokens a client streams, and the prefixes sent back to continue a reply."""
+
+    def __init__(self, client):
+        self.client = client
+        self.generated = 0
+        self.resent = 0
+
+    def stream_chat(self, model_name, history, system_instruction=None, request_options=None):
+        if history[-1]["parts"][0] == prompts.CONTINUE_PROMPT:
+            self.resent += context_builder.count_tokens(history[-2]["parts"][0])
+        parts = []
+        try:
+            for chunk in self.client.stream_chat(model_name, history, system_instruction=system_instruction):
+                parts.append(chunk)
+                yield chunk
+        finally:
+            self.generated += context_builder.count_tokens("".join(parts))
+
+
+def restart_reply(client, history):
+    resumes_left = resumable_stream.MAX_RESUMES
+    while True:
+        try:
+            return "".join(client.stream_chat(MODEL, history))
+        except Exception as e:
+            if not resumable_stream.is_disconnect_error(e) or resumes_left <= 0:
+                raise
+            resumes_left -= 1
+
+
+def run(mode, args, fault_rate):
+    offline = model_client.OfflineClient(
+        ttft=args.ttft, tokens_per_second=args.tokens_per_sec, reply_tokens=args.reply_tokens,
+        stream_fault_probability=fault_rate, seed=7
+    )
+    client = CountingClient(offline)
+    scheduler = request_scheduler.RequestScheduler(key_rpm=1e6, model_rpm=1e6, burst=1e6, base_backoff=args.backoff)
+    backend = state_manager.JournalBackend(tempfile.mkdtemp())
+    times, useful, completed, checkpoints, checkpoint_seconds = [], 0, 0, 0, 0.0
+
+    for turn in range(args.turns):
+        history = [{"role": "user", "parts": [f"Turn {turn}: describe the market in depth"]}]
+
+        saved = [None] # Length of the checkpointed text, as state_manager.checkpoint_turn tracks it
+
+        def checkpoint(text):
+            nonlocal checkpoint_seconds
+            start = time.perf_counter()
+            if saved[0] is None:
+                backend.set_pending_turn("benchresume01", {"after": turn, "model": MODEL, "text": text})
+            else:
+                backend.append_turn_text("benchresume01", saved[0], text[saved[0]:])
+            saved[0] = len(text)
+            checkpoint_seconds += time.perf_counter() - start
+
+        stream = resumable_stream.ResumableStream(client, MODEL, history, on_checkpoint=checkpoint)
+        fn = stream.read if mode == "resume" else (lambda: restart_reply(client, history))
+        start = time.perf_counter()
+        try:
+            text = scheduler.submit(fn, "offline", MODEL)
+        except Exception:
+            continue
+        finally:
+            checkpoints += stream.checkpoints
+        times.append(time.perf_counter() - start)
+        useful += context_builder.count_tokens(text)
+        completed += 1
+
+    wasted = client.generated - useful
+    print(f"{fault_rate:>6.0%} {mode:>8} {completed:>5}/{args.turns:<3} {client.generated:>10,} {wasted:>8,} "
+          f"{client.resent:>8,} {statistics.mean(times):>8.2f} {max(times):>7.2f} "
+          f"{checkpoints / args.turns:>8.1f} {checkpoint_seconds / max(checkpoints, 1) * 1000:>8.2f}")
+    return client.generated, statistics.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--reply-tokens", type=int, default=1500)
+    parser.add_argument("--tokens-per-sec", type=float, default=3000)
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--backoff", type=float, default=0.05, help="scheduler base backoff in seconds")
+    parser.add_argument("--fault-rates", type=float, nargs="+", default=[0.0, 0.3, 0.6])
+    args = parser.parse_args()
+
+    print(f"{'faults':>6} {'mode':>8} {'done':>9} {'generated':>10} {'wasted':>8} {'re-sent':>8} "
+          f"{'mean s':>8} {'max s':>7} {'ckpt/turn':>9} {'ckpt ms':>8}")
+    for fault_rate in args.fault_rates:
+        restart_tokens, restart_time = run("restart", args, fault_rate)
+        resume_tokens, resume_time = run("resume", args, fault_rate)
+        print(f"{'':>6} resume saves {1 - resume_tokens / restart_tokens:.0%} of generated tokens, "
+              f"{1 - resume_time / restart_time:.0%} of mean time to completion")
+
+
+if __name__ == "__main__":
+    main()
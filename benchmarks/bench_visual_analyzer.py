@@ -0,0 +1,100 @@
+"""
+Benchmark: choosing visual sections and prompts before image generation.
+
+Builds synthetic plans (13 sections, --pages pages) and compares:
+  llm excerpt - the old analysis: one text-model call over plan_text[:10000],
+                against the offline stand-in (--text-latency seconds per call)
+  local cold  - visual_analyzer.analyze_plan with an empty parse cache
+  local warm  - visual_analyzer.analyze_plan on a plan already parsed for review
+Reports time to the first image request, how many of the plan's sections the
+analysis could see, and how many visuals it proposed.
+
+Usage:
+    python benchmarks/bench_visual_analyzer.py [--pages 10 60 100] [--repeat 5] [--text-latency 0.5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import image_generator, model_client, plan_parser, prompts, visual_analyzer
+
+MODEL = "models/offline-flash"
+WORDS_PER_PAGE = 500
+EXCERPT_CHARS = 10000
+SENTENCE = "Zephyr Orchards grows organic apples in Kent for regional retailers and cafes. "
+
+
+def synthetic_plan(pages):
+    sections = prompts.PLAN_SECTIONS
+    words_per_section = pages * WORDS_PER_PAGE // len(sections)
+    parts = []
+    for section in sections:
+        parts.append(f"# {section['name']}\n")
+        words = 0
+        sub = 0
+        while words < words_per_section:
+            sub += 1
+            parts.append(f"## {section['name']} {sub}\n")
+            parts.append(SENTENCE * 6 + "\n\n" + f"Our {section['name'].lower()} work covers the product, the team "
+                         "and the orchard site, with a timeline of milestones.\n")
+            parts.append("- Packaging and delivery to **regional** stores\n- Equipment for the farm kitchen\n")
+            words += 110
+    return "\n".join(parts)
+
+
+def llm_excerpt_analysis(plan_text, visual_style, client):
+    analysis_prompt = (
+        "Analyze the following Business Plan text and identify 10 key sections that would benefit from visual "
+        f"illustrations. Write an image prompt for each in the visual style '{visual_style}'. Return the result "
+        'strictly as a JSON object: {"visuals": [{"section": "...", "prompt": "..."}]}\n\n'
+        f"Business Plan Text (Excerpt):\n{plan_text[:EXCERPT_CHARS]}"
+    )
+    reply = client.generate_text(MODEL, analysis_prompt)
+    return image_generator._parse_json_reply(reply).get("visuals", [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 60, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--text-latency", type=float, default=0.5)
+    parser.add_argument("--style", default="Photorealistic")
+    args = parser.parse_args()
+
+    client = model_client.OfflineClient(ttft=0, text_latency=args.text_latency, seed=1)
+
+    print(f"{'pages':>6} {'mode':>12} {'ms':>9} {'sections seen':>14} {'visuals':>8}")
+    for pages in args.pages:
+        plan_text = synthetic_plan(pages)
+        total = len(plan_parser.parse_plan(plan_text).sections)
+        seen_by_excerpt = len(plan_parser.parse_plan(plan_text[:EXCERPT_CHARS]).sections)
+
+        def best(fn, before=None):
+            fastest, result = None, None
+            for _ in range(args.repeat):
+                if before:
+                    before()
+                start = time.perf_counter()
+                result = fn()
+                elapsed = time.perf_counter() - start
+                fastest = elapsed if fastest is None else min(fastest, elapsed)
+            return fastest, result
+
+        llm_seconds, llm_visuals = best(lambda: llm_excerpt_analysis(plan_text, args.style, client))
+        cold_seconds, items = best(lambda: visual_analyzer.analyze_plan(plan_text, args.style), plan_parser.clear_cache)
+        plan_parser.parse_plan(plan_text)
+        warm_seconds, items = best(lambda: visual_analyzer.analyze_plan(plan_text, args.style))
+        rows = [
+            ("llm excerpt", llm_seconds, f"{seen_by_excerpt}/{total}", len(llm_visuals)),
+            ("local cold", cold_seconds, f"{total}/{total}", len(items)),
+            ("local warm", warm_seconds, f"{total}/{total}", len(items)),
+        ]
+        for mode, seconds, seen, visuals in rows:
+            print(f"{pages:>6} {mode:>12} {seconds * 1000:>9.2f} {seen:>14} {visuals:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: sequential vs concurrent visual generation.
+
+Replaces `generate_business_image` with a stub that sleeps for a fixed
+latency, then times `generate_images` with max_workers=1 and with a pool.
+
+Usage:
+    python benchmarks/bench_visual_concurrency.py [--items 10] [--latency 0.5] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from modules import image_generator
+
+
+def stub_generate_business_image(latency):
+    def generate(prompt, style, api_key, **kwargs):
+        time.sleep(latency)
+        return Image.new('RGB', (64, 64), color=(10, 20, 30))
+    return generate
+
+
+def run(items, max_workers):
+    order = []
+    start = time.perf_counter()
+    images = image_generator.generate_images(
+        items,
+        "Photorealistic",
+        api_key="stub",
+        progress_callback=lambda p, text: order.append(text),
+        max_workers=max_workers
+    )
+    elapsed = time.perf_counter() - start
+    assert list(images) == [item["section"] for item in items], "output order changed"
+    assert len(order) == len(items), "progress callback missed items"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5, help="stubbed seconds per image")
+    parser.add_argument("--workers", type=int, default=image_generator.DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+
+    image_generator.generate_business_image = stub_generate_business_image(args.latency)
+    items = [{"section": f"Section {i+1}", "prompt": f"Prompt {i+1}"} for i in range(args.items)]
+
+    sequential = run(items, max_workers=1)
+    concurrent = run(items, max_workers=args.workers)
+
+    print(f"items={args.items} latency={args.latency}s workers={args.workers}")
+    print(f"sequential: {sequential:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s")
+    print(f"speedup:    {sequential / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Stress test: many processes saving sessions to one SQLite session store.
+
+Each worker process owns a set of session IDs and plays a consultation
+through save_session (one save per user turn and per assistant turn, as
+app.py does). Afterwards the parent reloads every session and checks that
+no message or field was lost or corrupted, then runs an integrity check.
+
+Usage:
+    python benchmarks/stress_session_store.py [--processes 8] [--sessions 25] [--turns 20]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import state_manager
+
+
+def session_ids(worker, sessions):
+    return [f"worker{worker:03d}session{s:04d}" for s in range(sessions)]
+
+
+def expected_message(session_id, index):
+    role = "user" if index % 2 == 0 else "assistant"
+    return {"role": role, "content": f"{session_id} message {index} " + "x" * (index * 37 % 500)}
+
+
+def worker(db_path, worker_index, sessions, turns):
+    state_manager.set_backend(state_manager.SQLiteBackend(db_path))
+    states = {}
+    for session_id in session_ids(worker_index, sessions):
+        states[session_id] = {"session_id": session_id, "messages": []}
+
+    # Interleave sessions so writes from all workers overlap
+    for turn in range(turns):
+        for session_id, session in states.items():
+            state_manager.st = types.SimpleNamespace(session_state=session)
+            for offset in range(2):
+                session["messages"].append(expected_message(session_id, turn * 2 + offset))
+                if turn == turns - 1 and offset == 1:
+                    session["plan_generated"] = True
+                    session["generated_plan_text"] = f"plan for {session_id}"
+                state_manager.save_session()
+
+
+def verify(db_path, processes, sessions, turns):
+    backend = state_manager.SQLiteBackend(db_path)
+    failures = 0
+    for worker_index in range(processes):
+        for session_id in session_ids(worker_index, sessions):
+            data = backend.load(session_id)
+            expected = [expected_message(session_id, i) for i in range(turns * 2)]
+            if not data or data.get("messages") != expected:
+                failures += 1
+            elif data.get("generated_plan_text") != f"plan for {session_id}" or data.get("plan_generated") is not True:
+                failures += 1
+    with sqlite3.connect(db_path) as conn:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    return failures, integrity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=25, help="sessions per process")
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    state_manager.SQLiteBackend(db_path) # Create schema once up front
+
+    start = time.perf_counter()
+    workers = [
+        multiprocessing.Process(target=worker, args=(db_path, i, args.sessions, args.turns))
+        for i in range(args.processes)
+    ]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    crashed = sum(1 for p in workers if p.exitcode != 0)
+    failures, integrity = verify(db_path, args.processes, args.sessions, args.turns)
+    total_sessions = args.processes * args.sessions
+    saves = total_sessions * args.turns * 2
+
+    print(f"processes={args.processes} sessions={total_sessions} saves={saves}")
+    print(f"elapsed: {elapsed:.2f}s ({saves / elapsed:.0f} saves/s)")
+    print(f"crashed workers: {crashed}")
+    print(f"lost or corrupted sessions: {failures}")
+    print(f"integrity_check: {integrity}")
+    if crashed or failures or integrity != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
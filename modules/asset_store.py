@@ -0,0 +1,361 @@
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from PIL import Image
+from modules import export_assets
+
+# Directory holding asset blobs (share it between worker processes)
+ASSET_DIR = os.environ.get("GRANT_ARCHITECT_ASSET_DIR", os.path.join(".cache", "assets"))
+# Decoded assets one session may keep in memory before its least recently used are dropped
+SESSION_BUDGET_BYTES = int(os.environ.get("GRANT_ARCHITECT_SESSION_MEMORY_BYTES", 32 * 1024 * 1024))
+# Decoded assets all sessions in this process may keep in memory together
+PROCESS_BUDGET_BYTES = int(os.environ.get("GRANT_ARCHITECT_PROCESS_MEMORY_BYTES", 512 * 1024 * 1024))
+# Blobs kept on disk before the least recently used are deleted
+DISK_BUDGET_BYTES = int(os.environ.get("GRANT_ARCHITECT_ASSET_DISK_BYTES", 2 * 1024 * 1024 * 1024))
+
+ASSET_SUFFIX = ".asset"
+
+def _image_bytes(img):
+    """Approximate memory held by a decoded image."""
+    return img.width * img.height * len(img.getbands())
+
+class AssetStore:
+    """
+    Keeps image and text blobs on disk and decodes them on demand.
+
+    Session state holds only asset IDs (content hashes of the stored bytes).
+    Loading an asset decodes it and keeps the result resident under two
+    budgets: one per session and one for the whole process. When either is
+    exceeded the least recently used decoded assets are dropped ("spilled");
+    their bytes are already on disk, so the next load just decodes them again.
+
+    Blobs are written once (temp file plus os.replace) and never modified, so
+    several Streamlit workers can share one directory. As in ImageCache,
+    recency is tracked through file mtimes (storing or loading a blob touches
+    it), and once the directory exceeds disk_budget every process deletes the
+    least recently used blobs. An evicted image loads as None until its
+    visuals are generated again; plan texts are also kept in the session backend
+    (state_manager.PLAN_TEXT_FIELD), which stores them again on a miss.
+    """
+
+    def __init__(self, directory=ASSET_DIR, session_budget=SESSION_BUDGET_BYTES, process_budget=PROCESS_BUDGET_BYTES,
+                 disk_budget=DISK_BUDGET_BYTES):
+        self.directory = directory
+        self.session_budget = session_budget
+        self.process_budget = process_budget
+        self.disk_budget = disk_budget
+        self._lock = threading.Lock()
+        self._resident = OrderedDict() # (session_id, asset_id) -> (value, nbytes), least recently used first
+        self._session_bytes = {}
+        self._counters = {"hits": 0, "loads": 0, "spills": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, asset_id):
+        return os.path.join(self.directory, asset_id + ASSET_SUFFIX)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    # --- Storing ---
+
+    def put_bytes(self, data):
+        """
+        Stores encoded bytes and returns their asset ID.
+
+        Identical content is stored once, whichever session or worker wrote it first.
+        """
+        asset_id = hashlib.sha256(data).hexdigest()
+        path = self._path(asset_id)
+        if self._touch(asset_id):
+            return asset_id
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._count("stores")
+        self.evict(keep=asset_id)
+        return asset_id
+
+    def put_file(self, path):
+        """Stores the bytes of an encoded file (e.g. a PNG written by a job) and returns the asset ID."""
+        with open(path, "rb") as f:
+            return self.put_bytes(f.read())
+
+    def put_image(self, img, session_id=None):
+        """
+        Stores a PIL image as PNG and returns the asset ID.
+
+        With a session_id the decoded image stays resident for that session,
+        so a caller that already holds it does not pay for decoding it again.
+        """
+        stream = io.BytesIO()
+        img.save(stream, format="PNG", compress_level=1)
+        asset_id = self.put_bytes(stream.getvalue())
+        if session_id is not None:
+            self._keep(session_id, asset_id, img, _image_bytes(img))
+        return asset_id
+
+    def put_text(self, text, session_id=None):
+        """Stores text as UTF-8 and returns the asset ID (resident for session_id if given)."""
+        asset_id = self.put_bytes(text.encode("utf-8"))
+        if session_id is not None:
+            self._keep(session_id, asset_id, text, sys.getsizeof(text))
+        return asset_id
+
+    # --- Disk budget ---
+
+    def _touch(self, asset_id):
+        """Marks a blob as recently used; False if it is not on disk."""
+        try:
+            os.utime(self._path(asset_id), None)
+            return True
+        except OSError:
+            return False
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(ASSET_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue # Removed by another worker
+            entries.append((st.st_mtime, st.st_size, entry.name[:-len(ASSET_SUFFIX)]))
+        return entries
+
+    def evict(self, keep=None):
+        """Deletes least-recently-used blobs (never `keep`) until the directory fits disk_budget."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.disk_budget:
+            return
+        entries.sort()
+        for _, size, asset_id in entries:
+            if total <= self.disk_budget:
+                break
+            if asset_id == keep:
+                continue
+            try:
+                os.remove(self._path(asset_id))
+                self._count("evictions")
+            except FileNotFoundError:
+                pass # Another worker evicted it first
+            total -= size
+
+    # --- Loading ---
+
+    def _lookup(self, session_id, asset_id):
+        self._touch(asset_id) # Resident or not, the blob is in use
+        with self._lock:
+            entry = self._resident.get((session_id, asset_id))
+            if entry is None:
+                self._counters["loads"] += 1
+                return None
+            self._resident.move_to_end((session_id, asset_id))
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def _read(self, asset_id):
+        try:
+            with open(self._path(asset_id), "rb") as f:
+                return f.read()
+        except OSError as e:
+            print(f"Error reading asset {asset_id}: {e}")
+            return None
+
+    def load_image(self, asset_id, session_id=None):
+        """Returns the decoded image for asset_id, or None if it cannot be read."""
+        img = self._lookup(session_id, asset_id)
+        if img is not None:
+            return img
+        try:
+            with Image.open(self._path(asset_id)) as img:
+                img.load()
+        except Exception as e:
+            print(f"Error loading asset {asset_id}: {e}")
+            return None
+        self._keep(session_id, asset_id, img, _image_bytes(img))
+        return img
+
+    def load_bytes(self, asset_id, session_id=None):
+        """Returns the stored bytes of asset_id as they are (e.g. an encoded preview), or None."""
+        data = self._lookup(session_id, asset_id)
+        if data is not None:
+            return data
+        data = self._read(asset_id)
+        if data is not None:
+            self._keep(session_id, asset_id, data, len(data))
+        return data
+
+    def load_text(self, asset_id, session_id=None):
+        """Returns the text stored as asset_id, or None if it cannot be read."""
+        text = self._lookup(session_id, asset_id)
+        if text is not None:
+            return text
+        data = self._read(asset_id)
+        if data is None:
+            return None
+        text = data.decode("utf-8")
+        self._keep(session_id, asset_id, text, sys.getsizeof(text))
+        return text
+
+    # --- Residency ---
+
+    def _keep(self, session_id, asset_id, value, nbytes):
+        """Makes a decoded asset resident, then spills least recently used ones over budget."""
+        key = (session_id, asset_id)
+        with self._lock:
+            previous = self._resident.pop(key, None)
+            if previous is not None:
+                self._session_bytes[session_id] -= previous[1]
+            self._resident[key] = (value, nbytes)
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + nbytes
+
+            # The asset just loaded is in use, so it is never the one spilled
+            if self._session_bytes[session_id] > self.session_budget:
+                for other in [k for k in self._resident if k[0] == session_id and k != key]:
+                    if self._session_bytes[session_id] <= self.session_budget:
+                        break
+                    self._spill(other)
+            total = sum(self._session_bytes.values())
+            for other in list(self._resident):
+                if total <= self.process_budget:
+                    break
+                if other != key:
+                    total -= self._spill(other)
+
+    def _spill(self, key):
+        _, nbytes = self._resident.pop(key)
+        self._session_bytes[key[0]] -= nbytes
+        if not self._session_bytes[key[0]]:
+            del self._session_bytes[key[0]]
+        self._counters["spills"] += 1
+        return nbytes
+
+    def release_session(self, session_id):
+        """Drops every decoded asset held for a session (its blobs stay on disk)."""
+        with self._lock:
+            for key in [k for k in self._resident if k[0] == session_id]:
+                _, nbytes = self._resident.pop(key)
+                self._session_bytes[session_id] -= nbytes
+            self._session_bytes.pop(session_id, None)
+
+    def resident_bytes(self, session_id=None):
+        """Decoded bytes held for one session, or for the whole process when session_id is None."""
+        with self._lock:
+            if session_id is None:
+                return sum(self._session_bytes.values())
+            return self._session_bytes.get(session_id, 0)
+
+    def stats(self):
+        """
+        Returns residency per session and process-wide counters.
+
+        Returns:
+            dict: resident_bytes, session_budget, process_budget, hits, loads,
+            spills, stores, evictions, disk_bytes, disk_entries, disk_budget and
+            sessions ({session_id: {"resident_bytes", "assets"}}).
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            sessions = {}
+            for session_id, _ in self._resident:
+                sessions.setdefault(session_id, {"resident_bytes": self._session_bytes[session_id], "assets": 0})
+                sessions[session_id]["assets"] += 1
+            stats["resident_bytes"] = sum(self._session_bytes.values())
+        stats["session_budget"] = self.session_budget
+        stats["process_budget"] = self.process_budget
+        entries = self._entries()
+        stats["disk_bytes"] = sum(size for _, size, _ in entries)
+        stats["disk_entries"] = len(entries)
+        stats["disk_budget"] = self.disk_budget
+        stats["sessions"] = sessions
+        return stats
+
+class ImageSet(Mapping):
+    """
+    Section name -> image, backed by the asset store.
+
+    Holds only asset IDs, so keeping it in st.session_state costs a few
+    bytes per image; images are decoded when looked up, under the session's
+    memory budget. Iteration order is the order the images were added.
+
+    Each image may also have a small encoded preview (see preview()), which
+    the gallery shows without decoding the full image.
+    """
+
+    def __init__(self, session_id, asset_ids=None, preview_ids=None):
+        self.session_id = session_id
+        self._asset_ids = OrderedDict(asset_ids or ())
+        self._preview_ids = dict(preview_ids or ())
+
+    @classmethod
+    def from_images(cls, session_id, images):
+        """Stores a dict of PIL images (and their info['preview'] bytes, if any) and returns the equivalent ImageSet."""
+        store = get_store()
+        asset_ids = [(name, store.put_image(img, session_id)) for name, img in images.items()]
+        preview_ids = [(name, store.put_bytes(img.info["preview"])) for name, img in images.items() if img.info.get("preview")]
+        return cls(session_id, asset_ids, preview_ids)
+
+    def preview(self, name):
+        """
+        Returns the JPEG preview of an image, or None if the image cannot be read.
+
+        Images stored without one get it built from the full image once.
+        """
+        store = get_store()
+        preview_id = self._preview_ids.get(name)
+        if preview_id is None:
+            img = self.get(name)
+            if img is None:
+                return None
+            preview_id = self._preview_ids[name] = store.put_bytes(export_assets.encode_preview(img))
+        return store.load_bytes(preview_id, self.session_id)
+
+    def asset_id(self, name):
+        """Asset ID of an image (a stable key for its content), or None."""
+        return self._asset_ids.get(name)
+
+    def asset_ids(self):
+        return list(self._asset_ids.items())
+
+    def __getitem__(self, name):
+        img = get_store().load_image(self._asset_ids[name], self.session_id)
+        if img is None:
+            raise KeyError(name)
+        return img
+
+    def __iter__(self):
+        return iter(self._asset_ids)
+
+    def __len__(self):
+        return len(self._asset_ids)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Returns the process-wide AssetStore, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AssetStore()
+        return _store
+
+def set_store(store):
+    """Replaces the process-wide AssetStore (e.g. for batch jobs or benchmarks)."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from modules import request_scheduler
+
+# Token budget for conversation history sent with each chat turn (system prompt excluded)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("GRANT_ARCHITECT_CONTEXT_TOKENS", 4000))
+# A single message in the recent window is clipped to this many tokens
+MAX_MESSAGE_TOKENS = int(os.environ.get("GRANT_ARCHITECT_MAX_MESSAGE_TOKENS", 1500))
+# Upper bound on the rolling summary of older turns
+SUMMARY_TOKENS = 800
+# Token counts remembered for longer texts (keyed by digest, so the texts are not kept)
+TOKEN_CACHE_SIZE = 4096
+# Texts shorter than this are counted directly; hashing them would cost about as much
+TOKEN_CACHE_MIN_CHARS = 1024
+
+SUMMARY_HEADING = "### Consultation Summary (earlier meetings)"
+
+EMPTY_SUMMARY = {"covered": 0, "text": ""}
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_token_counts = OrderedDict() # (digest, length) -> count, least recently used first
+_token_counts_lock = threading.Lock()
+
+def count_tokens(text):
+    """
+    Estimates the token count of a text without calling the API.
+
+    Counts words and punctuation marks, and never less than one token per
+    four characters, which tracks Gemini's tokenizer closely for English prose.
+    Counts of longer texts are memoised under a digest of the text and its
+    length, so the cache stays a few hundred kilobytes however long the texts are.
+    """
+    if not text:
+        return 0
+    if len(text) < TOKEN_CACHE_MIN_CHARS:
+        return max(len(_TOKEN_PATTERN.findall(text)), len(text) // 4)
+    key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), len(text))
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+        if count is not None:
+            _token_counts.move_to_end(key)
+            return count
+    count = max(len(_TOKEN_PATTERN.findall(text)), len(text) // 4)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        while len(_token_counts) > TOKEN_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+def clip_text(text, max_tokens):
+    """Keeps the head and tail of a text so it fits in roughly `max_tokens` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max_tokens * 4 # characters, matching the lower bound in count_tokens
+    head, tail = text[:keep * 2 // 3], text[-(keep // 3):]
+    return f"{head}\n\n[... {count_tokens(text) - max_tokens} tokens omitted ...]\n\n{tail}"
+
+def extractive_summary(previous_summary, messages, max_tokens=SUMMARY_TOKENS):
+    """
+    Offline fallback summariser: keeps the first sentence of each new turn.
+
+    Used when the model is unavailable so older facts are still carried forward.
+    """
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        first = re.split(r"(?<=[.!?])\s", message["content"].strip(), maxsplit=1)[0]
+        speaker = "Client" if message["role"] == "user" else "Consultant"
+        lines.append(f"- {speaker}: {clip_text(first, 60)}")
+    summary = "\n".join(lines)
+    while count_tokens(summary) > max_tokens and len(lines) > 1:
+        lines.pop(0 if not previous_summary else 1) # Drop the oldest bullet
+        summary = "\n".join(lines)
+    return clip_text(summary, max_tokens)
+
+def summary_prompt(previous_summary, messages, max_tokens=SUMMARY_TOKENS):
+    """Builds the prompt asking the model to fold new turns into the running summary."""
+    turns = "\n\n".join(
+        f"{'Client' if m['role'] == 'user' else 'Consultant'}: {clip_text(m['content'], MAX_MESSAGE_TOKENS)}"
+        for m in messages
+    )
+    return f"""
+    You maintain the running summary of a business plan consultation.
+    Update the summary below with the new conversation turns. Keep every concrete fact:
+    business name, people, locations, figures, funding amounts, decisions and open questions.
+    Write concise bullet points, at most {max_tokens} tokens in total.
+
+    Current summary:
+    {previous_summary or "(none yet)"}
+
+    New turns:
+    {turns}
+    """
+
+def model_summarizer(client, api_key, model_name):
+    """Returns a summarize(previous_summary, messages) callable backed by the chat model."""
+    def summarize(previous_summary, messages):
+        prompt = summary_prompt(previous_summary, messages)
+        return request_scheduler.get_scheduler().submit(
+            lambda: client.generate_text(model_name, prompt),
+            api_key,
+            model_name,
+            priority=request_scheduler.PRIORITY_INTERACTIVE
+        )
+    return summarize
+
+class ContextBuilder:
+    """
+    Packs chat history into a token budget for each model request.
+
+    The most recent messages are kept verbatim (each clipped to
+    `max_message_tokens`), newest first, until the budget is spent. Older
+    messages are folded into a rolling summary that is carried in the system
+    instruction. The summary only advances when the window overflows, and it then
+    catches up to half the budget, so it is recomputed every few turns
+    rather than on every request.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, max_message_tokens=MAX_MESSAGE_TOKENS,
+                 summary_tokens=SUMMARY_TOKENS, summarize=None):
+        self.budget = budget
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        # summarize(previous_summary, messages) -> str; falls back to extractive_summary
+        self.summarize = summarize
+
+    def _window_start(self, messages, limit):
+        """Index of the oldest message that fits in `limit` tokens, counting back from the newest."""
+        used = 0
+        start = len(messages)
+        for index in range(len(messages) - 1, -1, -1):
+            cost = count_tokens(clip_text(messages[index]["content"], self.max_message_tokens))
+            if used + cost > limit and start < len(messages):
+                break
+            used += cost
+            start = index
+        return start
+
+    def _update_summary(self, summary_state, messages, cutoff):
+        new_messages = messages[summary_state["covered"]:cutoff]
+        if not new_messages:
+            return summary_state
+        text = None
+        if self.summarize:
+            try:
+                text = self.summarize(summary_state["text"], new_messages)
+            except Exception as e:
+                print(f"Error summarising history, using extractive summary: {e}")
+        if not text:
+            text = extractive_summary(summary_state["text"], new_messages, self.summary_tokens)
+        return {"covered": cutoff, "text": clip_text(text.strip(), self.summary_tokens)}
+
+    def build(self, messages, summary_state=None, system_prompt=""):
+        """
+        Assembles the request context for the next turn.
+
+        Args:
+            messages (list): Chat history as {"role", "content"} dicts, newest last.
+            summary_state (dict): Previous rolling summary ({"covered", "text"}), or None.
+            system_prompt (str): Base system instruction.
+
+        Returns:
+            tuple: (system_instruction, history, summary_state, report). `history`
+            is Gemini-style contents, `summary_state` should be stored for the
+            next turn, and `report` holds token counts for this request.
+        """
+        summary_state = dict(summary_state or EMPTY_SUMMARY)
+        if summary_state["covered"] > len(messages):
+            summary_state = dict(EMPTY_SUMMARY) # History was reset
+        summarised = False
+
+        history_budget = self.budget - (self.summary_tokens if summary_state["covered"] else 0)
+        start = max(self._window_start(messages, history_budget), summary_state["covered"])
+        if start > summary_state["covered"]:
+            # Overflow: fold older turns into the summary, leaving room to grow
+            cutoff = max(self._window_start(messages, (self.budget - self.summary_tokens) // 2), start)
+            summary_state = self._update_summary(summary_state, messages, cutoff)
+            start = cutoff
+            summarised = True
+
+        history = []
+        for msg in messages[start:]:
+            role = "user" if msg["role"] == "user" else "model"
+            history.append({"role": role, "parts": [clip_text(msg["content"], self.max_message_tokens)]})
+
+        system_instruction = system_prompt
+        if summary_state["text"]:
+            system_instruction = f"{system_prompt}\n\n{SUMMARY_HEADING}\n{summary_state['text']}"
+
+        history_tokens = sum(count_tokens(entry["parts"][0]) for entry in history)
+        system_tokens = count_tokens(system_instruction)
+        report = {
+            "prompt_tokens": history_tokens + system_tokens,
+            "history_tokens": history_tokens,
+            "system_tokens": system_tokens,
+            "summary_tokens": count_tokens(summary_state["text"]),
+            "messages_included": len(history),
+            "messages_summarised": summary_state["covered"],
+            "summarised": summarised
+        }
+        return system_instruction, history, summary_state, report
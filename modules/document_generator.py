@@ -1,47 +1,123 @@
+import hashlib
 import io
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
 from docx import Document
 from docx.shared import Inches, RGBColor, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from modules import export_assets, image_matcher, metrics, plan_parser
 
-def generate_docx(business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets):
-    """
-    Generates a formatted Business Plan .docx file.
+# Display widths used for embedded images (the widths export_assets encodes for)
+COVER_IMAGE_WIDTH = Inches(export_assets.COVER_WIDTH_IN)
+SECTION_IMAGE_WIDTH = Inches(export_assets.SECTION_WIDTH_IN)
+# Text width of the default template (8.5in page, 1.25in margins), in twips
+BODY_WIDTH_TWIPS = 8640
+# Deepest heading style in the default template
+MAX_HEADING_LEVEL = 9
+# Rendered top-level sections kept for re-export after edits or restyling
+MAX_CACHED_FRAGMENTS = 256
 
-    Args:
-        business_name (str): Name of the business.
-        slogan (str): Business slogan.
-        plan_text (str): The full markdown-like text of the business plan.
-        theme_color (str): Selected color theme ('Corporate Blue', 'Eco Green', etc.).
-        generated_images (dict): Dictionary of PIL Image objects keyed by section name.
-        use_3d_assets (bool): Whether to include 3D assets for specific sections.
+# Design Studio colour themes: heading colour as (red, green, blue); others use black
+THEME_COLORS = {
+    'Corporate Blue': (0, 0, 128),
+    'Eco Green': (34, 139, 34),
+    'Vibrant Startup': (255, 69, 0), # Orange-Red
+}
 
-    Returns:
-        io.BytesIO: A text stream containing the document.
+# Design Studio font styles: (body font, heading font)
+FONT_STYLES = {
+    'Serif (Classic)': ('Georgia', 'Georgia'),
+    'Sans-Serif (Modern)': ('Calibri', 'Calibri'),
+    'Slab (Bold)': ('Rockwell', 'Rockwell'),
+}
+
+_COMPILE_SECONDS = metrics.histogram("grant_architect_docx_compile_seconds", "Compiling the business plan .docx")
+
+def _heading_color(theme_color):
+    """Maps a Design Studio theme name to the heading RGBColor."""
+    return RGBColor(*THEME_COLORS.get(theme_color, (0, 0, 0)))
+
+def _set_style_font(style, font_name):
+    """Sets a style's font, dropping the template's theme-font references that would override it."""
+    style.font.name = font_name
+    rfonts = style.element.rPr.rFonts
+    for attr in ('w:asciiTheme', 'w:hAnsiTheme', 'w:eastAsiaTheme', 'w:cstheme'):
+        rfonts.attrib.pop(qn(attr), None)
+
+def _apply_design(doc, heading_color, font_style):
     """
-    doc = Document()
+    Applies the theme colour and font style through the document's styles.
 
-    # defined styles
-    styles = doc.styles
-    
-    # Analyze Theme Color
-    heading_color = RGBColor(0, 0, 0) # Default Black
-    if theme_color == 'Corporate Blue':
-        heading_color = RGBColor(0, 0, 128)
-    elif theme_color == 'Eco Green':
-        heading_color = RGBColor(34, 139, 34)
-    elif theme_color == 'Vibrant Startup':
-        heading_color = RGBColor(255, 69, 0) # Orange-Red
+    Heading paragraphs only reference their style, so the body XML does not
+    depend on the design and a theme or font change only rewrites styles.xml.
+    """
+    fonts = FONT_STYLES.get(font_style)
+    if fonts:
+        _set_style_font(doc.styles['Normal'], fonts[0])
+    for level in range(1, MAX_HEADING_LEVEL + 1):
+        style = doc.styles[f'Heading {level}']
+        style.font.color.rgb = heading_color
+        if fonts:
+            _set_style_font(style, fonts[1])
 
-    # --- COVER PAGE ---
+def _section_images(plan, placement_plan):
+    """Maps the start offset of each section that gets an image to the image key."""
+    return {plan.sections[p.heading_index].start: p.key for p in placement_plan.placements}
+
+def _encode_asset(generated_images, name, width):
+    """Encodes generated_images[name] for display at width (see export_assets.encode_asset), or returns None."""
+    return export_assets.encode_asset(generated_images, name, width.inches)
+
+def _list_style(ordered, depth):
+    """Returns the template (style name, style id) for a list item at the given depth."""
+    name = 'List Number' if ordered else 'List Bullet'
+    if depth:
+        name = f'{name} {depth + 1}'
+    return name, name.replace(' ', '')
+
+def _table_header(table):
+    """Header cells of a parsed table with every run made bold."""
+    return tuple(tuple(run._replace(bold=True) for run in cell) for cell in table.header)
+
+def _add_runs(paragraph, runs):
+    for run in runs:
+        if not run.text:
+            continue
+        docx_run = paragraph.add_run(run.text)
+        if run.bold:
+            docx_run.bold = True
+        if run.italic:
+            docx_run.italic = True
+
+def _add_block(doc, block):
+    """Adds one parsed plan block (paragraph, list, table, quote or code) to doc."""
+    if isinstance(block, plan_parser.Paragraph):
+        _add_runs(doc.add_paragraph(), block.runs)
+    elif isinstance(block, plan_parser.ListBlock):
+        for depth, runs in block.items:
+            _add_runs(doc.add_paragraph(style=_list_style(block.ordered, depth)[0]), runs)
+    elif isinstance(block, plan_parser.Table):
+        table = doc.add_table(rows=len(block.rows) + 1, cols=len(block.header))
+        table.style = 'Table Grid'
+        for row_cells, cells in zip(table.rows, (_table_header(block),) + block.rows):
+            for cell, runs in zip(row_cells.cells, cells):
+                _add_runs(cell.paragraphs[0], runs)
+    elif isinstance(block, plan_parser.Quote):
+        _add_runs(doc.add_paragraph(style='Quote'), block.runs)
+    elif isinstance(block, plan_parser.CodeBlock):
+        for line in block.text.split('\n'):
+            doc.add_paragraph(line, style='macro') # Template name of the MacroText style
+
+def _add_cover_page(doc, business_name, slogan, heading_color, cover_image):
+    """Adds the encoded cover image (if any), business name, slogan and a page break to doc."""
     # 1. Insert Cover Page Image
-    cover_img = generated_images.get('The Cover Page') or generated_images.get('Cover Page')
-    if cover_img:
-        # Save PIL image to bytes
-        img_stream = io.BytesIO()
-        cover_img.save(img_stream, format='PNG')
-        img_stream.seek(0)
-        doc.add_picture(img_stream, width=Inches(6))
+    if cover_image:
+        doc.add_picture(io.BytesIO(cover_image.data), width=COVER_IMAGE_WIDTH)
         last_paragraph = doc.paragraphs[-1] 
         last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
@@ -63,36 +139,56 @@ def generate_docx(business_name, slogan, plan_text, theme_color, generated_image
     
     doc.add_page_break()
 
-    # --- CONTENT PARSING ---
-    # Simple parser assuming Markdown-style headers (#, ##)
-    lines = plan_text.split('\n')
+@metrics.timed(_COMPILE_SECONDS)
+def generate_docx(business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets, font_style=None):
+    """
+    Generates a formatted Business Plan .docx file.
+
+    Args:
+        business_name (str): Name of the business.
+        slogan (str): Business slogan.
+        plan_text (str): The full markdown-like text of the business plan.
+        theme_color (str): Selected color theme ('Corporate Blue', 'Eco Green', etc.).
+        generated_images (Mapping): PIL images keyed by section name (a dict or asset_store.ImageSet).
+        use_3d_assets (bool): Whether to include 3D assets for specific sections.
+        font_style (str): Design Studio font style (a FONT_STYLES key); None keeps the template fonts.
+
+    Returns:
+        io.BytesIO: A text stream containing the document.
+    """
+    doc = Document()
+
+    # defined styles
+    styles = doc.styles
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('# '):
-            # Heading 1
-            text = line[2:].strip()
-            p = doc.add_heading(text, level=1)
-            for run in p.runs:
-                run.font.color.rgb = heading_color
-            
-            # Check for Image Insertion matches
-            # We check if any key in generated_images is contained in the header text
-            # This is a fuzzy match approach
-            for section_key, img_obj in generated_images.items():
-                if section_key.lower() in text.lower():
-                    # Avoid re-inserting cover page
-                    if 'cover' in section_key.lower():
-                        continue
-                        
-                    img_stream = io.BytesIO()
-                    img_obj.save(img_stream, format='PNG')
-                    img_stream.seek(0)
-                    doc.add_picture(img_stream, width=Inches(5))
-                    break
+    # Analyze Theme Color
+    heading_color = _heading_color(theme_color)
+    _apply_design(doc, heading_color, font_style)
+
+    # --- IMAGE PLACEMENT ---
+    # Each image is placed at most once: the cover, or the best-matching '# ' heading
+    plan = plan_parser.parse_plan(plan_text)
+    placement_plan = image_matcher.match_plan_images(plan, generated_images.keys())
+    section_images = _section_images(plan, placement_plan)
+
+    # --- COVER PAGE ---
+    _add_cover_page(doc, business_name, slogan, heading_color, _encode_asset(generated_images, placement_plan.cover, COVER_IMAGE_WIDTH))
+
+    # --- CONTENT ---
+    # Walk the shared parse: text before the first heading, then every section in order
+    for block in plan.blocks:
+        _add_block(doc, block)
+
+    for section in plan_parser.iter_sections(plan):
+        text = section.title
+        doc.add_heading(text, level=min(section.level, MAX_HEADING_LEVEL))
+
+        if section.level == 1:
+            # Insert the image assigned to this heading, if any
+            section_key = section_images.get(section.start)
+            encoded = _encode_asset(generated_images, section_key, SECTION_IMAGE_WIDTH) if section_key is not None else None
+            if encoded is not None:
+                doc.add_picture(io.BytesIO(encoded.data), width=SECTION_IMAGE_WIDTH)
             
             # Check for 3D Assets
             if use_3d_assets:
@@ -105,19 +201,247 @@ def generate_docx(business_name, slogan, plan_text, theme_color, generated_image
                     # The prompt implies we *insert* them. I'll check if there's an image for it.
                     pass
 
-        elif line.startswith('## '):
-            # Heading 2
-            text = line[3:].strip()
-            p = doc.add_heading(text, level=2)
-            for run in p.runs:
-                run.font.color.rgb = heading_color
-                
-        else:
-            # Normal Text
-            doc.add_paragraph(line)
+        for block in section.blocks:
+            _add_block(doc, block)
 
     # Save to IO stream
     file_stream = io.BytesIO()
     doc.save(file_stream)
     file_stream.seek(0)
     return file_stream
+
+# --- STREAMING EXPORT ---
+# Parts of the skeleton package that write_docx regenerates itself
+_DOCUMENT_PART = 'word/document.xml'
+_DOCUMENT_RELS_PART = 'word/_rels/document.xml.rels'
+_CONTENT_TYPES_PART = '[Content_Types].xml'
+# Images are already compressed; storing them skips a deflate pass per export
+_MEDIA_PREFIX = 'word/media/'
+_IMAGE_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+# Characters that are not allowed in XML 1.0 text
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_PICTURE_XML = (
+    '<w:p><w:r><w:drawing><wp:inline xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{shape_id}" name="Picture {shape_id}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="{filename}"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic>'
+    '</wp:inline></w:drawing></w:r></w:p>'
+)
+
+def _xml_text(text):
+    return escape(_INVALID_XML_CHARS.sub('', text))
+
+def _runs_xml(runs):
+    parts = []
+    for run in runs:
+        if not run.text:
+            continue
+        props = ('<w:b/>' if run.bold else '') + ('<w:i/>' if run.italic else '')
+        if props:
+            props = f'<w:rPr>{props}</w:rPr>'
+        parts.append(f'<w:r>{props}<w:t xml:space="preserve">{_xml_text(run.text)}</w:t></w:r>')
+    return ''.join(parts)
+
+def _paragraph_xml(runs, style_id=None):
+    props = f'<w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>' if style_id else ''
+    return f'<w:p>{props}{_runs_xml(runs)}</w:p>'
+
+def _table_xml(table):
+    """A Table Grid table laid out like python-docx's add_table (equal auto columns)."""
+    width = BODY_WIDTH_TWIPS // len(table.header)
+    cell_props = f'<w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+    parts = [
+        '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+        'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>',
+        f'<w:gridCol w:w="{width}"/>' * len(table.header),
+        '</w:tblGrid>'
+    ]
+    for cells in (_table_header(table),) + table.rows:
+        parts.append('<w:tr>')
+        parts.extend(f'<w:tc>{cell_props}{_paragraph_xml(runs)}</w:tc>' for runs in cells)
+        parts.append('</w:tr>')
+    parts.append('</w:tbl>')
+    return ''.join(parts)
+
+def _block_xml(block):
+    """WordprocessingML for one parsed plan block, matching _add_block."""
+    if isinstance(block, plan_parser.Paragraph):
+        return _paragraph_xml(block.runs)
+    if isinstance(block, plan_parser.ListBlock):
+        return ''.join(_paragraph_xml(runs, _list_style(block.ordered, depth)[1]) for depth, runs in block.items)
+    if isinstance(block, plan_parser.Table):
+        return _table_xml(block)
+    if isinstance(block, plan_parser.Quote):
+        return _paragraph_xml(block.runs, 'Quote')
+    if isinstance(block, plan_parser.CodeBlock):
+        return ''.join(_paragraph_xml((plan_parser.Run(line, False, False),), 'MacroText') for line in block.text.split('\n'))
+    return ''
+
+def _heading_xml(text, level):
+    return (
+        f'<w:p><w:pPr><w:pStyle w:val="Heading{level}"/></w:pPr>'
+        f'<w:r><w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r></w:p>'
+    )
+
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+_fragment_stats = {'hits': 0, 'misses': 0}
+
+def _section_fragment(plan_text, section):
+    """
+    Returns (heading_xml, body_xml) for a top-level section and its subsections.
+
+    Fragments hold no theme, fonts or images (those are applied per document),
+    so they are keyed by the section's source text alone and reused by every
+    export until that section is edited.
+    """
+    key = hashlib.sha1(plan_text[section.start:section.end].encode('utf-8')).hexdigest()
+    with _fragments_lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+            _fragment_stats['hits'] += 1
+            return fragment
+
+    parts = []
+    for node in plan_parser.iter_sections(section):
+        parts.append(_heading_xml(node.title, min(node.level, MAX_HEADING_LEVEL)))
+        parts.extend(_block_xml(block) for block in node.blocks)
+    fragment = (parts[0], ''.join(parts[1:]))
+
+    with _fragments_lock:
+        _fragments[key] = fragment
+        _fragment_stats['misses'] += 1
+        while len(_fragments) > MAX_CACHED_FRAGMENTS:
+            _fragments.popitem(last=False)
+    return fragment
+
+def fragment_cache_stats():
+    """Returns section fragment reuse counters for the streaming exporter."""
+    with _fragments_lock:
+        return {'hits': _fragment_stats['hits'], 'misses': _fragment_stats['misses'], 'entries': len(_fragments)}
+
+def clear_fragment_cache():
+    """Drops all rendered section fragments."""
+    with _fragments_lock:
+        _fragments.clear()
+
+@metrics.timed(_COMPILE_SECONDS)
+def write_docx(output, business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets, font_style=None):
+    """
+    Streams a formatted Business Plan .docx to a file or binary stream.
+
+    Unlike generate_docx, the body is never built as a python-docx object tree.
+    Only the cover page is assembled in memory (to reuse the template styles);
+    section content is written to the zip entry for word/document.xml one
+    section at a time from the shared plan parse, so no second document tree
+    is built. Each top-level section is rendered once and cached by content;
+    theme and font are applied through styles.xml, so re-exporting after a
+    restyle or a one-section edit only renders the sections that changed.
+    Styling matches generate_docx.
+
+    Memory is not bounded independently of plan length: the whole plan parse
+    is held while writing, and the fragment cache keeps the rendered XML of
+    up to MAX_CACHED_FRAGMENTS sections between exports. What is saved is the
+    python-docx tree of the body and a second copy of the document in memory.
+
+    Args:
+        output (str or file): Path or writable binary file object for the .docx.
+        business_name (str): Name of the business.
+        slogan (str): Business slogan.
+        plan_text (str): The full markdown-like text of the business plan.
+        theme_color (str): Selected color theme ('Corporate Blue', 'Eco Green', etc.).
+        generated_images (Mapping): PIL images keyed by section name (a dict or asset_store.ImageSet).
+        use_3d_assets (bool): Whether to include 3D assets for specific sections.
+        font_style (str): Design Studio font style (a FONT_STYLES key); None keeps the template fonts.
+
+    Returns:
+        str or file: The output that was written to.
+    """
+    heading_color = _heading_color(theme_color)
+    plan = plan_parser.parse_plan(plan_text)
+    placement_plan = image_matcher.match_plan_images(plan, generated_images.keys())
+    section_images = _section_images(plan, placement_plan)
+
+    # 1. Skeleton package: template parts, styles and the cover page
+    skeleton = Document()
+    _apply_design(skeleton, heading_color, font_style)
+    _add_cover_page(skeleton, business_name, slogan, heading_color, _encode_asset(generated_images, placement_plan.cover, COVER_IMAGE_WIDTH))
+    skeleton_stream = io.BytesIO()
+    skeleton.save(skeleton_stream)
+    del skeleton
+
+    with zipfile.ZipFile(skeleton_stream) as src, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as dst:
+        document_xml = src.read(_DOCUMENT_PART).decode('utf-8')
+        body_end = document_xml.rindex('<w:sectPr')
+        document_head, document_tail = document_xml[:body_end], document_xml[body_end:]
+        rels_xml = src.read(_DOCUMENT_RELS_PART).decode('utf-8')
+        content_types_xml = src.read(_CONTENT_TYPES_PART).decode('utf-8')
+
+        for item in src.infolist():
+            if item.filename not in (_DOCUMENT_PART, _DOCUMENT_RELS_PART, _CONTENT_TYPES_PART):
+                compress_type = zipfile.ZIP_STORED if item.filename.startswith(_MEDIA_PREFIX) else None
+                dst.writestr(item.filename, src.read(item.filename), compress_type=compress_type)
+
+        # 2. Section images: write each distinct encoding once, before the body
+        image_rels = {}
+        parts_by_digest = {}
+        media_types = {}
+        for section_key in section_images.values():
+            encoded = _encode_asset(generated_images, section_key, SECTION_IMAGE_WIDTH)
+            if encoded is None:
+                continue # Stored image could not be read
+            if encoded.digest not in parts_by_digest:
+                index = len(parts_by_digest) + 1
+                filename = f'section_image{index}.{encoded.ext}'
+                dst.writestr(f'{_MEDIA_PREFIX}{filename}', encoded.data, compress_type=zipfile.ZIP_STORED)
+                parts_by_digest[encoded.digest] = (f'rIdSection{index}', filename)
+                media_types[encoded.ext] = encoded.content_type
+            rel_id, filename = parts_by_digest[encoded.digest]
+            cx = int(SECTION_IMAGE_WIDTH)
+            cy = int(cx * encoded.height / encoded.width)
+            image_rels[section_key] = (rel_id, filename, cx, cy)
+
+        # 3. Body: stream one top-level section at a time from the fragment cache
+        shape_id = 1000
+        with dst.open(_DOCUMENT_PART, 'w', force_zip64=True) as body:
+            body.write(document_head.encode('utf-8'))
+            for block in plan.blocks:
+                body.write(_block_xml(block).encode('utf-8'))
+            for section in plan.sections:
+                heading, rest = _section_fragment(plan_text, section)
+                section_key = section_images.get(section.start)
+                if section_key in image_rels:
+                    rel_id, filename, cx, cy = image_rels[section_key]
+                    shape_id += 1
+                    heading += _PICTURE_XML.format(cx=cx, cy=cy, shape_id=shape_id, filename=filename, rel_id=rel_id)
+                body.write(heading.encode('utf-8'))
+                body.write(rest.encode('utf-8'))
+            body.write(document_tail.encode('utf-8'))
+
+        # 4. Relationships for the streamed images
+        new_rels = ''.join(
+            f'<Relationship Id="{rel_id}" Type="{_IMAGE_REL_TYPE}" Target="media/{filename}"/>'
+            for rel_id, filename in parts_by_digest.values()
+        )
+        rels_xml = rels_xml.replace('</Relationships>', new_rels + '</Relationships>')
+        dst.writestr(_DOCUMENT_RELS_PART, rels_xml.encode('utf-8'))
+
+        # 5. Content types for any image formats the skeleton did not use
+        new_types = ''.join(
+            f'<Default Extension="{ext}" ContentType="{content_type}"/>'
+            for ext, content_type in media_types.items()
+            if f'Extension="{ext}"' not in content_types_xml
+        )
+        content_types_xml = content_types_xml.replace('</Types>', new_types + '</Types>')
+        dst.writestr(_CONTENT_TYPES_PART, content_types_xml.encode('utf-8'))
+
+    return output
@@ -0,0 +1,171 @@
+import hashlib
+import io
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from modules import image_matcher, plan_parser
+
+# Target print resolution for embedded images
+DEFAULT_PRINT_DPI = 200
+# Widths (inches) images are encoded for; the .docx shows them at these widths and the
+# .pptx embeds the same renditions, so one encoding serves both exports
+COVER_WIDTH_IN = 6.0
+SECTION_WIDTH_IN = 5.0
+# Threads encoding a plan's images ahead of an export (PIL releases the GIL while encoding)
+PREPARE_WORKERS = 4
+# Images with at most this many colours (charts, icons, placeholders) stay lossless
+MAX_PNG_COLORS = 256
+JPEG_QUALITY = 85
+# Number of encoded renditions kept for reuse across exports
+MAX_CACHED_ASSETS = 64
+# Longest side, in pixels, of the gallery preview rendition
+PREVIEW_SIZE = 256
+PREVIEW_QUALITY = 80
+
+EncodedImage = namedtuple("EncodedImage", ["data", "ext", "content_type", "width", "height", "digest"])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _target_pixels(display_width_in, dpi):
+    return max(1, int(round(display_width_in * dpi)))
+
+def _prefers_png(img):
+    """Returns True for images with transparency or a small palette (line art, charts)."""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        return True
+    sample = img.copy()
+    sample.thumbnail((128, 128))
+    return sample.convert("RGB").getcolors(maxcolors=MAX_PNG_COLORS) is not None
+
+def _encode(img, display_width_in, dpi):
+    target = _target_pixels(display_width_in, dpi)
+    if img.width > target:
+        height = max(1, int(round(img.height * target / img.width)))
+        img = img.resize((target, height), Image.LANCZOS)
+
+    stream = io.BytesIO()
+    if _prefers_png(img):
+        img.save(stream, format="PNG", optimize=True)
+        ext, content_type = "png", "image/png"
+    else:
+        img.convert("RGB").save(stream, format="JPEG", quality=JPEG_QUALITY, optimize=True, dpi=(dpi, dpi))
+        ext, content_type = "jpeg", "image/jpeg"
+    data = stream.getvalue()
+    return EncodedImage(data, ext, content_type, img.width, img.height, hashlib.sha1(data).hexdigest())
+
+def encode_image(img, display_width_in, dpi=DEFAULT_PRINT_DPI, key=None):
+    """
+    Encodes an image for embedding at a given display width, reusing earlier results.
+
+    The image is downsampled to the pixel width needed at `dpi`, then saved as PNG
+    (transparency or few colours) or JPEG (photographic content). Results are cached
+    per image object, or per `key` when one is supplied, so repeated exports of the
+    same assets skip re-encoding entirely.
+
+    Args:
+        img (PIL.Image.Image): The source image.
+        display_width_in (float): Width the image is shown at, in inches.
+        dpi (int): Target print resolution.
+        key (str): Optional stable identifier for the image content.
+
+    Returns:
+        EncodedImage: Encoded bytes, file extension, content type, pixel size and SHA-1 digest.
+    """
+    if key is not None:
+        cache_key = (key, display_width_in, dpi)
+    else:
+        cache_key = (id(img), display_width_in, dpi)
+
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            ref, encoded = cached
+            # Guard against id() reuse after the original image was freed
+            if key is not None or ref() is img:
+                _cache.move_to_end(cache_key)
+                return encoded
+
+    encoded = _encode(img, display_width_in, dpi)
+
+    with _cache_lock:
+        _cache[cache_key] = (weakref.ref(img), encoded)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > MAX_CACHED_ASSETS:
+            _cache.popitem(last=False)
+    return encoded
+
+def encode_preview(img, size=PREVIEW_SIZE):
+    """
+    Encodes a small JPEG preview of an image for the Review gallery.
+
+    JPEG is what st.image sends to the browser anyway, so these bytes are
+    served as they are instead of being re-encoded on every rerun.
+
+    Returns:
+        bytes: JPEG data, at most `size` pixels on its longest side.
+    """
+    preview = img.copy() if img.mode == "RGB" else img.convert("RGB")
+    preview.thumbnail((size, size), Image.LANCZOS)
+    stream = io.BytesIO()
+    preview.save(stream, format="JPEG", quality=PREVIEW_QUALITY, optimize=True)
+    return stream.getvalue()
+
+def cached_encoding(key, display_width_in, dpi=DEFAULT_PRINT_DPI):
+    """
+    Returns the cached rendition of a keyed image, or None, without needing the image itself.
+
+    Lets callers whose images are decoded on demand (asset_store.ImageSet)
+    skip decoding when the encoding is already cached.
+    """
+    with _cache_lock:
+        cached = _cache.get((key, display_width_in, dpi))
+        if cached is None:
+            return None
+        _cache.move_to_end((key, display_width_in, dpi))
+        return cached[1]
+
+def encode_asset(images, name, display_width_in, dpi=DEFAULT_PRINT_DPI):
+    """
+    Encodes images[name] for display at a width, or returns None if there is no such image.
+
+    Images with an asset ID (asset_store.ImageSet) are cached by it, so a
+    re-export does not even decode them.
+    """
+    asset_id = getattr(images, "asset_id", None)
+    key = asset_id(name) if asset_id and name is not None else None
+    if key is not None:
+        encoded = cached_encoding(key, display_width_in, dpi)
+        if encoded is not None:
+            return encoded
+    img = images.get(name) if name is not None else None
+    if img is None:
+        return None
+    return encode_image(img, display_width_in, dpi=dpi, key=key)
+
+def prepare_export(plan_text, images, workers=PREPARE_WORKERS):
+    """
+    Parses the plan, places its images and encodes them, once for every exporter.
+
+    The parse and the renditions are cached, so a .docx and a .pptx compiled
+    afterwards (even at the same time) reuse them instead of repeating the work.
+
+    Returns:
+        tuple: (plan_parser.Plan, image_matcher.PlacementPlan)
+    """
+    plan = plan_parser.parse_plan(plan_text)
+    placement_plan = image_matcher.match_plan_images(plan, images.keys())
+    jobs = [(placement.key, SECTION_WIDTH_IN) for placement in placement_plan.placements]
+    if placement_plan.cover is not None:
+        jobs.append((placement_plan.cover, COVER_WIDTH_IN))
+    if jobs:
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            list(pool.map(lambda job: encode_asset(images, *job), jobs))
+    return plan, placement_plan
+
+def clear_cache():
+    """Drops all cached renditions."""
+    with _cache_lock:
+        _cache.clear()
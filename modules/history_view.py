@@ -0,0 +1,73 @@
+import os
+import streamlit as st
+
+# Messages rendered per page of history; "Load older messages" adds another page
+PAGE_SIZE = int(os.environ.get("GRANT_ARCHITECT_HISTORY_PAGE_SIZE", 20))
+# Replies longer than this show a preview until expanded
+PREVIEW_CHARS = 3000
+
+def message_preview(content):
+    """
+    Returns a markdown-safe preview of a message and whether it was truncated.
+
+    Only the first PREVIEW_CHARS characters are examined, so the cost does not
+    grow with the message and nothing needs caching (a cache keyed on the
+    content would keep every long reply alive).
+
+    Args:
+        content (str): The message markdown.
+
+    Returns:
+        tuple: (preview markdown, truncated flag).
+    """
+    if len(content) <= PREVIEW_CHARS:
+        return content, False
+    # Cut at the last paragraph break so blocks aren't split mid-way
+    cut = content.rfind("\n\n", 0, PREVIEW_CHARS)
+    if cut < PREVIEW_CHARS // 2:
+        cut = content.rfind(" ", 0, PREVIEW_CHARS)
+    if cut <= 0:
+        cut = PREVIEW_CHARS
+    preview = content[:cut].rstrip()
+    if sum(1 for line in preview.split("\n") if line.lstrip().startswith("```")) % 2:
+        preview += "\n```" # Close a code fence the cut left open
+    return preview + "\n\n…", True
+
+def visible_range(message_count):
+    """Returns the (start, end) indices of messages shown on this rerun."""
+    shown = st.session_state.get('history_shown', PAGE_SIZE)
+    return max(0, message_count - shown), message_count
+
+def render_message(message, index):
+    """Renders one message, showing a preview for long replies until expanded."""
+    expanded = st.session_state.setdefault('history_expanded', set())
+    preview, truncated = message_preview(message["content"])
+    if not truncated or index in expanded:
+        st.markdown(message["content"])
+        return
+    st.markdown(preview)
+    if st.button("Show full message", key=f"expand_message_{index}"):
+        expanded.add(index)
+        st.rerun()
+
+def render_history(messages):
+    """
+    Renders the most recent page(s) of chat history.
+
+    Only the visible window is rendered on each rerun, so rerun cost stays
+    roughly constant as the consultation grows. Older turns load on demand.
+    """
+    start, end = visible_range(len(messages))
+    if start > 0:
+        if st.button(f"Load older messages ({start} hidden)", key="load_older_messages"):
+            st.session_state['history_shown'] = end - start + PAGE_SIZE
+            st.rerun()
+    for index in range(start, end):
+        message = messages[index]
+        with st.chat_message(message["role"]):
+            render_message(message, index)
+
+def reset():
+    """Forgets pagination and expanded messages (e.g. after clearing the session)."""
+    st.session_state.pop('history_shown', None)
+    st.session_state.pop('history_expanded', None)
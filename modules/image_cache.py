@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Cache location and size budget (override via environment on the VPS)
+CACHE_DIR = os.environ.get("GRANT_ARCHITECT_IMAGE_CACHE", os.path.join(".cache", "images"))
+MAX_CACHE_BYTES = int(os.environ.get("GRANT_ARCHITECT_IMAGE_CACHE_BYTES", 512 * 1024 * 1024))
+
+CACHE_SUFFIX = ".img"
+
+def cache_key(full_prompt, style, model_name):
+    """
+    Builds the content address for a generated image.
+
+    Args:
+        full_prompt (str): The exact prompt sent to the image model.
+        style (str): The visual style.
+        model_name (str): The image model name.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the image.
+    """
+    payload = json.dumps([full_prompt, style, model_name], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ImageCache:
+    """
+    Persistent, content-addressed store of encoded image bytes.
+
+    Entries are plain files named by their key. Writes go to a temp file in the
+    same directory followed by os.replace, so several Streamlit workers can share
+    one directory. Recency is tracked through file mtimes, which lets every
+    process evict least-recently-used entries once the size budget is exceeded.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_served": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key, counted=True):
+        """
+        Returns the cached bytes for key, or None on a miss.
+
+        Args:
+            key (str): Cache key.
+            counted (bool): Count the lookup in stats(); False for entries derived
+                from a cached image (e.g. its gallery preview), so each image
+                request is counted once.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            if counted:
+                self._count("misses")
+            return None
+        except Exception as e:
+            print(f"Error reading image cache: {e}")
+            if counted:
+                self._count("misses")
+            return None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        if counted:
+            self._count("hits")
+            self._count("bytes_served", len(data))
+        return data
+
+    def put(self, key, data, counted=True):
+        """Atomically stores data under key, then enforces the size budget (see get() for `counted`)."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._path(key))
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if counted:
+                self._count("stores")
+        except Exception as e:
+            print(f"Error writing image cache: {e}")
+            return
+        self.evict()
+
+    def discard(self, key):
+        """Removes an entry, e.g. when its bytes fail to decode."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue # Removed by another worker
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._count("evictions")
+            except FileNotFoundError:
+                pass # Another worker evicted it first
+            total -= size
+
+    def stats(self):
+        """
+        Returns cache counters for this process plus on-disk usage.
+
+        Returns:
+            dict: hits, misses, stores, evictions, bytes_served, hit_rate, entries, size_bytes.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(size for _, size, _ in entries)
+        return stats
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Returns the process-wide ImageCache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache()
+        return _default_cache
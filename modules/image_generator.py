@@ -2,9 +2,27 @@ import os
 import streamlit as st
 import io
 import json
-import google.generativeai as genai
 from PIL import Image, ImageDraw, ImageFont
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules import export_assets, image_cache, metrics, model_client, request_scheduler, visual_analyzer
+
+# Image model used for all visual assets (part of the cache key)
+IMAGE_MODEL = 'imagen-3.0-generate-001'
+
+# Concurrency defaults for visual generation
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_ITEM_TIMEOUT = 120 # seconds per image
+# Ask the text model to polish the locally written image prompts (adds one model round-trip)
+REFINE_VISUAL_PROMPTS = os.environ.get("GRANT_ARCHITECT_REFINE_VISUALS", "0") == "1"
+
+_IMAGE_SECONDS = metrics.histogram(
+    "grant_architect_image_generation_seconds", "Image model calls (scheduler wait included); cache hits are not counted"
+)
+_IMAGE_ERRORS = metrics.counter("grant_architect_image_generation_errors_total", "Image model calls that returned no image")
+_ANALYSIS_SECONDS = metrics.histogram(
+    "grant_architect_visual_analysis_seconds", "Choosing sections and prompts for visuals (refinement included)"
+)
 
 def create_placeholder_image(text):
     """Creates a placeholder image with text when generation fails."""
@@ -12,9 +30,34 @@ def create_placeholder_image(text):
     d = ImageDraw.Draw(img)
     # Basic text centering (approximate)
     d.text((10, 256), text, fill=(0, 0, 0))
+    # Mark it so failures are never mistaken for (or cached as) real images
+    img.info["placeholder"] = True
     return img
 
-def generate_business_image(prompt, style, api_key):
+def is_placeholder(img):
+    """Returns True if img was produced by create_placeholder_image."""
+    return bool(getattr(img, "info", {}).get("placeholder"))
+
+def with_preview(image, cache=None, preview_key=None):
+    """
+    Attaches the gallery preview (export_assets.encode_preview) as image.info['preview'].
+
+    The preview is read from, or stored in, the image cache under preview_key
+    when both are given, so a cached image never needs its preview rebuilt.
+    These lookups are left out of the cache's hit/miss stats.
+
+    Returns:
+        PIL.Image.Image: `image`, for chaining.
+    """
+    preview = cache.get(preview_key, counted=False) if cache and preview_key else None
+    if not preview:
+        preview = export_assets.encode_preview(image)
+        if cache and preview_key:
+            cache.put(preview_key, preview, counted=False)
+    image.info["preview"] = preview
+    return image
+
+def generate_business_image(prompt, style, api_key, timeout=None, use_cache=True):
     """
     Generates an image using Google's Generative AI based on the prompt and style.
 
@@ -22,9 +65,12 @@ def generate_business_image(prompt, style, api_key):
         prompt (str): The subject prompt for the image.
         style (str): The style of the image (e.g., 'Photorealistic', '3D Isometric', 'Vector Art').
         api_key (str): The Google API Key.
+        timeout (float): Optional request timeout in seconds.
+        use_cache (bool): Serve and store results in the on-disk image cache.
 
     Returns:
-        PIL.Image.Image: The generated image object, or a placeholder if generation fails.
+        PIL.Image.Image: The generated image object (gallery preview in info['preview']),
+        or a placeholder if generation fails.
     """
     if not api_key:
         print("Error: No API Key provided.")
@@ -32,7 +78,7 @@ def generate_business_image(prompt, style, api_key):
 
     # Configure the library
     try:
-        genai.configure(api_key=api_key)
+        client = model_client.get_client(api_key)
     except Exception as e:
         print(f"Error configuring API: {e}")
         return create_placeholder_image(f"[Error: API Config Failed]")
@@ -40,42 +86,211 @@ def generate_business_image(prompt, style, api_key):
     # Construct the full prompt including style
     # Nano Banana Integration: ensure high quality request
     full_prompt = f"High quality, professional business illustration. {prompt}. Style: {style}. 8k resolution, detailed."
+    request_options = {"timeout": timeout} if timeout else None
+
+    # Serve identical (prompt, style, model) requests from the on-disk cache
+    cache = image_cache.get_default_cache() if use_cache else None
+    key = image_cache.cache_key(full_prompt, style, IMAGE_MODEL)
+    preview_key = image_cache.cache_key(full_prompt, style, f"{IMAGE_MODEL}@preview{export_assets.PREVIEW_SIZE}")
+    if cache:
+        cached = cache.get(key)
+        if cached:
+            try:
+                image = Image.open(io.BytesIO(cached))
+                image.load()
+                return with_preview(image, cache, preview_key)
+            except Exception as e:
+                print(f"Discarding unreadable cache entry: {e}")
+                cache.discard(key)
 
     try:
         # Use a model that supports image generation
         # Prioritize 'imagen-3.0-generate-001' or similar high-quality model
+        # Image jobs queue behind interactive chat in the shared scheduler
+        with _IMAGE_SECONDS.time():
+            image_data = request_scheduler.get_scheduler().submit(
+                lambda: client.generate_image(IMAGE_MODEL, full_prompt, request_options=request_options),
+                api_key,
+                IMAGE_MODEL,
+                priority=request_scheduler.PRIORITY_BATCH
+            )
         
-        model = genai.GenerativeModel('imagen-3.0-generate-001')
-        response = model.generate_content(full_prompt)
-        
-        # Check if response contains image data
-        if response.parts:
-            for part in response.parts:
-                if hasattr(part, 'inline_data') and part.inline_data:
-                    image_data = part.inline_data.data
-                    return Image.open(io.BytesIO(image_data))
-        
-        # Fallback for different response structures
-        if hasattr(response, 'images') and response.images:
-             return response.images[0]
+        if image_data:
+            image = Image.open(io.BytesIO(image_data))
+            if cache:
+                cache.put(key, image_data)
+            return with_preview(image, cache, preview_key)
 
         print("No image data found in response.")
+        _IMAGE_ERRORS.inc()
         return create_placeholder_image("[Image: Generation Failed - No Data]")
 
     except Exception as e:
         print(f"Error generating image: {e}")
+        _IMAGE_ERRORS.inc()
         return create_placeholder_image(f"[Image: Generation Error - {str(e)[:50]}...]")
 
-def analyze_and_generate_visuals(plan_text, visual_style, api_key, model_name="gemini-1.5-flash", progress_callback=None):
+def generate_images(items, visual_style, api_key, progress_callback=None, max_workers=DEFAULT_MAX_WORKERS, item_timeout=DEFAULT_ITEM_TIMEOUT):
+    """
+    Generates one image per visual plan item, optionally on a bounded worker pool.
+
+    Args:
+        items (list): Visual plan entries, each a dict with 'section' and 'prompt'.
+        visual_style (str): The user-selected visual style.
+        api_key (str): The Google API Key.
+        progress_callback (function): Optional function called as (float, str) after each item completes.
+        max_workers (int): Maximum concurrent image requests. 1 runs sequentially.
+        item_timeout (float): Seconds an item may run before a placeholder is used instead.
+
+    Returns:
+        dict: Generated images keyed by section name, in the order of `items`.
+    """
+    jobs = []
+    for index, item in enumerate(items):
+        section_name = item.get("section", f"Section {index+1}")
+        jobs.append((section_name, item.get("prompt")))
+    total_items = len(jobs)
+    results = [None] * total_items
+
+    def report(completed, section_name):
+        if progress_callback:
+            progress_callback(completed / total_items, f"Generating asset for: {section_name}")
+
+    if max_workers <= 1:
+        # Sequential path
+        for index, (section_name, image_prompt) in enumerate(jobs):
+            print(f"Generating image for {section_name}: {image_prompt}")
+            results[index] = generate_business_image(image_prompt, visual_style, api_key, timeout=item_timeout)
+            report(index + 1, section_name)
+    else:
+        started = {}
+
+        def run(index, section_name, image_prompt):
+            started[index] = time.monotonic()
+            print(f"Generating image for {section_name}: {image_prompt}")
+            return generate_business_image(image_prompt, visual_style, api_key, timeout=item_timeout)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-gen")
+        futures = {executor.submit(run, index, name, prompt): index for index, (name, prompt) in enumerate(jobs)}
+        pending = set(futures)
+        completed = 0
+        try:
+            while pending:
+                # Wake up for the next completion or the earliest per-item deadline
+                timeout = None
+                if item_timeout:
+                    now = time.monotonic()
+                    deadlines = [started[futures[f]] + item_timeout for f in pending if futures[f] in started]
+                    if deadlines:
+                        timeout = max(0.0, min(deadlines) - now)
+                    if len(deadlines) < len(pending):
+                        # Queued items have no start time yet; poll until they do
+                        timeout = min(timeout if timeout is not None else 0.25, 0.25)
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                finished = []
+                for future in done:
+                    try:
+                        finished.append((futures[future], future.result()))
+                    except Exception as e:
+                        print(f"Error generating image: {e}")
+                        finished.append((futures[future], create_placeholder_image("[Image: Generation Error]")))
+
+                if item_timeout:
+                    now = time.monotonic()
+                    for future in list(pending):
+                        index = futures[future]
+                        if index in started and now - started[index] >= item_timeout:
+                            pending.discard(future)
+                            future.cancel()
+                            print(f"Image generation timed out for {jobs[index][0]}")
+                            finished.append((index, create_placeholder_image("[Image: Generation Timed Out]")))
+
+                for index, image in finished:
+                    results[index] = image
+                    completed += 1
+                    report(completed, jobs[index][0])
+        finally:
+            # Timed-out requests are abandoned rather than awaited
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # Preserve the order from the analysis step
+    generated_images = {}
+    for (section_name, _), image in zip(jobs, results):
+        if image:
+            generated_images[section_name] = image
+    return generated_images
+
+def _parse_json_reply(text_response):
+    """Extracts the JSON object from a model reply that may wrap it in a code fence."""
+    if "```json" in text_response:
+        text_response = text_response.split("```json")[1].split("```")[0]
+    elif "```" in text_response:
+        text_response = text_response.split("```")[1]
+    return json.loads(text_response)
+
+def refine_visual_plan(items, visual_style, api_key, model_name="gemini-1.5-flash"):
+    """
+    Optionally asks the text model to improve locally written image prompts.
+
+    Only the chosen sections, their keywords and draft prompts are sent (not
+    the plan), and the section list is kept as is: the model may only reword
+    prompts. Any failure returns `items` unchanged.
+
+    Args:
+        items (list): Visual plan entries from visual_analyzer.analyze_plan.
+        visual_style (str): The user-selected visual style.
+        api_key (str): The Google API Key.
+        model_name (str): Text model used for refinement.
+
+    Returns:
+        list: Visual plan entries with refined prompts where the model supplied one.
+    """
+    drafts = [{"section": item["section"], "keywords": item.get("keywords", []), "prompt": item["prompt"]} for item in items]
+    refine_prompt = f"""
+    Improve these image generation prompts for a business plan. Keep each prompt specific to its
+    section and keywords, in the visual style '{visual_style}', with no text in the image.
+
+    Return the result strictly as a JSON object with the same sections:
+    {{"visuals": [{{"section": "Section Name", "prompt": "Improved prompt..."}}, ...]}}
+
+    Draft prompts:
+    {json.dumps(drafts, indent=1)}
+    """
+    try:
+        client = model_client.get_client(api_key)
+        text_response = request_scheduler.get_scheduler().submit(
+            lambda: client.generate_text(model_name, refine_prompt),
+            api_key,
+            model_name,
+            priority=request_scheduler.PRIORITY_BATCH
+        )
+        refined = {
+            entry.get("section"): entry.get("prompt")
+            for entry in _parse_json_reply(text_response or "").get("visuals", [])
+        }
+    except Exception as e:
+        print(f"Error refining visual prompts, using local prompts: {e}")
+        return items
+    return [dict(item, prompt=refined.get(item["section"]) or item["prompt"]) for item in items]
+
+def analyze_and_generate_visuals(plan_text, visual_style, api_key, model_name="gemini-1.5-flash", progress_callback=None, max_workers=DEFAULT_MAX_WORKERS, item_timeout=DEFAULT_ITEM_TIMEOUT, refine=None):
     """
     Analyzes the business plan text to identify key sections for visualization,
-    generates prompts using Gemini, and then generates images for those prompts.
+    writes prompts for them, and then generates images for those prompts.
+
+    Sections are ranked and prompts built locally (visual_analyzer), so image
+    requests start immediately instead of after a model round-trip over a
+    truncated excerpt of the plan.
 
     Args:
         plan_text (str): The full text of the business plan.
         visual_style (str): The user-selected visual style (e.g., 'Photorealistic').
         api_key (str): The Google API Key.
         progress_callback (function): Optional function to update progress (accepts float 0.0 to 1.0).
+        max_workers (int): Maximum concurrent image requests. 1 runs sequentially.
+        item_timeout (float): Seconds an image may take before a placeholder is used instead.
+        refine (bool): Have the text model polish the prompts first (default: REFINE_VISUAL_PROMPTS).
 
     Returns:
         dict: A dictionary of generated images keyed by section name.
@@ -83,98 +298,18 @@ def analyze_and_generate_visuals(plan_text, visual_style, api_key, model_name="g
     if not api_key:
         return {}
 
-    
-    genai.configure(api_key=api_key)
-
-    # 1. Ask Gemini to identify sections and write prompts
-    # Model Specification: Use 'gemini-1.5-flash' or 'gemini-pro' for text analysis
-    analysis_prompt = f"""
-    Analyze the following Business Plan text and identify 10 key sections that would benefit from visual illustrations (e.g., 'The Cover Page', 'Product Demo', 'Team Section', 'Office Location').
-    
-    For each section, write a specific, detailed image generation prompt based on the visual style: '{visual_style}'.
-    
-    Return the result strictly as a JSON object with the following structure:
-    {{
-        "visuals": [
-            {{
-                "section": "Section Name",
-                "prompt": "Detailed image prompt..."
-            }},
-            ...
-        ]
-    }}
-    
-    Business Plan Text (Excerpt):
-    {plan_text[:10000]} 
-    ... (truncated for analysis efficiency if too long)
-    """
-    
-    try:
-        model = genai.GenerativeModel(model_name) # Use selected model
-        
-        # Retry logic for analysis
-        max_retries = 3
-        retry_delay = 5
-        response = None
-        
-        for attempt in range(max_retries):
-            try:
-                response = model.generate_content(analysis_prompt)
-                break
-            except Exception as e:
-                if "429" in str(e) or "ResourceExhausted" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** (attempt + 1)
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print("Error: Quota exceeded for visual analysis.")
-                        return {}
-                else:
-                    raise e
-        
-        if not response:
-             return {}
-
-        # Parse JSON from response
-        text_response = response.text
-        # Clean up code blocks if present
-        if "```json" in text_response:
-            text_response = text_response.split("```json")[1].split("```")[0]
-        elif "```" in text_response:
-            text_response = text_response.split("```")[1]
-            
-        visual_plan = json.loads(text_response)
-        
-    except Exception as e:
-        print(f"Error analyzing plan for visuals: {e}")
-        # Build a safe fallback list if analysis fails
-        visual_plan = {
-            "visuals": [
-                {"section": "The Cover Page", "prompt": f"Professional business cover page, {visual_style}"},
-                {"section": "Financial Highlights", "prompt": f"Financial growth chart, {visual_style}"}
-            ]
-        }
-
-    generated_images = {}
-    items = visual_plan.get("visuals", [])
-    total_items = len(items)
+    # 1. Choose sections and write prompts locally from the whole plan
+    with _ANALYSIS_SECONDS.time():
+        items = visual_analyzer.analyze_plan(plan_text, visual_style)
+        if refine if refine is not None else REFINE_VISUAL_PROMPTS:
+            items = refine_visual_plan(items, visual_style, api_key, model_name)
 
-    # 2. Loop through prompts and generate images
-    for index, item in enumerate(items):
-        section_name = item.get("section", f"Section {index+1}")
-        image_prompt = item.get("prompt")
-        
-        print(f"Generating image for {section_name}: {image_prompt}")
-        
-        image = generate_business_image(image_prompt, visual_style, api_key)
-        
-        if image:
-            generated_images[section_name] = image
-            
-        # Update progress
-        if progress_callback:
-            progress = (index + 1) / total_items
-            progress_callback(progress, f"Generating asset for: {section_name}")
-
-    return generated_images
+    # 2. Generate images for each prompt
+    return generate_images(
+        items,
+        visual_style,
+        api_key,
+        progress_callback=progress_callback,
+        max_workers=max_workers,
+        item_timeout=item_timeout
+    )
@@ -0,0 +1,136 @@
+import functools
+import re
+from collections import defaultdict, namedtuple
+
+# Share of an image key's tokens a heading must contain for the image to be placed under it
+MIN_SCORE = 0.5
+# Token marking the image used on the cover page rather than under a heading
+COVER_TOKEN = "cover"
+
+# Words that carry no section identity ("The Cover Page", "Team Section", "Sales & Marketing")
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "for", "to", "in", "on", "our", "your", "with", "section", "overview",
+})
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# heading_index: position of the heading in the list passed to match_images
+Placement = namedtuple("Placement", ["heading_index", "heading", "key", "score"])
+# cover: image key for the cover page (or None); placements: Placement per matched heading, in
+# heading order; unplaced: image keys no heading matched
+PlacementPlan = namedtuple("PlacementPlan", ["cover", "placements", "unplaced"])
+
+@functools.lru_cache(maxsize=4096)
+def normalize_tokens(text):
+    """
+    Lower-cased word tokens of a heading or image key, without stopwords or numbers.
+
+    A trailing plural 's' is dropped so 'Financial Projections' matches
+    'Financial Projection'. Memoised, since the same headings and keys recur
+    on every export of a plan.
+
+    Returns:
+        tuple: Distinct tokens in order of first appearance.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS or token.isdigit():
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        if token not in tokens:
+            tokens.append(token)
+    return tuple(tokens)
+
+def match_images(headings, image_keys, min_score=MIN_SCORE):
+    """
+    Assigns generated images to plan headings, each image to at most one heading.
+
+    Image keys are tokenised once into an inverted index (token -> keys), so
+    each heading only looks at keys sharing a token with it: finding candidate
+    pairs is linear in the number of heading and key tokens. A pair scores the share of
+    the key's tokens found in the heading, with the share of the heading's
+    tokens as a tie-break. Pairs are then assigned best score first, so one
+    image never lands under several headings while another goes unused.
+
+    The first key containing 'cover' is reserved for the cover page.
+
+    Args:
+        headings (list): Heading texts, in document order.
+        image_keys (iterable): Keys of the generated images, in generation order.
+        min_score (float): Minimum share of a key's tokens the heading must contain.
+
+    Returns:
+        PlacementPlan: The cover key, placements in heading order and unplaced keys.
+    """
+    keys = list(image_keys)
+    cover = None
+    index = defaultdict(list) # token -> key positions
+    key_tokens = []
+    for position, key in enumerate(keys):
+        tokens = normalize_tokens(key)
+        key_tokens.append(tokens)
+        if cover is None and COVER_TOKEN in tokens:
+            cover = key
+            continue
+        for token in tokens:
+            index[token].append(position)
+
+    candidates = []
+    for heading_index, heading in enumerate(headings):
+        tokens = normalize_tokens(heading)
+        shared = defaultdict(int)
+        for token in tokens:
+            for position in index.get(token, ()):
+                shared[position] += 1
+        for position, count in shared.items():
+            score = count / len(key_tokens[position])
+            if score >= min_score:
+                # Best score first; then better heading coverage, earlier heading, earlier key
+                candidates.append((-score, -count / len(tokens), heading_index, position))
+
+    candidates.sort()
+    assigned = {}
+    used = set()
+    for negative_score, _, heading_index, position in candidates:
+        if heading_index in assigned or position in used:
+            continue
+        assigned[heading_index] = Placement(heading_index, headings[heading_index], keys[position], -negative_score)
+        used.add(position)
+
+    placements = tuple(assigned[i] for i in sorted(assigned))
+    unplaced = tuple(key for position, key in enumerate(keys) if position not in used and key != cover)
+    return PlacementPlan(cover, placements, unplaced)
+
+def match_plan_images(plan, image_keys):
+    """
+    Matches generated images to a parsed plan's '# ' headings, once per export.
+
+    Args:
+        plan (plan_parser.Plan): The parsed plan.
+        image_keys (iterable): Keys of the generated images.
+
+    Returns:
+        PlacementPlan: heading_index refers to plan.sections.
+    """
+    headings = [section.title if section.level == 1 else "" for section in plan.sections]
+    return match_images(headings, image_keys)
+
+def placement_report(placement_plan):
+    """
+    Lists where every image goes, for display and auditing.
+
+    Returns:
+        list: {"key", "placement", "score"} dicts: the cover first, then placed
+        images in document order, then images no heading matched (placement None).
+    """
+    rows = []
+    if placement_plan.cover is not None:
+        rows.append({"key": placement_plan.cover, "placement": "Cover page", "score": 1.0})
+    for placement in placement_plan.placements:
+        rows.append({"key": placement.key, "placement": placement.heading, "score": round(placement.score, 2)})
+    for key in placement_plan.unplaced:
+        rows.append({"key": key, "placement": None, "score": 0.0})
+    return rows
@@ -0,0 +1,507 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules import asset_store, export_assets
+
+# Job status table shared by every worker process
+JOBS_DB = os.environ.get("GRANT_ARCHITECT_JOBS_DB", "jobs.db")
+# Directory holding each job's result files
+JOBS_DIR = os.environ.get("GRANT_ARCHITECT_JOBS_DIR", ".jobs")
+# Background jobs run concurrently per process
+MAX_WORKERS = int(os.environ.get("GRANT_ARCHITECT_JOB_WORKERS", 2))
+# Finished jobs and their result files are deleted this long after their last update
+JOB_RETENTION_SECONDS = float(os.environ.get("GRANT_ARCHITECT_JOB_RETENTION_HOURS", 24)) * 3600
+# Minimum seconds between two prune passes in one process
+PRUNE_INTERVAL = 600
+# Export formats and the file an export job writes for each
+EXPORT_FILES = {"docx": "Business_Plan.docx", "pptx": "Pitch_Deck.pptx"}
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_PARTIAL = "partial" # Finished with a result, but some of it failed; submitting again reruns the job
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+FINISHED_STATUSES = (STATUS_DONE, STATUS_PARTIAL)
+
+def _process_start(pid):
+    """The process's start time in clock ticks since boot (Linux /proc), or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        return stat[stat.rindex(")") + 2:].split()[19] # Field 22; the command name may contain spaces
+    except (OSError, ValueError, IndexError):
+        return None
+
+def owner_token(pid=None):
+    """Identifies a running process as host:pid:start time, so a later process reusing the PID does not match."""
+    pid = os.getpid() if pid is None else pid
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid) or ''}"
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation has been requested."""
+
+class JobContext:
+    """Handle passed to a running job for progress reporting and cancellation checks."""
+
+    def __init__(self, engine, job_id):
+        self.engine = engine
+        self.job_id = job_id
+        self.result_dir = engine.result_dir(job_id)
+        self.incomplete = None
+
+    def cancelled(self):
+        job = self.engine.get(self.job_id)
+        return bool(job and job["cancel_requested"])
+
+    def progress(self, fraction, message=""):
+        """Records progress (0.0 to 1.0) and raises JobCancelled if the job was cancelled."""
+        self.engine._update(self.job_id, progress=float(fraction), message=message)
+        if self.cancelled():
+            raise JobCancelled()
+
+    def finish_partial(self, message):
+        """Marks the result incomplete: the job finishes as STATUS_PARTIAL with `message` instead of STATUS_DONE."""
+        self.incomplete = message
+
+def run_id(job):
+    """Identifies one run of a job; rerunning a partial job keeps its job ID but not its run ID."""
+    return f"{job['job_id']}:{job['created_at']!r}"
+
+class JobEngine:
+    """
+    Runs long tasks (visual generation, document compilation) off the Streamlit script thread.
+
+    Job IDs are derived from (session ID, kind, dedupe key), so clicking a button
+    twice with the same inputs returns the job already queued, running or done
+    instead of starting another. A partial, failed or cancelled job is run
+    again; a partial one keeps its result files for the rerun to build on.
+    Status, progress and result locations live in
+    SQLite and result files on disk, so a page refresh or another worker process
+    can pick the job up again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT NOT NULL DEFAULT '',
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            owner_pid INTEGER,
+            owner_token TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_session ON jobs (session_id, kind, created_at);
+    """
+
+    def __init__(self, db_path=JOBS_DB, jobs_dir=JOBS_DIR, max_workers=MAX_WORKERS, retention=JOB_RETENTION_SECONDS):
+        self.db_path = db_path
+        self.jobs_dir = jobs_dir
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._owner_token = owner_token()
+        self._pruned_at = 0.0
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "owner_token" not in columns: # Databases created before owner tokens
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner_token TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """A connection for one transaction: committed (or rolled back on error), then closed."""
+        with contextlib.closing(self._connect()) as conn, conn:
+            yield conn
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connection() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, TypeError):
+            return True # Exists but not ours, or unknown
+        return True
+
+    @classmethod
+    def _owner_alive(cls, job):
+        """
+        True unless the job's owner has provably stopped.
+
+        The owner token's start time tells a live owner from a later process
+        that was given the same PID. Owners on another host cannot be checked
+        and count as alive; rows without a token fall back to the PID alone.
+        """
+        token = job.get("owner_token")
+        if not token:
+            return cls._pid_alive(job["owner_pid"])
+        host, pid, start = token.rsplit(":", 2)
+        if host != socket.gethostname():
+            return True
+        if not cls._pid_alive(int(pid)):
+            return False
+        return not start or _process_start(int(pid)) == start
+
+    def _check_orphaned(self, job):
+        """Marks a job failed if the process that was running it has died."""
+        if job and job["status"] in ACTIVE_STATUSES and not self._owner_alive(job):
+            self._update(job["job_id"], status=STATUS_FAILED, error="Interrupted: the worker process stopped.")
+            return self.get(job["job_id"], check_orphaned=False)
+        return job
+
+    def result_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def get(self, job_id, check_orphaned=True):
+        """Returns the job row as a dict, or None."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        job = dict(row) if row else None
+        return self._check_orphaned(job) if check_orphaned else job
+
+    def latest(self, session_id, kind):
+        """Returns the most recently submitted job of `kind` for a session, or None."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE session_id = ? AND kind = ? ORDER BY updated_at DESC LIMIT 1",
+                (session_id, kind)
+            ).fetchone()
+        return self._check_orphaned(dict(row)) if row else None
+
+    def submit(self, session_id, kind, dedupe_key, fn):
+        """
+        Queues fn(job_context) unless an identical job is already queued, running or done (not partial).
+
+        Args:
+            session_id (str): Owning browser session.
+            kind (str): Job type, e.g. 'visuals' or 'export'.
+            dedupe_key (str): Fingerprint of the job's inputs.
+            fn (callable): Called with a JobContext in a background thread.
+
+        Returns:
+            str: The job ID.
+        """
+        job_id = hashlib.sha256(f"{session_id}\0{kind}\0{dedupe_key}".encode("utf-8")).hexdigest()[:32]
+        with self._lock:
+            if time.time() - self._pruned_at > PRUNE_INTERVAL:
+                self._pruned_at = time.time()
+                self._prune()
+            existing = self.get(job_id)
+            if existing and existing["status"] in ACTIVE_STATUSES + (STATUS_DONE,):
+                # Touch it so latest() returns the job the user just asked for
+                self._update(job_id)
+                return job_id
+
+            now = time.time()
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (job_id, session_id, kind, status, progress, message, error, "
+                    "cancel_requested, owner_pid, owner_token, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 0, '', NULL, 0, ?, ?, ?, ?)",
+                    (job_id, session_id, kind, STATUS_QUEUED, os.getpid(), self._owner_token, now, now)
+                )
+            if not existing or existing["status"] != STATUS_PARTIAL:
+                shutil.rmtree(self.result_dir(job_id), ignore_errors=True)
+            os.makedirs(self.result_dir(job_id), exist_ok=True)
+            self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def prune(self, max_age=None):
+        """
+        Deletes finished jobs last updated more than max_age seconds ago (default: retention), with their files.
+
+        Result directories no job refers to (left by a crash or a deleted
+        database) are removed once they are as old. submit() runs this at most
+        every PRUNE_INTERVAL seconds.
+
+        Returns:
+            int: Jobs deleted.
+        """
+        with self._lock:
+            return self._prune(max_age)
+
+    def _prune(self, max_age=None):
+        cutoff = time.time() - (self.retention if max_age is None else max_age)
+        with self._connection() as conn:
+            expired = [row["job_id"] for row in conn.execute(
+                f"SELECT job_id FROM jobs WHERE status NOT IN ({', '.join('?' * len(ACTIVE_STATUSES))}) AND updated_at < ?",
+                (*ACTIVE_STATUSES, cutoff)
+            )]
+            conn.executemany("DELETE FROM jobs WHERE job_id = ? AND updated_at < ?", [(job_id, cutoff) for job_id in expired])
+            known = {row["job_id"] for row in conn.execute("SELECT job_id FROM jobs")}
+        for job_id in expired:
+            shutil.rmtree(self.result_dir(job_id), ignore_errors=True)
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                stray = entry.is_dir() and entry.name not in known and entry.stat().st_mtime < cutoff
+            except OSError:
+                continue # Removed by another worker
+            if stray:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        return len(expired)
+
+    def _run(self, job_id, fn):
+        job = self.get(job_id)
+        if not job or job["cancel_requested"]:
+            self._update(job_id, status=STATUS_CANCELLED)
+            return
+        self._update(job_id, status=STATUS_RUNNING)
+        context = JobContext(self, job_id)
+        try:
+            fn(context)
+        except JobCancelled:
+            self._update(job_id, status=STATUS_CANCELLED, message="Cancelled")
+            return
+        except Exception as e:
+            print(f"Error in background job {job_id}: {e}")
+            self._update(job_id, status=STATUS_FAILED, error=str(e))
+            return
+        if context.incomplete:
+            self._update(job_id, status=STATUS_PARTIAL, progress=1.0, message=context.incomplete)
+        else:
+            self._update(job_id, status=STATUS_DONE, progress=1.0)
+
+    def cancel(self, job_id):
+        """Requests cancellation; the job stops at its next progress report."""
+        self._update(job_id, cancel_requested=1)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Returns the process-wide JobEngine."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = JobEngine()
+        return _engine
+
+def _fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# --- Job kinds ---
+
+def submit_visuals_job(session_id, plan_text, visual_style, api_key, model_name):
+    """
+    Queues analyze_and_generate_visuals.
+
+    Each image is saved as a PNG in the job directory, next to its small JPEG
+    gallery preview. If any image is a placeholder (e.g. after a 429), the job
+    finishes as STATUS_PARTIAL so generating again retries it.
+    """
+    from modules import image_generator
+
+    def run(job):
+        job.progress(0.0, "Analyzing plan for visuals...")
+        images = image_generator.analyze_and_generate_visuals(
+            plan_text,
+            visual_style,
+            api_key=api_key,
+            model_name=model_name,
+            progress_callback=job.progress
+        )
+        manifest = []
+        for index, (section_name, img_obj) in enumerate(images.items()):
+            filename = f"{index:03d}.png"
+            img_obj.save(os.path.join(job.result_dir, filename), format="PNG")
+            preview_filename = f"{index:03d}.preview.jpg"
+            with open(os.path.join(job.result_dir, preview_filename), "wb") as f:
+                f.write(img_obj.info.get("preview") or export_assets.encode_preview(img_obj)) # Placeholders have none yet
+            manifest.append({"section": section_name, "file": filename, "preview": preview_filename})
+        with open(os.path.join(job.result_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        failed = [section_name for section_name, img_obj in images.items() if image_generator.is_placeholder(img_obj)]
+        if failed:
+            job.finish_partial(f"Images that could not be generated: {', '.join(failed)}")
+
+    dedupe_key = _fingerprint(plan_text, visual_style, model_name)
+    return get_engine().submit(session_id, "visuals", dedupe_key, run)
+
+def load_visuals_result(job):
+    """
+    Returns the images of a finished visuals job as an asset_store.ImageSet in analysis order.
+
+    The PNGs and their previews are copied into the asset store without
+    being decoded; each image is decoded when it is first looked up.
+    """
+    result_dir = get_engine().result_dir(job["job_id"])
+    with open(os.path.join(result_dir, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    store = asset_store.get_store()
+    return asset_store.ImageSet(
+        job["session_id"],
+        [(entry["section"], store.put_file(os.path.join(result_dir, entry["file"]))) for entry in manifest],
+        [
+            (entry["section"], store.put_file(os.path.join(result_dir, entry["preview"])))
+            for entry in manifest if entry.get("preview") # Jobs finished before previews existed have none
+        ]
+    )
+
+def compile_exports(paths, business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets,
+                    font_style=None):
+    """
+    Compiles the .docx and/or .pptx from one plan parse and one set of image encodings.
+
+    export_assets.prepare_export parses the plan and encodes its images once;
+    the writers then run side by side and reuse both, so compiling the two
+    formats takes about as long as the slower one rather than their sum.
+
+    Args:
+        paths (dict): Output path per format (EXPORT_FILES keys).
+    """
+    from modules import document_generator, pptx_generator
+    writers = {"docx": document_generator.write_docx, "pptx": pptx_generator.write_pptx}
+    export_assets.prepare_export(plan_text, generated_images)
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        futures = [
+            pool.submit(
+                writers[export_format], path,
+                business_name=business_name,
+                slogan=slogan,
+                plan_text=plan_text,
+                theme_color=theme_color,
+                generated_images=generated_images,
+                use_3d_assets=use_3d_assets,
+                font_style=font_style
+            )
+            for export_format, path in paths.items()
+        ]
+        for future in futures:
+            future.result()
+
+def submit_export_job(session_id, business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets,
+                      images_key=None, font_style=None, formats=tuple(EXPORT_FILES)):
+    """
+    Queues compilation of the business plan .docx and pitch deck .pptx; the files are written into the job directory.
+
+    Both formats are compiled together by compile_exports. A restyle or an
+    edit starts a new job, but the .docx exporter reuses every rendered
+    section that did not change, so such re-exports are cheap.
+
+    Args:
+        images_key (str): Stable identifier for `generated_images` (e.g. the visuals
+            job ID). Without one, the images' asset IDs (or object identities) are used.
+        font_style (str): Design Studio font style.
+        formats (tuple): EXPORT_FILES keys to compile.
+    """
+    def run(job):
+        job.progress(0.1, "Compiling documents...")
+        compile_exports(
+            {export_format: export_result_path(job, export_format) for export_format in formats},
+            business_name=business_name,
+            slogan=slogan,
+            plan_text=plan_text,
+            theme_color=theme_color,
+            generated_images=generated_images,
+            use_3d_assets=use_3d_assets,
+            font_style=font_style
+        )
+
+    if images_key is None:
+        if isinstance(generated_images, asset_store.ImageSet):
+            images_key = generated_images.asset_ids()
+        else:
+            images_key = [(name, id(img)) for name, img in generated_images.items()]
+    dedupe_key = _fingerprint(business_name, slogan, plan_text, theme_color, images_key, use_3d_assets, font_style,
+                              list(formats))
+    return get_engine().submit(session_id, "export", dedupe_key, run)
+
+def submit_docx_job(session_id, business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets,
+                    images_key=None, font_style=None):
+    """Queues an export job for the .docx alone (see submit_export_job)."""
+    return submit_export_job(session_id, business_name, slogan, plan_text, theme_color, generated_images,
+                             use_3d_assets, images_key=images_key, font_style=font_style, formats=("docx",))
+
+def export_result_path(job, export_format):
+    """Path of an export job's (or JobContext's) compiled file in the given format."""
+    job_id = job.job_id if isinstance(job, JobContext) else job["job_id"]
+    return os.path.join(get_engine().result_dir(job_id), EXPORT_FILES[export_format])
+
+def docx_result_path(job):
+    """Path of the compiled .docx for an export job (or JobContext)."""
+    return export_result_path(job, "docx")
+
+def _write_text(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path) # Pollers never see a half-written file
+
+def submit_plan_job(session_id, messages, summary_state, api_key, model_name):
+    """
+    Queues section-parallel plan generation; each section is saved as it completes.
+
+    A plan with failed sections finishes as STATUS_PARTIAL. Submitting it
+    again writes only those sections and keeps the rest.
+    """
+    from modules import plan_engine, prompts
+    positions = {section["name"]: index for index, section in enumerate(prompts.PLAN_SECTIONS)}
+
+    def run(job):
+        failed_path = os.path.join(job.result_dir, "failed_sections.json")
+        only = None
+        if os.path.exists(failed_path):
+            with open(failed_path, "r", encoding="utf-8") as f:
+                only = json.load(f)
+        job.progress(0.0, "Writing plan sections...")
+
+        def on_section(result, completed, total):
+            _write_text(os.path.join(job.result_dir, f"section_{positions[result.name]:02d}.md"), result.text)
+            job.progress(completed / total, f"Finished {result.name} ({completed}/{total})")
+
+        plan = plan_engine.generate_plan(messages, api_key, model_name, summary_state=summary_state,
+                                         on_section=on_section, only=only)
+        failed = [result.name for result in plan.sections if result.status != plan_engine.SECTION_DONE]
+        texts = dict(load_plan_sections({"job_id": job.job_id}))
+        plan_text = plan_engine.assemble_plan(prompts.PLAN_SECTIONS, [texts.get(name) for name in positions])
+        _write_text(os.path.join(job.result_dir, "plan.md"), plan_text)
+        _write_text(failed_path, json.dumps(failed))
+        if failed:
+            job.finish_partial(f"Sections that could not be generated: {', '.join(failed)}")
+
+    dedupe_key = _fingerprint(messages, model_name)
+    return get_engine().submit(session_id, "plan", dedupe_key, run)
+
+def load_plan_sections(job):
+    """Returns (section name, text) for the sections of a plan job finished so far, in plan order."""
+    from modules import prompts
+    result_dir = get_engine().result_dir(job["job_id"])
+    sections = []
+    for index, section in enumerate(prompts.PLAN_SECTIONS):
+        path = os.path.join(result_dir, f"section_{index:02d}.md")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                sections.append((section["name"], f.read()))
+    return sections
+
+def load_plan_result(job):
+    """Returns the assembled plan text of a finished plan job."""
+    with open(os.path.join(get_engine().result_dir(job["job_id"]), "plan.md"), "r", encoding="utf-8") as f:
+        return f.read()
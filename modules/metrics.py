@@ -0,0 +1,266 @@
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Serve Prometheus text at http://HOST:PORT/metrics (0 = no endpoint; give each worker its own port)
+METRICS_PORT = int(os.environ.get("GRANT_ARCHITECT_METRICS_PORT", 0))
+METRICS_HOST = os.environ.get("GRANT_ARCHITECT_METRICS_HOST", "127.0.0.1")
+# Also write Prometheus text to this file periodically, e.g. for node_exporter's textfile
+# collector ("{pid}" is replaced by the worker's process ID)
+METRICS_FILE = os.environ.get("GRANT_ARCHITECT_METRICS_FILE")
+FLUSH_INTERVAL = float(os.environ.get("GRANT_ARCHITECT_METRICS_FLUSH_SECONDS", 15))
+
+# Recent observations kept per histogram for the live p50/p95
+RECENT_SAMPLES = 1024
+# Histogram bucket upper bounds in seconds, from cache hits to image generation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Counter:
+    """Monotonically increasing count (requests, retries, errors)."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+    def render(self):
+        return [f"{self.name} {self.value:g}"]
+
+class Histogram:
+    """
+    Distribution of observed values (usually seconds).
+
+    Keeps cumulative bucket counts, sum and count for Prometheus, plus the
+    last RECENT_SAMPLES observations so live percentiles reflect current
+    behaviour rather than everything since the process started.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1) # Last slot: above every bucket
+        self._sum = 0.0
+        self._count = 0
+        self._recent = deque(maxlen=RECENT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._recent.append(value)
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+            self._recent.clear()
+
+    def time(self):
+        """Context manager that observes the seconds spent in its block."""
+        return _Timer(self)
+
+    def summary(self):
+        """
+        Returns count, sum, p50 and p95 (over recent observations; None before the first).
+
+        Returns:
+            dict: count, sum, p50, p95.
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total = self._count, self._sum
+        def quantile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else None
+        return {"count": count, "sum": total, "p50": quantile(0.5), "p95": quantile(0.95)}
+
+    def render(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total:g}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def _register(cls, name, help_text, *args):
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help_text, *args)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+def counter(name, help_text):
+    """Returns the process-wide Counter called name, creating it on first use."""
+    return _register(Counter, name, help_text)
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """Returns the process-wide Histogram called name, creating it on first use."""
+    return _register(Histogram, name, help_text, buckets)
+
+def timed(metric):
+    """Decorator that observes each call's duration in `metric` (a Histogram)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def render_prometheus():
+    """Returns every metric in the Prometheus text exposition format."""
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def snapshot():
+    """
+    Returns current values for display.
+
+    Returns:
+        list: {"name", "kind", "value"} dicts for counters and {"name", "kind",
+        "count", "sum", "p50", "p95"} dicts for histograms, sorted by name.
+    """
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    rows = []
+    for metric in metrics:
+        if isinstance(metric, Histogram):
+            rows.append(dict(metric.summary(), name=metric.name, kind=metric.kind))
+        else:
+            rows.append({"name": metric.name, "kind": metric.kind, "value": metric.value})
+    return rows
+
+def reset():
+    """
+    Zeroes every metric's values (e.g. between benchmark runs).
+
+    The metrics stay registered, since modules hold them from import time.
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        metric.reset()
+
+# --- Exporters ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would otherwise flood the service log
+
+def write_file(path):
+    """Atomically writes the Prometheus text to path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters(port=METRICS_PORT, host=METRICS_HOST, path=METRICS_FILE, interval=FLUSH_INTERVAL):
+    """
+    Starts the configured exporters once per process: the HTTP /metrics
+    endpoint if `port` is set and the periodic file writer if `path` is set.
+
+    Returns:
+        bool: True if this call started them, False if they were already running.
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return False
+        _exporters_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        except OSError as e:
+            print(f"Error starting metrics endpoint on {host}:{port}: {e}")
+
+    if path:
+        path = path.replace("{pid}", str(os.getpid()))
+
+        def flush_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_file(path)
+                except Exception as e:
+                    print(f"Error writing metrics file: {e}")
+
+        threading.Thread(target=flush_forever, name="metrics-file", daemon=True).start()
+    return True
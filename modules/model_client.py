@@ -0,0 +1,301 @@
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from google.api_core import exceptions
+from PIL import Image, ImageDraw
+from modules import prompts
+
+# Set to "offline" to run against the local stand-in instead of the Gemini API
+MODEL_BACKEND = os.environ.get("GRANT_ARCHITECT_MODEL_BACKEND", "gemini")
+
+class StreamCancel:
+    """
+    Abandons an in-flight stream_chat from another thread.
+
+    stream_chat registers how to close its transport with on_cancel();
+    cancel() runs those callbacks at once in the cancelling thread, so the
+    request stops without waiting for its next chunk to arrive.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def on_cancel(self, fn):
+        """Calls fn() on cancel(), or now if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Error cancelling stream: {e}")
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        """Sleeps up to timeout seconds; True as soon as the stream is cancelled."""
+        return self._event.wait(timeout)
+
+def _close_response(response):
+    """Closes the transport under a streaming genai response (a gRPC call or an HTTP body)."""
+    iterator = getattr(response, "_iterator", None)
+    for name in ("cancel", "close"):
+        close = getattr(iterator, name, None)
+        if callable(close):
+            close()
+            return
+
+class GeminiClient:
+    """Thin wrapper over google.generativeai used by every generation hot path."""
+
+    def __init__(self, api_key):
+        import google.generativeai as genai
+        self.genai = genai
+        self.api_key = api_key
+        genai.configure(api_key=api_key)
+
+    def list_models(self):
+        """Returns names of models that support generateContent."""
+        models = []
+        for m in self.genai.list_models():
+            if 'generateContent' in m.supported_generation_methods:
+                models.append(m.name)
+        return models
+
+    def stream_chat(self, model_name, history, system_instruction=None, request_options=None, cancel=None):
+        """
+        Streams a chat reply.
+
+        Args:
+            model_name (str): Model to use.
+            history (list): Gemini-style contents, e.g. [{"role": "user", "parts": ["..."]}].
+            system_instruction (str): Optional system prompt.
+            request_options (dict): Optional request options such as {"timeout": 60}.
+            cancel (StreamCancel): Optional; cancelling it closes the response's connection.
+
+        Yields:
+            str: Text chunks as they arrive.
+        """
+        model = self.genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        response = model.generate_content(history, stream=True, request_options=request_options)
+        if cancel is not None:
+            cancel.on_cancel(lambda: _close_response(response))
+        for chunk in response:
+            if cancel is not None and cancel.is_set():
+                return
+            if chunk.text:
+                yield chunk.text
+
+    def generate_text(self, model_name, prompt, request_options=None):
+        """Returns the full text reply for a single prompt."""
+        model = self.genai.GenerativeModel(model_name)
+        return model.generate_content(prompt, request_options=request_options).text
+
+    def generate_image(self, model_name, prompt, request_options=None):
+        """
+        Generates an image.
+
+        Returns:
+            bytes: Encoded image data, or None if the response held no image.
+        """
+        model = self.genai.GenerativeModel(model_name)
+        response = model.generate_content(prompt, request_options=request_options)
+
+        # Check if response contains image data
+        if response.parts:
+            for part in response.parts:
+                if hasattr(part, 'inline_data') and part.inline_data:
+                    return part.inline_data.data
+
+        # Fallback for different response structures
+        if hasattr(response, 'images') and response.images:
+            buffer = io.BytesIO()
+            response.images[0].save(buffer, format='PNG')
+            return buffer.getvalue()
+        return None
+
+class OfflineClient:
+    """
+    Local stand-in for the Gemini API used for benchmarks and offline tests.
+
+    Replies are replayed from a recorded JSONL file (one {"text": ...} per
+    line) or synthesised, and streamed with a configurable time-to-first-token
+    and token rate. A fraction of calls can fail with a 429 ResourceExhausted
+    error, mirroring what the live API returns under quota pressure, and a
+    fraction of streams can break partway with a 429 or a dropped connection
+    (503). Asked to continue an interrupted reply (prompts.CONTINUE_PROMPT),
+    it streams the rest of the same reply.
+    """
+
+    MODELS = ["models/offline-flash", "models/offline-pro"]
+
+    VOCABULARY = (
+        "market growth funding strategy revenue customers operations impact grant "
+        "scalable sustainable projections investment team product service pricing "
+        "partners milestones community supply quality risk forecast segment"
+    ).split()
+
+    def __init__(self, ttft=0.3, tokens_per_second=200.0, chunk_tokens=8, reply_tokens=300,
+                 rate_limit_probability=0.0, image_latency=1.0, text_latency=0.5,
+                 replay_file=None, seed=None, stream_fault_probability=0.0):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = chunk_tokens
+        self.reply_tokens = reply_tokens
+        self.rate_limit_probability = rate_limit_probability
+        self.stream_fault_probability = stream_fault_probability
+        self.image_latency = image_latency
+        self.text_latency = text_latency
+        self.replies = []
+        if replay_file:
+            with open(replay_file, "r") as f:
+                self.replies = [json.loads(line)["text"] for line in f if line.strip()]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replay_index = 0
+        self._streamed = OrderedDict() # Prompt -> reply tokens, for continuing interrupted replies
+
+    @classmethod
+    def from_env(cls):
+        """Builds a stand-in configured by GRANT_ARCHITECT_OFFLINE_* environment variables."""
+        env = os.environ.get
+        return cls(
+            ttft=float(env("GRANT_ARCHITECT_OFFLINE_TTFT", 0.3)),
+            tokens_per_second=float(env("GRANT_ARCHITECT_OFFLINE_TOKENS_PER_SEC", 200)),
+            reply_tokens=int(env("GRANT_ARCHITECT_OFFLINE_REPLY_TOKENS", 300)),
+            rate_limit_probability=float(env("GRANT_ARCHITECT_OFFLINE_429_RATE", 0)),
+            stream_fault_probability=float(env("GRANT_ARCHITECT_OFFLINE_STREAM_FAULT_RATE", 0)),
+            image_latency=float(env("GRANT_ARCHITECT_OFFLINE_IMAGE_LATENCY", 1.0)),
+            replay_file=env("GRANT_ARCHITECT_OFFLINE_REPLAY_FILE")
+        )
+
+    def _maybe_rate_limit(self):
+        with self._lock:
+            hit = self._random.random() < self.rate_limit_probability
+        if hit:
+            raise exceptions.ResourceExhausted("429 Resource has been exhausted (offline stand-in)")
+
+    def _next_reply(self, prompt_text):
+        with self._lock:
+            if self.replies:
+                reply = self.replies[self._replay_index % len(self.replies)]
+                self._replay_index += 1
+                return reply
+            words = [self._random.choice(self.VOCABULARY) for _ in range(self.reply_tokens)]
+        # A request for the plan gets the marker app.py uses to detect plan turns
+        if re.search(r"generate\b.*\bplan", prompt_text, flags=re.IGNORECASE):
+            return "BUSINESS PLAN GENERATED\n# Executive Summary\n" + " ".join(words)
+        return " ".join(words)
+
+    def list_models(self):
+        return list(self.MODELS)
+
+    def _reply_tokens(self, history):
+        """Returns the reply's tokens and how many of them were already sent (when continuing)."""
+        last_turn = history[-1]["parts"][0] if history else ""
+        if last_turn == prompts.CONTINUE_PROMPT and len(history) >= 3 and history[-2]["role"] == "model":
+            prompt_text = history[-3]["parts"][0]
+            with self._lock:
+                tokens = self._streamed.get(prompt_text)
+            if tokens:
+                return tokens, len(history[-2]["parts"][0].split(" "))
+            last_turn = prompt_text
+        tokens = self._next_reply(last_turn).split(" ")
+        with self._lock:
+            self._streamed[last_turn] = tokens
+            while len(self._streamed) > 64:
+                self._streamed.popitem(last=False)
+        return tokens, 0
+
+    def stream_chat(self, model_name, history, system_instruction=None, request_options=None, cancel=None):
+        self._maybe_rate_limit()
+        pause = cancel.wait if cancel is not None else time.sleep # True once cancelled
+        tokens, sent = self._reply_tokens(history)
+        starts = list(range(sent, len(tokens), self.chunk_tokens))
+        with self._lock:
+            fault_at = None
+            if starts and self._random.random() < self.stream_fault_probability:
+                fault_at = self._random.randrange(len(starts))
+            fault = exceptions.ResourceExhausted if self._random.random() < 0.5 else exceptions.ServiceUnavailable
+        if pause(self.ttft):
+            return
+        interval = self.chunk_tokens / self.tokens_per_second if self.tokens_per_second else 0
+        for index, start in enumerate(starts):
+            if index == fault_at:
+                raise fault(f"Stream interrupted after {start} tokens (offline stand-in)")
+            if index and pause(interval):
+                return
+            chunk = " ".join(tokens[start:start + self.chunk_tokens])
+            yield chunk if start == 0 else " " + chunk
+
+    def generate_text(self, model_name, prompt, request_options=None):
+        self._maybe_rate_limit()
+        time.sleep(self.text_latency)
+        if '"visuals"' in prompt:
+            # Visual analysis request: propose one visual per heading in the excerpt
+            headings = re.findall(r"^\s*#\s+(.+)$", prompt, flags=re.MULTILINE)[:10]
+            visuals = [{"section": h.strip(), "prompt": f"Illustration for {h.strip()}"} for h in headings]
+            return json.dumps({"visuals": visuals})
+        return self._next_reply(prompt)
+
+    def generate_image(self, model_name, prompt, request_options=None):
+        self._maybe_rate_limit()
+        time.sleep(self.image_latency)
+        digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+        img = Image.new("RGB", (1024, 1024), color=tuple(digest[:3]))
+        ImageDraw.Draw(img).text((20, 500), prompt[:80], fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+_offline_client = None
+_offline_lock = threading.Lock()
+
+def is_offline():
+    """Returns True when the offline stand-in backend is selected."""
+    return MODEL_BACKEND == "offline"
+
+def get_client(api_key):
+    """
+    Returns the model client for the configured backend.
+
+    Args:
+        api_key (str): The Google API Key (ignored by the offline stand-in).
+
+    Returns:
+        GeminiClient or OfflineClient: Object exposing list_models, stream_chat,
+        generate_text and generate_image.
+    """
+    global _offline_client
+    if is_offline():
+        with _offline_lock:
+            if _offline_client is None:
+                _offline_client = OfflineClient.from_env()
+            return _offline_client
+    return GeminiClient(api_key)
+
+def set_offline_client(client):
+    """Selects the offline backend and installs a specific stand-in instance."""
+    global MODEL_BACKEND, _offline_client
+    with _offline_lock:
+        MODEL_BACKEND = "offline"
+        _offline_client = client
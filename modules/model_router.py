@@ -0,0 +1,320 @@
+import itertools
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from modules import metrics, model_client, request_scheduler
+
+# Recent requests remembered per model (time to first token and success/failure)
+WINDOW = 50
+# Requests seen before a model's statistics are trusted for ranking and hedge deadlines
+MIN_SAMPLES = 5
+# Seconds a model is passed over after it answers with a 429
+RATE_LIMIT_COOLDOWN = 30.0
+# The user's chosen model keeps the route unless another is this many times faster
+STICKINESS = 1.25
+# Send a second (hedged) request when the first token is later than the model's p95 TTFT
+HEDGE_REQUESTS = os.environ.get("GRANT_ARCHITECT_HEDGE_REQUESTS", "1") != "0"
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_DELAY = 0.25 # seconds
+
+_HEDGES = metrics.counter("grant_architect_router_hedges_total", "Hedged second requests sent after a slow first token")
+_HEDGE_WINS = metrics.counter("grant_architect_router_hedge_wins_total", "Hedged requests that produced the first token")
+_FALLBACKS = metrics.counter("grant_architect_router_fallbacks_total", "Requests moved to another model after a failure")
+
+_VERSION_SUFFIX = re.compile(r"-(latest|\d{3}|exp(-\d+)?|preview(-[\d-]+)?)$")
+
+def model_family(model_name):
+    """
+    Returns the family a model belongs to: its name without the "models/"
+    prefix and version suffixes, e.g. "models/gemini-1.5-flash-002" -> "gemini-1.5-flash".
+    """
+    name = model_name.split("/")[-1]
+    while True:
+        stripped = _VERSION_SUFFIX.sub("", name)
+        if stripped == name:
+            return name
+        name = stripped
+
+def family_members(model_name, models):
+    """Models from `models` in the same family as model_name (model_name first)."""
+    family = model_family(model_name)
+    return [model_name] + [m for m in models if m != model_name and model_family(m) == family]
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+class ModelRouter:
+    """
+    Process-wide rolling latency and error statistics per model, used to route requests.
+
+    Each model keeps its last `window` times to first token and outcomes
+    (errors before the first token); a 429 instead takes the model out of
+    rotation for `cooldown` seconds.
+    Ranking prefers the user's model unless another approved model is
+    clearly faster (STICKINESS) or it is failing or rate-limited.
+    """
+
+    def __init__(self, window=WINDOW, min_samples=MIN_SAMPLES, cooldown=RATE_LIMIT_COOLDOWN,
+                 stickiness=STICKINESS, clock=time.monotonic):
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.stickiness = stickiness
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _entry(self, model_name):
+        entry = self._models.get(model_name)
+        if entry is None:
+            entry = self._models[model_name] = {
+                "ttft": deque(maxlen=self.window), "outcomes": deque(maxlen=self.window), "cooldown_until": 0.0
+            }
+        return entry
+
+    def record(self, model_name, ttft=None, error=None):
+        """Records a request's time to first token, or the error that ended it before one arrived."""
+        with self._lock:
+            entry = self._entry(model_name)
+            if error is not None and request_scheduler.is_rate_limit_error(error):
+                # Quota, not health: sit the model out for a while instead of counting an error
+                entry["cooldown_until"] = self.clock() + self.cooldown
+                return
+            entry["outcomes"].append(error is None)
+            if error is None:
+                entry["ttft"].append(ttft)
+
+    def _score(self, entry):
+        """Median TTFT inflated by the error rate, or None while there is too little data."""
+        if len(entry["ttft"]) < self.min_samples:
+            return None
+        errors = entry["outcomes"].count(False) / len(entry["outcomes"])
+        return _quantile(entry["ttft"], 0.5) / max(1.0 - errors, 0.1)
+
+    def rank(self, preferred, approved):
+        """
+        Orders the approved models for the next request, best first.
+
+        Models without enough data keep their given order after the scored
+        ones, except the preferred model, which leads until it has data;
+        rate-limited models go last.
+        """
+        candidates = [preferred] + [m for m in approved if m != preferred]
+        now = self.clock()
+        with self._lock:
+            def key(model_name):
+                entry = self._entry(model_name)
+                cooling = entry["cooldown_until"] > now
+                score = self._score(entry)
+                if score is None:
+                    score = 0.0 if model_name == preferred else float("inf")
+                elif model_name == preferred:
+                    score /= self.stickiness
+                return (cooling, score)
+            return sorted(candidates, key=key)
+
+    def hedge_delay(self, model_name, quantile=HEDGE_QUANTILE, minimum=HEDGE_MIN_DELAY):
+        """Seconds to wait for a first token before hedging (the model's p95 TTFT), or None without data."""
+        with self._lock:
+            entry = self._entry(model_name)
+            if len(entry["ttft"]) < self.min_samples:
+                return None
+            return max(_quantile(entry["ttft"], quantile), minimum)
+
+    def stats(self):
+        """
+        Returns per-model statistics for display.
+
+        Returns:
+            list: {"model", "requests", "p50", "p95", "error_rate", "cooldown"} dicts.
+        """
+        now = self.clock()
+        with self._lock:
+            rows = []
+            for model_name, entry in sorted(self._models.items()):
+                outcomes = entry["outcomes"]
+                if not outcomes:
+                    continue
+                rows.append({
+                    "model": model_name,
+                    "requests": len(outcomes),
+                    "p50": _quantile(entry["ttft"], 0.5),
+                    "p95": _quantile(entry["ttft"], 0.95),
+                    "error_rate": outcomes.count(False) / len(outcomes),
+                    "cooldown": max(0.0, entry["cooldown_until"] - now)
+                })
+            return rows
+
+class RoutedClient:
+    """
+    Model client whose stream_chat routes each request across approved models.
+
+    The request goes to the best-ranked model. If it fails before its first
+    token, the next model is tried at once. If its first token is later than
+    the model's p95, a hedged request goes to the next model (or the same
+    one, when it is the only approved model); whichever answers first is
+    streamed and the other is cancelled, closing its connection at once.
+    Other calls go to the wrapped client.
+
+    With a scheduler, every launch waits for and is charged to its own
+    model's rate limits (request_scheduler.RequestScheduler.acquire), so
+    fallbacks and hedges respect the per-key and per-model budgets; wrap the
+    turn in scheduler.submit(..., acquire=False) to retry 429s.
+    """
+
+    def __init__(self, client, approved, router=None, hedge=HEDGE_REQUESTS, clock=time.monotonic,
+                 scheduler=None, api_key=None, priority=request_scheduler.PRIORITY_INTERACTIVE):
+        self.client = client
+        self.approved = list(approved)
+        self.router = router or get_router()
+        self.hedge = hedge
+        self.clock = clock
+        self.scheduler = scheduler
+        self.api_key = api_key
+        self.priority = priority
+        self.last_model = None
+        self.hedged = False
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _launch(self, number, model_name, history, system_instruction, request_options, events):
+        """
+        Streams from one model in a daemon thread, posting (kind, number, payload) events.
+
+        Returns:
+            model_client.StreamCancel: Cancelling it abandons the request, queued or streaming.
+        """
+        cancel = model_client.StreamCancel()
+
+        def pump():
+            stream = None
+            first = True
+            try:
+                if self.scheduler is not None and not self.scheduler.acquire(self.api_key, model_name,
+                                                                             self.priority, cancel):
+                    return # Cancelled while waiting for its rate-limit tokens
+                started = self.clock()
+                stream = self.client.stream_chat(model_name, history, system_instruction=system_instruction,
+                                                 request_options=request_options, cancel=cancel)
+                for chunk in stream:
+                    if first:
+                        self.router.record(model_name, ttft=self.clock() - started)
+                        first = False
+                    if cancel.is_set():
+                        break
+                    events.put(("chunk", number, chunk))
+                if first:
+                    self.router.record(model_name, ttft=self.clock() - started)
+                events.put(("end", number, None))
+            except Exception as e:
+                if cancel.is_set():
+                    return # Closing the connection from the winner's side, not a model failure
+                if first:
+                    self.router.record(model_name, error=e)
+                if self.scheduler is not None and request_scheduler.is_rate_limit_error(e):
+                    self.scheduler.rate_limited(self.api_key, model_name)
+                events.put(("error", number, e))
+            finally:
+                if stream is not None and hasattr(stream, "close"):
+                    stream.close()
+
+        threading.Thread(target=pump, name=f"route-{model_name}", daemon=True).start()
+        return cancel
+
+    def stream_chat(self, model_name, history, system_instruction=None, request_options=None):
+        """
+        Streams a chat reply from the best approved model.
+
+        Args:
+            model_name (str): The user's chosen model, preferred while it performs.
+            history, system_instruction, request_options: As for the wrapped client.
+
+        Yields:
+            str: Text chunks from the winning request.
+
+        Raises:
+            Exception: The last error if every approved model failed before its first token,
+            or the winner's error if it fails mid-stream.
+        """
+        ranked = self.router.rank(model_name, self.approved)
+        queued = ranked[1:]
+        events = queue.Queue()
+        active = {} # Launch number -> (model name, cancel event)
+        launches = itertools.count()
+        self.hedged = False
+        hedge_number = None
+
+        def launch(target):
+            number = next(launches)
+            active[number] = (target, self._launch(number, target, history, system_instruction, request_options, events))
+            return number
+
+        def hedge_deadline(target):
+            delay = self.router.hedge_delay(target) if self.hedge and not self.hedged else None
+            return self.clock() + delay if delay is not None else None
+
+        launch(ranked[0])
+        deadline = hedge_deadline(ranked[0])
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            try:
+                kind, number, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # First token is late: hedge once, on the next model or the same one
+                self.hedged = True
+                _HEDGES.inc()
+                hedge_number = launch(queued.pop(0) if queued else ranked[0])
+                deadline = None
+                continue
+            if kind != "error":
+                break
+            del active[number]
+            if not active:
+                if not queued:
+                    raise payload
+                _FALLBACKS.inc()
+                deadline = hedge_deadline(queued[0])
+                launch(queued.pop(0))
+
+        winner = number
+        if winner == hedge_number:
+            _HEDGE_WINS.inc()
+        self.last_model = active[winner][0]
+        for other, (_, cancel) in active.items():
+            if other != winner:
+                cancel.cancel()
+        try:
+            # Events from a cancelled request still in the queue are skipped
+            while True:
+                if number == winner:
+                    if kind == "chunk":
+                        yield payload
+                    elif kind == "end":
+                        return
+                    else:
+                        raise payload
+                kind, number, payload = events.get()
+        finally:
+            active[winner][1].cancel()
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    """Returns the process-wide ModelRouter."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+def set_router(router):
+    """Replaces the process-wide router (e.g. for benchmarks)."""
+    global _router
+    with _router_lock:
+        _router = router
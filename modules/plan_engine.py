@@ -0,0 +1,156 @@
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from modules import context_builder, metrics, model_client, prompts, request_scheduler, resumable_stream
+
+# Sections generated at once per plan
+DEFAULT_CONCURRENCY = int(os.environ.get("GRANT_ARCHITECT_PLAN_CONCURRENCY", 4))
+# Attempts per section for errors the scheduler does not retry itself (e.g. empty replies)
+SECTION_ATTEMPTS = 3
+# Token budget for the consultation notes shared by every section request
+NOTES_TOKEN_BUDGET = 6000
+
+SECTION_DONE = "done"
+SECTION_FAILED = "failed"
+
+_SECTION_SECONDS = metrics.histogram(
+    "grant_architect_plan_section_seconds", "Writing one plan section, retries included"
+)
+
+SectionResult = namedtuple("SectionResult", ["index", "name", "text", "status", "attempts", "seconds", "error"])
+PlanResult = namedtuple("PlanResult", ["text", "sections"])
+
+def consultation_notes(messages, summary_state=None, budget=NOTES_TOKEN_BUDGET):
+    """
+    Condenses the consultation transcript into notes shared by every section request.
+
+    Reuses the chat context builder: recent turns verbatim, older turns via the
+    rolling summary (extractive if none has been computed yet).
+    """
+    builder = context_builder.ContextBuilder(budget=budget)
+    _, history, summary_state, _ = builder.build(messages, summary_state)
+    lines = []
+    if summary_state["text"]:
+        lines.append(f"Summary of earlier meetings:\n{summary_state['text']}\n")
+    for entry in history:
+        speaker = "Client" if entry["role"] == "user" else "Consultant"
+        lines.append(f"{speaker}: {entry['parts'][0]}")
+    return "\n\n".join(lines)
+
+def clean_section_text(text, name):
+    """Drops plan markers and a repeated section title, and demotes stray top-level headings."""
+    lines = [line for line in text.strip().splitlines() if prompts.PLAN_MARKER not in line]
+    if lines and lines[0].startswith("#") and re.sub(r"^#+\s*", "", lines[0]).strip().lower().endswith(name.lower()):
+        lines = lines[1:] # The model restated the section title
+    lines = ["#" + line if re.match(r"^#\s", line) else line for line in lines]
+    return "\n".join(lines).strip()
+
+def assemble_plan(sections, texts):
+    """Joins section bodies in plan order under top-level '# ' headings."""
+    parts = []
+    for section, text in zip(sections, texts):
+        if text is not None:
+            parts.append(f"# {section['name']}\n\n{text}")
+    return "\n\n".join(parts) + "\n"
+
+def _write_section(client, api_key, model_name, section, prompt, attempts):
+    """
+    Generates one section, retrying failed or empty replies.
+
+    A reply that fails partway is continued from what arrived on the next
+    attempt instead of being written again.
+    """
+    def new_stream():
+        return resumable_stream.ResumableStream(
+            client,
+            model_name,
+            [{"role": "user", "parts": [prompt]}],
+            system_instruction=prompts.SECTION_WRITER_PROMPT
+        )
+
+    stream = new_stream()
+    last_error = None
+    for attempt in range(1, attempts + 1):
+        try:
+            text = request_scheduler.get_scheduler().submit(
+                stream.read,
+                api_key,
+                model_name,
+                priority=request_scheduler.PRIORITY_BATCH
+            )
+            text = clean_section_text(text or "", section["name"])
+            if text:
+                return text, attempt, None
+            last_error = "empty reply"
+            stream = new_stream()
+        except Exception as e:
+            last_error = str(e)
+        print(f"Section '{section['name']}' attempt {attempt} failed: {last_error}")
+    return None, attempts, last_error
+
+def generate_plan(messages, api_key, model_name, summary_state=None, sections=None,
+                  max_workers=DEFAULT_CONCURRENCY, on_section=None, attempts=SECTION_ATTEMPTS, only=None):
+    """
+    Writes the business plan section by section, several sections at a time.
+
+    Every section request shares the same outline and consultation notes, goes
+    through the shared scheduler, and is retried on its own if it fails. The
+    plan is assembled in mandated order regardless of completion order.
+
+    Args:
+        messages (list): Consultation transcript as {"role", "content"} dicts.
+        api_key (str): The Google API Key.
+        model_name (str): Model used to write sections.
+        summary_state (dict): Rolling summary from the chat context builder, if any.
+        sections (list): Section dicts (default: prompts.PLAN_SECTIONS).
+        max_workers (int): Sections generated concurrently.
+        on_section (function): Optional callback called as (SectionResult, completed, total)
+            in the calling thread whenever a section finishes.
+        attempts (int): Attempts per section.
+        only (iterable): Names of the sections to write, e.g. to retry failed ones;
+            the outline each request sees still lists every section.
+
+    Returns:
+        PlanResult: The assembled plan text and per-section results in plan order
+        (only the sections written).
+    """
+    sections = sections or prompts.PLAN_SECTIONS
+    client = model_client.get_client(api_key)
+    notes = consultation_notes(messages, summary_state)
+    outline = [section["name"] for section in sections]
+    if only is not None:
+        only = set(only)
+        sections = [section for section in sections if section["name"] in only]
+
+    def run(index, section):
+        start = time.monotonic()
+        prompt = prompts.section_prompt(section, outline, notes)
+        text, used, error = _write_section(client, api_key, model_name, section, prompt, attempts)
+        status = SECTION_DONE if text is not None else SECTION_FAILED
+        if text is None:
+            text = f"_This section could not be generated ({error}). Regenerate the plan to retry._"
+        seconds = time.monotonic() - start
+        _SECTION_SECONDS.observe(seconds)
+        return SectionResult(index, section["name"], text, status, used, seconds, error)
+
+    results = [None] * len(sections)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="plan-section")
+    try:
+        pending = {executor.submit(run, index, section) for index, section in enumerate(sections)}
+        completed = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[result.index] = result
+                completed += 1
+                if on_section:
+                    on_section(result, completed, len(sections))
+    finally:
+        # A cancelled plan (callback raised) abandons sections not yet started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    text = assemble_plan(sections, [result.text for result in results])
+    return PlanResult(text, results)
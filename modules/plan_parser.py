@@ -0,0 +1,340 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+# Parsed plans kept for reuse across reruns, pages and exports
+MAX_CACHED_PLANS = 8
+# Parsed top-level sections kept so an edit only re-parses the section it touched
+MAX_CACHED_CHUNKS = 256
+
+# --- Plan tree ---
+# Every node is an immutable namedtuple so one cached parse can be shared safely.
+Run = namedtuple("Run", ["text", "bold", "italic"])
+Paragraph = namedtuple("Paragraph", ["runs"])
+Quote = namedtuple("Quote", ["runs"])
+ListBlock = namedtuple("ListBlock", ["ordered", "items"]) # items: ((depth, runs), ...)
+Table = namedtuple("Table", ["header", "rows"]) # header: (runs, ...); rows: ((runs, ...), ...)
+CodeBlock = namedtuple("CodeBlock", ["text"])
+# title is plain text; start/end are character offsets of the section (heading included) in the source text
+Section = namedtuple("Section", ["level", "title", "blocks", "children", "start", "end"])
+Plan = namedtuple("Plan", ["blocks", "sections", "digest"])
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# Lines that can split a plan into top-level chunks: fences and '# ' headings
+_CHUNK_LINE = re.compile(r"^[ \t]*(?:(```)|#[ \t]+\S)", re.MULTILINE)
+_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d{1,3}[.)])\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_INLINE = re.compile(
+    r"\*\*\*(.+?)\*\*\*"              # bold italic
+    r"|\*\*(.+?)\*\*|__(.+?)__"       # bold
+    r"|(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])" # italic
+    r"|`([^`]+)`"                     # inline code (kept as plain text)
+    r"|\[([^\]]+)\]\([^)]*\)"         # link (text only)
+)
+_INLINE_MARKERS = ("*", "_", "`", "[")
+
+def parse_inline(text):
+    """
+    Splits a line of markdown into styled runs.
+
+    Returns:
+        tuple: Run(text, bold, italic) items.
+    """
+    if not any(marker in text for marker in _INLINE_MARKERS):
+        return (Run(text, False, False),)
+    runs = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            runs.append(Run(text[position:match.start()], False, False))
+        both, bold, bold_alt, italic, code, link = match.groups()
+        if both is not None:
+            runs.append(Run(both, True, True))
+        elif bold is not None or bold_alt is not None:
+            runs.append(Run(bold if bold is not None else bold_alt, True, False))
+        elif italic is not None:
+            runs.append(Run(italic, False, True))
+        else:
+            runs.append(Run(code if code is not None else link, False, False))
+        position = match.end()
+    if position < len(text):
+        runs.append(Run(text[position:], False, False))
+    return tuple(runs)
+
+def runs_text(runs):
+    """Plain text of a run sequence."""
+    return "".join(run.text for run in runs)
+
+def _table_cells(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+class _SectionBuilder:
+    __slots__ = ("level", "title", "blocks", "children", "start", "end")
+
+    def __init__(self, level, title, start):
+        self.level = level
+        self.title = title
+        self.blocks = []
+        self.children = []
+        self.start = start
+        self.end = start
+
+    def freeze(self):
+        return Section(self.level, self.title, tuple(self.blocks),
+                       tuple(child.freeze() for child in self.children), self.start, self.end)
+
+def _parse(text, digest):
+    root = _SectionBuilder(0, "", 0)
+    stack = [root] # Open sections, outermost first
+    lines = text.splitlines(keepends=True)
+    offsets = []
+    position = 0
+    for line in lines:
+        offsets.append(position)
+        position += len(line)
+    total = len(lines)
+
+    list_items = None # Pending list: [ordered, [(depth, raw text), ...]]
+
+    def flush_list():
+        nonlocal list_items
+        if list_items:
+            items = tuple((depth, parse_inline(raw)) for depth, raw in list_items[1])
+            stack[-1].blocks.append(ListBlock(list_items[0], items))
+            list_items = None
+
+    i = 0
+    while i < total:
+        raw = lines[i].rstrip("\r\n")
+        stripped = raw.strip()
+
+        if not stripped:
+            # A blank line ends a list unless the next non-blank line continues it
+            if list_items:
+                j = i + 1
+                while j < total and not lines[j].strip():
+                    j += 1
+                match = _LIST_ITEM.match(lines[j].rstrip("\r\n")) if j < total else None
+                if not match or match.group(2)[0].isdigit() != list_items[0]:
+                    flush_list()
+            i += 1
+            continue
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            flush_list()
+            level = len(heading.group(1))
+            while stack[-1].level >= level:
+                stack.pop().end = offsets[i]
+            section = _SectionBuilder(level, runs_text(parse_inline(heading.group(2))), offsets[i])
+            stack[-1].children.append(section)
+            stack.append(section)
+            i += 1
+            continue
+
+        if stripped.startswith("```"):
+            flush_list()
+            code = []
+            i += 1
+            while i < total and not lines[i].strip().startswith("```"):
+                code.append(lines[i].rstrip("\r\n"))
+                i += 1
+            stack[-1].blocks.append(CodeBlock("\n".join(code)))
+            i += 1 # Closing fence
+            continue
+
+        if stripped.startswith("|") and i + 1 < total and _TABLE_SEPARATOR.match(lines[i + 1]):
+            flush_list()
+            header = tuple(parse_inline(cell) for cell in _table_cells(stripped))
+            rows = []
+            i += 2
+            while i < total and lines[i].strip().startswith("|"):
+                cells = _table_cells(lines[i])
+                cells = (cells + [""] * len(header))[:len(header)] # Pad or trim to the header width
+                rows.append(tuple(parse_inline(cell) for cell in cells))
+                i += 1
+            stack[-1].blocks.append(Table(header, tuple(rows)))
+            continue
+
+        item = _LIST_ITEM.match(raw)
+        if item and not _RULE.match(stripped):
+            ordered = item.group(2)[0].isdigit()
+            if list_items and list_items[0] != ordered:
+                flush_list()
+            if not list_items:
+                list_items = [ordered, []]
+            depth = min(len(item.group(1).expandtabs(4)) // 2, 2)
+            list_items[1].append((depth, item.group(3).strip()))
+            i += 1
+            continue
+
+        if list_items and raw[:1] in (" ", "\t"):
+            # Indented continuation of the previous list item
+            depth, item_text = list_items[1][-1]
+            list_items[1][-1] = (depth, item_text + " " + stripped)
+            i += 1
+            continue
+
+        flush_list()
+        if stripped.startswith(">"):
+            stack[-1].blocks.append(Quote(parse_inline(stripped.lstrip("> ").strip())))
+        elif not _RULE.match(stripped):
+            # Each line is its own paragraph, as in the original exporter
+            stack[-1].blocks.append(Paragraph(parse_inline(stripped)))
+        i += 1
+
+    flush_list()
+    for section in stack:
+        section.end = len(text)
+    root = root.freeze()
+    return Plan(root.blocks, root.children, digest)
+
+def _chunk_starts(text):
+    """
+    Offsets of the top-level ('# ') headings outside code fences, after 0.
+
+    Missing a split is harmless (a chunk may hold several sections); only
+    lines that _parse would also treat as level-1 headings are split on.
+    """
+    starts = [0]
+    fenced = False
+    for match in _CHUNK_LINE.finditer(text):
+        if match.group(1):
+            fenced = not fenced
+        elif not fenced and match.start():
+            starts.append(match.start())
+    return starts
+
+def _shift(section, delta):
+    """Moves a section parsed on its own to its offset in the full text."""
+    return section._replace(start=section.start + delta, end=section.end + delta,
+                            children=tuple(_shift(child, delta) for child in section.children))
+
+def _lru_get(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def _lru_put(cache, key, value, limit):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+_cache = OrderedDict()
+_chunk_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def parse_plan(plan_text):
+    """
+    Parses plan markdown into a section tree, reusing earlier parses of the same text.
+
+    Headings open nested sections; paragraphs, bullet/numbered lists (up to three
+    levels), pipe tables, block quotes and fenced code become blocks, with
+    bold/italic kept as runs. The result is immutable and memoised by content
+    hash, so Review, Export and image matching all share one parse. Top-level
+    sections are also cached on their own, so after an edit only the changed
+    sections are parsed again.
+
+    Args:
+        plan_text (str): The plan markdown.
+
+    Returns:
+        Plan: blocks before the first heading, top-level sections and the content digest.
+    """
+    plan_text = plan_text or ""
+    digest = hashlib.sha1(plan_text.encode("utf-8")).hexdigest()
+    plan = _lru_get(_cache, digest)
+    if plan is not None:
+        return plan
+
+    # A level-1 heading closes every open section, so each top-level chunk parses independently
+    starts = _chunk_starts(plan_text)
+    blocks = ()
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(plan_text)]):
+        chunk = plan_text[start:end]
+        chunk_digest = hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+        parsed = _lru_get(_chunk_cache, chunk_digest)
+        if parsed is None:
+            parsed = _parse(chunk, chunk_digest)
+            _lru_put(_chunk_cache, chunk_digest, parsed, MAX_CACHED_CHUNKS)
+        if start == 0:
+            blocks = parsed.blocks # Text before the first heading
+        sections.extend(_shift(section, start) if start else section for section in parsed.sections)
+    plan = Plan(blocks, tuple(sections), digest)
+
+    _lru_put(_cache, digest, plan, MAX_CACHED_PLANS)
+    return plan
+
+def clear_cache():
+    """Drops all cached parses."""
+    with _cache_lock:
+        _cache.clear()
+        _chunk_cache.clear()
+
+def top_headings(text):
+    """
+    Titles of the '# ' headings outside code fences, as parse_plan would title them.
+
+    Only the heading lines are read, so this is cheap for a slice of a plan
+    and leaves the parse caches alone.
+
+    Returns:
+        tuple: Heading titles in document order.
+    """
+    titles = []
+    fenced = False
+    for match in _CHUNK_LINE.finditer(text or ""):
+        if match.group(1):
+            fenced = not fenced
+            continue
+        line_end = text.find("\n", match.start())
+        heading = None if fenced else _HEADING.match(text[match.start():line_end if line_end >= 0 else None].strip())
+        if heading and len(heading.group(1)) == 1:
+            titles.append(runs_text(parse_inline(heading.group(2))))
+    return tuple(titles)
+
+def iter_sections(plan):
+    """Yields every section of a Plan (or a Section and its subsections) depth-first, in document order."""
+    stack = [plan] if isinstance(plan, Section) else list(reversed(plan.sections))
+    while stack:
+        section = stack.pop()
+        yield section
+        stack.extend(reversed(section.children))
+
+def block_text(block):
+    """Plain text of a block; list items and table cells are separated by newlines."""
+    if isinstance(block, (Paragraph, Quote)):
+        return runs_text(block.runs)
+    if isinstance(block, ListBlock):
+        return "\n".join(runs_text(runs) for _, runs in block.items)
+    if isinstance(block, Table):
+        cells = list(block.header) + [cell for row in block.rows for cell in row]
+        return "\n".join(runs_text(runs) for runs in cells)
+    if isinstance(block, CodeBlock):
+        return block.text
+    return ""
+
+def block_words(block):
+    """Approximate word count of a block."""
+    return len(block_text(block).split())
+
+def outline(plan):
+    """
+    Returns the plan's headings with word counts for navigation and review.
+
+    Returns:
+        list: (level, title, words) tuples in document order; words exclude subsections.
+    """
+    return [(s.level, s.title, sum(block_words(b) for b in s.blocks)) for s in iter_sections(plan)]
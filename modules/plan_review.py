@@ -0,0 +1,96 @@
+import difflib
+from collections import namedtuple
+from modules import plan_parser
+
+# A reviewable slice of the plan: one heading and its own text, up to the next heading
+# of any level (text before the first heading is unit 0, level 0, unless it is blank).
+# start/end are character offsets in the generated plan text; words counts that span.
+ReviewUnit = namedtuple("ReviewUnit", ["level", "title", "start", "end", "words"])
+
+def index_plan(plan_text):
+    """
+    Splits the plan into review units by heading, from the shared parse.
+
+    The units tile the text exactly, so joining their slices gives the plan back
+    and an edit to one unit never touches another.
+
+    Returns:
+        tuple: ReviewUnit tuples in document order.
+    """
+    plan_text = plan_text or ""
+    plan = plan_parser.parse_plan(plan_text)
+    sections = list(plan_parser.iter_sections(plan))
+    units = []
+    if not sections or plan_text[:sections[0].start].strip():
+        end = sections[0].start if sections else len(plan_text)
+        units.append(ReviewUnit(0, "", 0, end, sum(plan_parser.block_words(b) for b in plan.blocks)))
+    for number, section in enumerate(sections):
+        start = section.start if units else 0 # Blank lines before the first heading belong to it
+        end = sections[number + 1].start if number + 1 < len(sections) else len(plan_text)
+        units.append(ReviewUnit(section.level, section.title, start, end,
+                                sum(plan_parser.block_words(b) for b in section.blocks)))
+    return tuple(units)
+
+def diff_text(base, edited):
+    """
+    Returns the line-level changes that turn base into edited.
+
+    Returns:
+        list: [first line, end line, replacement text] edits against base's lines, in order;
+        JSON-friendly, and empty when the texts are equal.
+    """
+    base_lines = base.splitlines(keepends=True)
+    edited_lines = edited.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, edited_lines, autojunk=False)
+    return [[i1, i2, "".join(edited_lines[j1:j2])]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+def apply_diff(base, diff):
+    """Applies a diff_text() result to base and returns the edited text."""
+    if not diff:
+        return base
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    position = 0
+    for first, end, replacement in diff:
+        parts.extend(base_lines[position:first])
+        parts.append(replacement)
+        position = end
+    parts.extend(base_lines[position:])
+    return "".join(parts)
+
+def unit_text(plan_text, units, edits, number):
+    """The current text of review unit `number`: its slice of the plan with its edit applied."""
+    unit = units[number]
+    return apply_diff(plan_text[unit.start:unit.end], edits.get(str(number)))
+
+def headings(plan_text, units, edits):
+    """
+    The titles of the plan's '# ' headings with every section edit applied.
+
+    Unedited units give their indexed title; only edited units are read again,
+    so image placement can follow heading edits without materialise().
+
+    Returns:
+        tuple: Heading titles in document order.
+    """
+    titles = []
+    for number, unit in enumerate(units):
+        if str(number) in edits:
+            titles.extend(plan_parser.top_headings(unit_text(plan_text, units, edits, number)))
+        elif unit.level == 1:
+            titles.append(unit.title)
+    return tuple(titles)
+
+def materialise(plan_text, units, edits):
+    """
+    Returns the full plan text with every section edit applied.
+
+    Args:
+        plan_text (str): The generated plan the units index.
+        units (tuple): index_plan(plan_text).
+        edits (dict): Section diffs keyed by the unit number as a string.
+    """
+    if not edits:
+        return plan_text
+    return "".join(unit_text(plan_text, units, edits, number) for number in range(len(units)))
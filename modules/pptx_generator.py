@@ -0,0 +1,156 @@
+import io
+import re
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+from pptx.util import Pt
+from modules import document_generator, export_assets, image_matcher, metrics, plan_parser
+
+# Bullet points per slide, and the length a bullet is cut to
+MAX_BULLETS = 6
+MAX_BULLET_CHARS = 120
+# Bullet text size by level (deeper levels use the last size)
+BULLET_SIZES = (Pt(20), Pt(16))
+TITLE_SIZE = Pt(32)
+
+# Layouts of the default template
+_TITLE_LAYOUT = 0
+_CONTENT_LAYOUT = 1
+_TWO_CONTENT_LAYOUT = 3
+_PICTURE_LAYOUT = 8 # Picture with Caption, used for a cover with an image
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+_COMPILE_SECONDS = metrics.histogram("grant_architect_pptx_compile_seconds", "Compiling the pitch deck .pptx")
+
+def _clip(text):
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_BULLET_CHARS else text[:MAX_BULLET_CHARS - 1].rstrip() + "…"
+
+def _first_sentence(runs):
+    text = " ".join(plan_parser.runs_text(runs).split())
+    match = _SENTENCE_END.search(text)
+    return _clip(text[:match.start()] if match else text)
+
+def _block_bullets(block):
+    if isinstance(block, (plan_parser.Paragraph, plan_parser.Quote)):
+        return [(0, _first_sentence(block.runs))]
+    if isinstance(block, plan_parser.ListBlock):
+        return [(depth, _clip(plan_parser.runs_text(runs))) for depth, runs in block.items]
+    return [] # Tables and code do not summarise into bullets
+
+def _opening(section):
+    """The first sentence of a section's first paragraph, as a bullet list of at most one."""
+    first = next((b for b in section.blocks if isinstance(b, plan_parser.Paragraph)), None)
+    return [(0, _first_sentence(first.runs))] if first else []
+
+def section_bullets(section):
+    """
+    Summarises a section as slide bullets.
+
+    A section with subsections gets its opening sentence, then each
+    subsection's title with its own opening sentence beneath it; otherwise
+    the first sentence of each paragraph and the list items are used.
+
+    Returns:
+        list: (level, text) tuples, at most MAX_BULLETS.
+    """
+    if section.children:
+        bullets = _opening(section)
+        for child in section.children:
+            bullets.append((0, _clip(child.title)))
+            bullets.extend((1, text) for _, text in _opening(child))
+    else:
+        bullets = [bullet for block in section.blocks for bullet in _block_bullets(block)]
+    return [(level, text) for level, text in bullets if text][:MAX_BULLETS]
+
+def _style_title(shape, text, heading_color, fonts, size=None):
+    shape.text_frame.text = text
+    for paragraph in shape.text_frame.paragraphs:
+        for run in paragraph.runs:
+            run.font.color.rgb = heading_color
+            if size:
+                run.font.size = size
+            if fonts:
+                run.font.name = fonts[1]
+
+def _fill_bullets(shape, bullets, fonts):
+    text_frame = shape.text_frame
+    text_frame.word_wrap = True
+    for number, (level, text) in enumerate(bullets):
+        paragraph = text_frame.paragraphs[0] if number == 0 else text_frame.add_paragraph()
+        paragraph.text = text
+        paragraph.level = level
+        for run in paragraph.runs:
+            run.font.size = BULLET_SIZES[min(level, len(BULLET_SIZES) - 1)]
+            if fonts:
+                run.font.name = fonts[0]
+
+def _add_fitted_picture(slide, encoded, placeholder):
+    """Puts an encoded image where `placeholder` was, as large as fits, and removes the placeholder."""
+    box_left, box_top, box_width, box_height = placeholder.left, placeholder.top, placeholder.width, placeholder.height
+    placeholder.element.getparent().remove(placeholder.element)
+    scale = min(box_width / encoded.width, box_height / encoded.height)
+    width, height = int(encoded.width * scale), int(encoded.height * scale)
+    slide.shapes.add_picture(io.BytesIO(encoded.data), box_left + (box_width - width) // 2,
+                             box_top + (box_height - height) // 2, width, height)
+
+def _add_cover(prs, business_name, slogan, heading_color, fonts, cover_image):
+    if cover_image is None:
+        slide = prs.slides.add_slide(prs.slide_layouts[_TITLE_LAYOUT])
+        _style_title(slide.shapes.title, business_name, heading_color, fonts)
+        slide.placeholders[1].text_frame.text = slogan
+        return
+    slide = prs.slides.add_slide(prs.slide_layouts[_PICTURE_LAYOUT])
+    _style_title(slide.shapes.title, business_name, heading_color, fonts)
+    slide.placeholders[1].insert_picture(io.BytesIO(cover_image.data)) # Cropped to fill the frame
+    slide.placeholders[2].text_frame.text = slogan
+
+def _add_section_slide(prs, title, bullets, heading_color, fonts, image):
+    layout = _TWO_CONTENT_LAYOUT if image is not None else _CONTENT_LAYOUT
+    slide = prs.slides.add_slide(prs.slide_layouts[layout])
+    _style_title(slide.shapes.title, title, heading_color, fonts, TITLE_SIZE)
+    _fill_bullets(slide.placeholders[1], bullets, fonts)
+    if image is not None:
+        _add_fitted_picture(slide, image, slide.placeholders[2])
+
+@metrics.timed(_COMPILE_SECONDS)
+def write_pptx(output, business_name, slogan, plan_text, theme_color, generated_images, use_3d_assets=False, font_style=None):
+    """
+    Writes a pitch deck .pptx summarising the plan to a file or binary stream.
+
+    The deck is built from the same cached plan parse and image placement as
+    the .docx, and embeds the renditions export_assets already encoded for
+    it, so compiling both (see export_assets.prepare_export) parses and
+    encodes once. There is a cover slide, then one slide per top-level
+    section with its bullets (section_bullets) and its image, if any.
+
+    Args:
+        output (str or file): Path or writable binary file object for the .pptx.
+        business_name (str): Name of the business.
+        slogan (str): Business slogan.
+        plan_text (str): The full markdown-like text of the business plan.
+        theme_color (str): Selected color theme; slide titles take its heading colour.
+        generated_images (Mapping): PIL images keyed by section name (a dict or asset_store.ImageSet).
+        use_3d_assets (bool): Accepted for parity with write_docx; not used.
+        font_style (str): Design Studio font style (a document_generator.FONT_STYLES key).
+
+    Returns:
+        str or file: The output that was written to.
+    """
+    heading_color = RGBColor(*document_generator.THEME_COLORS.get(theme_color, (0, 0, 0)))
+    fonts = document_generator.FONT_STYLES.get(font_style)
+    plan = plan_parser.parse_plan(plan_text)
+    placement_plan = image_matcher.match_plan_images(plan, generated_images.keys())
+    section_images = {p.heading_index: p.key for p in placement_plan.placements}
+
+    prs = Presentation()
+    _add_cover(prs, business_name, slogan, heading_color, fonts,
+               export_assets.encode_asset(generated_images, placement_plan.cover, export_assets.COVER_WIDTH_IN))
+    overview = [bullet for block in plan.blocks for bullet in _block_bullets(block) if bullet[1]][:MAX_BULLETS]
+    if overview:
+        _add_section_slide(prs, "Overview", overview, heading_color, fonts, None)
+    for index, section in enumerate(plan.sections):
+        image = export_assets.encode_asset(generated_images, section_images.get(index), export_assets.SECTION_WIDTH_IN)
+        _add_section_slide(prs, section.title or business_name, section_bullets(section), heading_color, fonts, image)
+    prs.save(output)
+    return output
@@ -0,0 +1,401 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from modules import metrics
+
+try:
+    import fcntl
+except ImportError: # Windows: shared buckets are unavailable
+    fcntl = None
+
+# Priority classes: lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+# Request budgets (requests per minute) and burst sizes
+KEY_REQUESTS_PER_MINUTE = float(os.environ.get("GRANT_ARCHITECT_RPM_PER_KEY", 60))
+MODEL_REQUESTS_PER_MINUTE = float(os.environ.get("GRANT_ARCHITECT_RPM_PER_MODEL", 30))
+BURST = float(os.environ.get("GRANT_ARCHITECT_RATE_BURST", 5))
+# Directory for bucket state shared between worker processes (unset = per process)
+SHARED_STATE_DIR = os.environ.get("GRANT_ARCHITECT_SCHEDULER_STATE_DIR")
+
+MAX_RETRIES = 3
+BASE_BACKOFF = 2.0 # seconds; doubled per attempt, with full jitter
+
+_WAIT_SECONDS = metrics.histogram(
+    "grant_architect_scheduler_wait_seconds", "Time model calls waited for their turn and rate-limit tokens"
+)
+_RATE_LIMITED = metrics.counter("grant_architect_scheduler_rate_limited_total", "Model calls answered with a 429")
+_RETRIES = metrics.counter("grant_architect_scheduler_retries_total", "Model calls retried after a 429")
+_FAILED = metrics.counter("grant_architect_scheduler_failed_total", "Model calls that failed (retries exhausted or another error)")
+
+def is_rate_limit_error(e):
+    """Returns True for 429 / ResourceExhausted errors."""
+    return "429" in str(e) or "ResourceExhausted" in str(e)
+
+class TokenBucket:
+    """In-process token bucket with a cooldown that 429 responses can extend."""
+
+    def __init__(self, requests_per_minute, burst):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1:
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate else 1.0
+
+    def try_consume(self):
+        """Takes a token if one is available now; returns 0, or the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate else 1.0
+
+    def refund(self):
+        """Returns a token taken by try_consume() for a call that did not start."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def penalize(self, seconds):
+        """Blocks the bucket for `seconds` and drains it after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = now
+
+class FileTokenBucket:
+    """
+    Token bucket whose state lives in a small JSON file guarded by flock.
+
+    Every Streamlit worker process pointing at the same directory shares the
+    same budget and 429 cooldown, so one key is not over-subscribed by N workers.
+    Wall-clock time is used because monotonic clocks are per process.
+    """
+
+    def __init__(self, path, requests_per_minute, burst):
+        self.path = path
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _update(self, mutate):
+        with self._lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                now = time.time()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                tokens = state.get("tokens", self.capacity)
+                updated = state.get("updated", now)
+                state["tokens"] = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+                state["updated"] = now
+                state.setdefault("blocked_until", 0.0)
+                result = mutate(state, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _delay(self, state, now):
+        if now < state["blocked_until"]:
+            return state["blocked_until"] - now
+        if state["tokens"] >= 1:
+            return 0.0
+        return (1 - state["tokens"]) / self.rate if self.rate else 1.0
+
+    def delay(self):
+        return self._update(self._delay)
+
+    def try_consume(self):
+        """Checks for and takes a token in one flock transaction, so two processes cannot both take the last one."""
+        def take(state, now):
+            delay = self._delay(state, now)
+            if delay <= 0:
+                state["tokens"] -= 1
+            return delay
+        return self._update(take)
+
+    def refund(self):
+        def give_back(state, now):
+            state["tokens"] = min(self.capacity, state["tokens"] + 1)
+        self._update(give_back)
+
+    def penalize(self, seconds):
+        def block(state, now):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            state["tokens"] = 0.0
+        self._update(block)
+
+class RequestScheduler:
+    """
+    Process-wide gate for every model call.
+
+    Callers are queued per API key in priority order, so interactive chat turns
+    overtake queued batch image jobs; within a priority class, calls to the same
+    model run first-come first-served. A call starts only when both the per-key
+    and per-model token buckets allow it. On a 429 the affected
+    buckets are drained and blocked, and the call is retried after a jittered
+    exponential backoff, so concurrent sessions back off together.
+    """
+
+    def __init__(self, key_rpm=KEY_REQUESTS_PER_MINUTE, model_rpm=MODEL_REQUESTS_PER_MINUTE, burst=BURST,
+                 shared_state_dir=SHARED_STATE_DIR, max_retries=MAX_RETRIES, base_backoff=BASE_BACKOFF):
+        self.key_rpm = key_rpm
+        self.model_rpm = model_rpm
+        self.burst = burst
+        self.shared_state_dir = shared_state_dir if fcntl else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._buckets = {}
+        self._queues = {}
+        self._cond = threading.Condition()
+        self._changes = 0 # Bumped on every notify, so a waiter knows if it missed one
+        self._seq = itertools.count()
+        self._random = random.Random()
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "rate_limited": 0,
+            "retries": 0, "wait_seconds": 0.0, "max_queue_depth": 0
+        }
+
+    def _bucket(self, name, rpm):
+        with self._cond:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                if self.shared_state_dir:
+                    bucket = FileTokenBucket(os.path.join(self.shared_state_dir, name + ".json"), rpm, self.burst)
+                else:
+                    bucket = TokenBucket(rpm, self.burst)
+                self._buckets[name] = bucket
+            return bucket
+
+    def _buckets_for(self, api_key, model_name):
+        key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        model_id = "".join(c if c.isalnum() else "_" for c in (model_name or "default"))
+        return (
+            self._bucket(f"key_{key_id}", self.key_rpm),
+            self._bucket(f"model_{key_id}_{model_id}", self.model_rpm)
+        )
+
+    @staticmethod
+    def _is_next(queue, entry):
+        """True if no queued call has higher priority, or the same priority and model but arrived earlier."""
+        priority, seq, model = entry
+        for other_priority, other_seq, other_model in queue:
+            if other_priority < priority:
+                return False
+            if other_priority == priority and other_model == model and other_seq < seq:
+                return False
+        return True
+
+    def _wake(self):
+        with self._cond:
+            self._changes += 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _try_consume(buckets):
+        """Takes a token from every bucket, or none; returns 0, or the seconds until the blocking one has a token."""
+        taken = []
+        for bucket in buckets:
+            delay = bucket.try_consume()
+            if delay > 0:
+                for other in taken:
+                    other.refund()
+                return delay
+            taken.append(bucket)
+        return 0.0
+
+    def _acquire(self, queue_name, model_name, buckets, priority, cancel=None):
+        """
+        Blocks until this caller is next in its queue and both buckets have a token.
+
+        Tokens are taken without holding the condition, since a FileTokenBucket
+        works under flock; each bucket checks and takes its token atomically,
+        so neither threads nor processes can both take the last one.
+
+        Returns:
+            bool: True once the tokens are taken; False if `cancel` was set first.
+        """
+        entry = (priority, next(self._seq), model_name)
+        start = time.monotonic()
+        acquired = False
+        if cancel is not None:
+            cancel.on_cancel(self._wake)
+        with self._cond:
+            queue = self._queues.setdefault(queue_name, [])
+            queue.append(entry)
+            depth = sum(len(q) for q in self._queues.values())
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        try:
+            while cancel is None or not cancel.is_set():
+                with self._cond:
+                    is_next = self._is_next(queue, entry)
+                    changes = self._changes
+                delay = self._try_consume(buckets) if is_next else 1.0
+                if delay <= 0:
+                    acquired = True
+                    break
+                with self._cond:
+                    if self._changes == changes:
+                        self._cond.wait(timeout=min(delay, 1.0))
+        finally:
+            with self._cond:
+                queue.remove(entry)
+                waited = time.monotonic() - start
+                self._stats["wait_seconds"] += waited
+                self._changes += 1
+                self._cond.notify_all()
+        _WAIT_SECONDS.observe(waited)
+        return acquired
+
+    def acquire(self, api_key, model_name, priority=PRIORITY_INTERACTIVE, cancel=None):
+        """
+        Waits for a call to model_name to be allowed and charges it to the key's and model's budgets.
+
+        For callers that choose the model per request (model_router.RoutedClient
+        launches), with submit(..., acquire=False) around the whole turn.
+
+        Args:
+            cancel (model_client.StreamCancel): Optional; stops the wait without charging anything.
+
+        Returns:
+            bool: True if the call may start, False if it was cancelled while queued.
+        """
+        buckets = self._buckets_for(api_key, model_name)
+        return self._acquire(id(buckets[0]), model_name, buckets, priority, cancel)
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retries from re-synchronising across sessions
+        return self._random.uniform(0, self.base_backoff * 2 ** (attempt + 1))
+
+    def rate_limited(self, api_key, model_name, attempt=0):
+        """Records a 429 for a call started with acquire() and backs off its key and model as submit() would."""
+        with self._cond:
+            self._stats["rate_limited"] += 1
+        _RATE_LIMITED.inc()
+        backoff = self._backoff(attempt)
+        for bucket in self._buckets_for(api_key, model_name):
+            bucket.penalize(backoff)
+
+    def submit(self, fn, api_key, model_name, priority=PRIORITY_INTERACTIVE, acquire=True):
+        """
+        Runs fn() in the calling thread once the rate limits allow it.
+
+        Args:
+            fn (callable): The model call. It is re-run from scratch on a 429.
+            api_key (str): API key the call is billed to.
+            model_name (str): Model the call targets.
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH.
+            acquire (bool): False when fn takes its own tokens per model it calls
+                (see acquire() and rate_limited()); submit() then only retries 429s.
+
+        Returns:
+            The return value of fn().
+
+        Raises:
+            Exception: The last error if retries are exhausted or the error is not a 429.
+        """
+        buckets = self._buckets_for(api_key, model_name)
+        queue_name = id(buckets[0])
+        with self._cond:
+            self._stats["submitted"] += 1
+
+        for attempt in range(self.max_retries):
+            if acquire:
+                self._acquire(queue_name, model_name, buckets, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    _FAILED.inc()
+                    raise
+                if acquire: # Otherwise fn reported it through rate_limited() and the model's buckets are blocked
+                    with self._cond:
+                        self._stats["rate_limited"] += 1
+                    _RATE_LIMITED.inc()
+                if attempt >= self.max_retries - 1:
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    _FAILED.inc()
+                    raise
+                if acquire:
+                    backoff = self._backoff(attempt)
+                    for bucket in buckets:
+                        bucket.penalize(backoff)
+                with self._cond:
+                    self._stats["retries"] += 1
+                _RETRIES.inc()
+                continue
+            with self._cond:
+                self._stats["completed"] += 1
+            return result
+
+    def stats(self):
+        """
+        Returns scheduler counters and the current queue depth per priority class.
+
+        Returns:
+            dict: submitted, completed, failed, rate_limited, retries, wait_seconds,
+            max_queue_depth and queue_depth ({"interactive": n, "batch": n}).
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for queue in self._queues.values():
+                for priority, _, _ in queue:
+                    depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        stats["queue_depth"] = depth
+        return stats
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Returns the process-wide RequestScheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+def set_scheduler(scheduler):
+    """Replaces the process-wide scheduler (e.g. for benchmarks or batch runs)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
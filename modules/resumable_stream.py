@@ -0,0 +1,150 @@
+import time
+from google.api_core import exceptions
+from modules import context_builder, metrics, prompts
+
+# Immediate resumes per reply after a dropped connection (429s are retried, and resumed, by the scheduler)
+MAX_RESUMES = 3
+# How much of a continuation is checked for text the model repeated from the end of the prefix
+OVERLAP_WINDOW = 200
+MIN_OVERLAP = 16
+# Checkpoint budget: whichever is reached first once new text has arrived
+CHECKPOINT_INTERVAL = 1.0 # seconds
+CHECKPOINT_BYTES = 2048
+
+_RESUMES = metrics.counter(
+    "grant_architect_stream_resumes_total", "Streamed replies continued from their received prefix after a failure"
+)
+_REUSED_TOKENS = metrics.counter(
+    "grant_architect_stream_reused_tokens_total", "Tokens kept from interrupted streams instead of being generated again"
+)
+
+_DISCONNECT_ERRORS = (
+    exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+    ConnectionError, TimeoutError
+)
+
+def is_disconnect_error(e):
+    """Returns True for dropped connections and transient server errors (503/504), which are resumed at once."""
+    return isinstance(e, _DISCONNECT_ERRORS) or "503" in str(e) or "504" in str(e)
+
+def continuation_history(history, partial):
+    """Returns the chat history extended with the partial reply and a request to finish it."""
+    return list(history) + [
+        {"role": "model", "parts": [partial]},
+        {"role": "user", "parts": [prompts.CONTINUE_PROMPT]}
+    ]
+
+def trim_overlap(prefix, text, window=OVERLAP_WINDOW, minimum=MIN_OVERLAP):
+    """Drops the start of a continuation that repeats the end of the prefix."""
+    for size in range(min(len(prefix), len(text), window), minimum - 1, -1):
+        if prefix.endswith(text[:size]):
+            return text[size:]
+    return text
+
+class ResumableStream:
+    """
+    Streams one chat reply and continues it from the received prefix after a failure.
+
+    Text received so far survives failed attempts. Dropped connections are
+    resumed at once, up to `max_resumes` times; other errors (429s included)
+    propagate, and calling chunks() again, e.g. from a scheduler retry,
+    resumes from the same prefix. A resumed request sends the prefix back as
+    the model's turn followed by prompts.CONTINUE_PROMPT, so only the missing
+    tail is generated.
+
+    `on_checkpoint(text)` is called as text arrives, on a time/size budget,
+    and always when an attempt fails, so the prefix can be persisted and an
+    interrupted reply resumed after a reload (pass it back as `text`).
+    """
+
+    def __init__(self, client, model_name, history, system_instruction=None, text="", on_checkpoint=None,
+                 max_resumes=MAX_RESUMES, checkpoint_interval=CHECKPOINT_INTERVAL,
+                 checkpoint_bytes=CHECKPOINT_BYTES, clock=time.monotonic):
+        self.client = client
+        self.model_name = model_name
+        self.history = list(history)
+        self.system_instruction = system_instruction
+        self.on_checkpoint = on_checkpoint
+        self.max_resumes = max_resumes
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_bytes = checkpoint_bytes
+        self.clock = clock
+        self._parts = [text] if text else []
+        self._length = len(text)
+        self._checkpointed_length = self._length
+        self._checkpointed_at = clock()
+        self.attempts = 0
+        self.resumes = 0
+        self.checkpoints = 0
+
+    @property
+    def text(self):
+        """The reply received so far."""
+        return "".join(self._parts)
+
+    def _append(self, chunk):
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        self.checkpoint()
+
+    def checkpoint(self, force=False):
+        """Reports the text received so far to on_checkpoint if it grew and the budget (or force) allows."""
+        if self.on_checkpoint is None or self._length == self._checkpointed_length:
+            return
+        now = self.clock()
+        if (not force
+                and self._length - self._checkpointed_length < self.checkpoint_bytes
+                and now - self._checkpointed_at < self.checkpoint_interval):
+            return
+        self.on_checkpoint(self.text)
+        self._checkpointed_length = self._length
+        self._checkpointed_at = now
+        self.checkpoints += 1
+
+    def chunks(self):
+        """
+        Yields new text as it arrives until the reply is complete.
+
+        Raises:
+            Exception: The error that ended the last attempt; the text received so far is kept.
+        """
+        resumes_left = self.max_resumes
+        while True:
+            prefix = self.text
+            history = self.history
+            if prefix:
+                history = continuation_history(history, prefix)
+                self.resumes += 1
+                _RESUMES.inc()
+                _REUSED_TOKENS.inc(context_builder.count_tokens(prefix))
+            self.attempts += 1
+            held = [] if prefix else None # Start of a continuation, until checked for overlap
+            try:
+                for chunk in self.client.stream_chat(self.model_name, history, system_instruction=self.system_instruction):
+                    if held is not None:
+                        held.append(chunk)
+                        if sum(len(part) for part in held) < OVERLAP_WINDOW:
+                            continue
+                        chunk = trim_overlap(prefix, "".join(held))
+                        held = None
+                    if chunk:
+                        self._append(chunk)
+                        yield chunk
+                if held:
+                    chunk = trim_overlap(prefix, "".join(held))
+                    if chunk:
+                        self._append(chunk)
+                        yield chunk
+                return
+            except Exception as e:
+                self.checkpoint(force=True)
+                if not is_disconnect_error(e) or resumes_left <= 0:
+                    raise
+                resumes_left -= 1
+                print(f"Stream interrupted after {self._length} characters, resuming: {e}")
+
+    def read(self):
+        """Streams the rest of the reply and returns its full text."""
+        for _ in self.chunks():
+            pass
+        return self.text
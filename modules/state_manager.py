@@ -1,58 +1,688 @@
 import json
 import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
 import streamlit as st
+from modules import asset_store, metrics, plan_review
 
-SESSION_FILE = "session_data.json"
+# Which backend stores sessions: "sqlite" (multi-process safe) or "journal"
+SESSION_BACKEND = os.environ.get("GRANT_ARCHITECT_SESSION_BACKEND", "sqlite")
+# SQLite database shared by every worker process
+SESSION_DB = os.environ.get("GRANT_ARCHITECT_SESSION_DB", "sessions.db")
+# Directory for per-session snapshot/journal files used by the journal backend
+SESSION_DIR = os.environ.get("GRANT_ARCHITECT_SESSION_DIR", "sessions")
+# Compact a session's journal into its snapshot once it grows past this many bytes
+COMPACT_THRESHOLD_BYTES = int(os.environ.get("GRANT_ARCHITECT_JOURNAL_COMPACT_BYTES", 1024 * 1024))
 
+# Query parameter carrying the session ID, so a page refresh finds the same session
+SESSION_QUERY_PARAM = "sid"
+# Session IDs double as file names for the journal backend, so keep them tame
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+_SAVE_SECONDS = metrics.histogram("grant_architect_session_save_seconds", "save_session, from diffing state to the backend write")
+
+# Fields persisted alongside the message history, with their defaults
+PERSISTED_FIELDS = {
+    "plan_generated": False,
+    "plan_asset_id": None, # Resident copy of the plan text in the asset store (the durable one is PLAN_TEXT_FIELD)
+    "plan_edits": {}, # Review edits as section diffs against that text, keyed by review unit
+    "selected_model": "models/gemini-1.5-flash",
+    "context_summary": None,
+    "plan_job_id": None
+}
+
+# The checkpoint of an assistant reply still streaming (or interrupted) is saved
+# apart from these, through set_pending_turn()/append_turn_text(), so each
+# checkpoint writes only the text received since the last one.
+
+# Backend field holding the generated plan text, written once per plan and read back
+# only if the asset store has evicted its copy
+PLAN_TEXT_FIELD = "generated_plan_text"
+
+def _digest(value):
+    """Cheap in-process fingerprint used to detect changed fields and messages."""
+    try:
+        if isinstance(value, dict):
+            return hash(tuple(sorted(value.items())))
+        return hash(value)
+    except TypeError:
+        return hash(json.dumps(value, sort_keys=True))
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class JournalBackend:
+    """
+    Stores each session as a JSON snapshot plus an append-only journal.
+
+    Every change is appended as a sequence-numbered JSON line and fsynced.
+    Once a journal passes COMPACT_THRESHOLD_BYTES it is folded into the
+    snapshot in a background thread (temp file, fsync, atomic rename).
+    Suitable for a single worker process; use SQLiteBackend for several.
+    """
+
+    def __init__(self, directory=SESSION_DIR, compact_threshold=COMPACT_THRESHOLD_BYTES):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._next_seq = {}
+        self._compacting = set()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, session_id):
+        base = os.path.join(self.directory, session_id)
+        return base + ".json", base + ".journal"
+
+    @staticmethod
+    def _apply(data, record):
+        op = record.get("op")
+        if op == "append":
+            data.setdefault("messages", []).append(record["message"])
+        elif op == "messages":
+            data["messages"] = record["value"]
+        elif op == "set":
+            data[record["field"]] = record["value"]
+        elif op == "turn_text" and data.get("pending_turn"):
+            turn = data["pending_turn"]
+            turn["text"] = turn["text"][:record["offset"]] + record["text"]
+
+    def _replay(self, session_id):
+        """
+        Rebuilds a session from its snapshot plus any newer journal records.
+
+        Returns:
+            tuple: (data dict, last applied sequence number).
+        """
+        snapshot_path, journal_path = self._paths(session_id)
+        data = {}
+        seq = 0
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r") as f:
+                data = json.load(f)
+            seq = data.pop("_seq", 0)
+        if os.path.exists(journal_path):
+            with open(journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue # Torn line from an interrupted write
+                    # Records already folded into the snapshot are skipped, which
+                    # keeps replay correct if we crashed mid-compaction.
+                    if record.get("seq", 0) <= seq:
+                        continue
+                    self._apply(data, record)
+                    seq = record["seq"]
+        return data, seq
+
+    @staticmethod
+    def _truncate_torn_tail(journal_path):
+        """Cuts the journal back to its last complete line so the next append starts on a fresh one."""
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                f.seek(start)
+                newline = f.read(pos - start).rfind(b"\n")
+                if newline != -1:
+                    pos = start + newline + 1
+                    break
+                pos = start
+            if pos < end:
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append(self, session_id, records):
+        """Appends records to the session journal and fsyncs before returning."""
+        _, journal_path = self._paths(session_id)
+        with self._lock:
+            if session_id not in self._next_seq:
+                self._truncate_torn_tail(journal_path)
+                self._next_seq[session_id] = self._replay(session_id)[1] + 1
+            lines = []
+            for record in records:
+                record["seq"] = self._next_seq[session_id]
+                self._next_seq[session_id] += 1
+                lines.append(json.dumps(record) + "\n")
+            with open(journal_path, "a") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            journal_size = os.path.getsize(journal_path)
+        if journal_size > self.compact_threshold:
+            self._start_compaction(session_id)
+
+    def compact(self, session_id):
+        """Folds the journal into the snapshot via an atomic rename, then empties the journal."""
+        snapshot_path, journal_path = self._paths(session_id)
+        with self._lock:
+            if not os.path.exists(journal_path):
+                return
+            data, seq = self._replay(session_id)
+            data["_seq"] = seq
+
+            tmp_path = snapshot_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, snapshot_path)
+            _fsync_dir(snapshot_path)
+
+            # Every journal record is now covered by the snapshot's _seq
+            tmp_path = journal_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, journal_path)
+            _fsync_dir(journal_path)
+
+    def _start_compaction(self, session_id):
+        with self._lock:
+            if session_id in self._compacting:
+                return
+            self._compacting.add(session_id)
+
+        def run():
+            try:
+                self.compact(session_id)
+            except Exception as e:
+                print(f"Error compacting session journal: {e}")
+            finally:
+                with self._lock:
+                    self._compacting.discard(session_id)
+
+        threading.Thread(target=run, name="session-compaction", daemon=True).start()
+
+    def load(self, session_id):
+        with self._lock:
+            data, _ = self._replay(session_id)
+        return data or None
+
+    def load_field(self, session_id, field):
+        with self._lock:
+            data, _ = self._replay(session_id)
+        return data.get(field)
+
+    def append_messages(self, session_id, start_index, messages):
+        self._append(session_id, [{"op": "append", "message": m} for m in messages])
+
+    def replace_messages(self, session_id, messages):
+        self._append(session_id, [{"op": "messages", "value": list(messages)}])
+
+    def set_fields(self, session_id, fields):
+        self._append(session_id, [{"op": "set", "field": k, "value": v} for k, v in fields.items()])
+
+    def set_pending_turn(self, session_id, turn):
+        self.set_fields(session_id, {"pending_turn": turn})
+
+    def append_turn_text(self, session_id, offset, text):
+        self._append(session_id, [{"op": "turn_text", "offset": offset, "text": text}])
+
+    def delete(self, session_id):
+        with self._lock:
+            for path in self._paths(session_id):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._next_seq.pop(session_id, None)
+
+class SQLiteBackend:
+    """
+    Stores sessions in a shared SQLite database in WAL mode.
+
+    Messages and fields are separate rows keyed by session ID, so a save only
+    upserts the rows that changed. Connections are pooled per process and the
+    busy timeout lets several Streamlit workers write concurrently.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS session_fields (
+            session_id TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (session_id, field)
+        );
+        CREATE TABLE IF NOT EXISTS session_messages (
+            session_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            PRIMARY KEY (session_id, idx)
+        );
+        CREATE TABLE IF NOT EXISTS session_turn_text (
+            session_id TEXT NOT NULL,
+            start INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (session_id, start)
+        );
+    """
+
+    def __init__(self, path=SESSION_DB, pool_size=8, busy_timeout=30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    class _Lease:
+        def __init__(self, backend):
+            self.backend = backend
+            self.conn = None
+
+        def __enter__(self):
+            try:
+                self.conn = self.backend._pool.get_nowait()
+            except queue.Empty:
+                self.conn = self.backend._connect()
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            try:
+                self.backend._pool.put_nowait(self.conn)
+            except queue.Full:
+                self.conn.close()
+            return False
+
+    def _connection(self):
+        return self._Lease(self)
+
+    def _write(self, statements):
+        """Runs (sql, params) pairs in one IMMEDIATE transaction."""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params in statements:
+                if isinstance(params, list):
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+            conn.execute("COMMIT")
+
+    def load(self, session_id):
+        with self._connection() as conn:
+            fields = conn.execute(
+                "SELECT field, value FROM session_fields WHERE session_id = ?", (session_id,)
+            ).fetchall()
+            messages = conn.execute(
+                "SELECT message FROM session_messages WHERE session_id = ? ORDER BY idx", (session_id,)
+            ).fetchall()
+            turn_text = conn.execute(
+                "SELECT start, text FROM session_turn_text WHERE session_id = ? ORDER BY start", (session_id,)
+            ).fetchall()
+        if not fields and not messages:
+            return None
+        data = {field: json.loads(value) for field, value in fields}
+        data["messages"] = [json.loads(row[0]) for row in messages]
+        turn = data.get("pending_turn")
+        if turn:
+            for start, text in turn_text:
+                turn["text"] = turn["text"][:start] + text
+        return data
+
+    def load_field(self, session_id, field):
+        """Returns one saved field without loading the messages, or None."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM session_fields WHERE session_id = ? AND field = ?", (session_id, field)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def append_messages(self, session_id, start_index, messages):
+        rows = [(session_id, start_index + i, json.dumps(m)) for i, m in enumerate(messages)]
+        self._write([(
+            "INSERT INTO session_messages (session_id, idx, message) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id, idx) DO UPDATE SET message = excluded.message",
+            rows
+        )])
+
+    def replace_messages(self, session_id, messages):
+        rows = [(session_id, i, json.dumps(m)) for i, m in enumerate(messages)]
+        self._write([
+            ("DELETE FROM session_messages WHERE session_id = ?", (session_id,)),
+            ("INSERT INTO session_messages (session_id, idx, message) VALUES (?, ?, ?)", rows)
+        ])
+
+    def set_fields(self, session_id, fields):
+        now = time.time()
+        rows = [(session_id, field, json.dumps(value), now) for field, value in fields.items()]
+        self._write([(
+            "INSERT INTO session_fields (session_id, field, value, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (session_id, field) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+            rows
+        )])
+
+    def set_pending_turn(self, session_id, turn):
+        """Saves a new reply checkpoint (or None), dropping the text appended to the previous one."""
+        self._write([
+            ("DELETE FROM session_turn_text WHERE session_id = ?", (session_id,)),
+            (
+                "INSERT INTO session_fields (session_id, field, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, field) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (session_id, "pending_turn", json.dumps(turn), time.time())
+            )
+        ])
+
+    def append_turn_text(self, session_id, offset, text):
+        """Adds reply text starting at `offset` characters past the checkpoint's saved text."""
+        self._write([
+            ("DELETE FROM session_turn_text WHERE session_id = ? AND start >= ?", (session_id, offset)),
+            ("INSERT INTO session_turn_text (session_id, start, text) VALUES (?, ?, ?)", (session_id, offset, text))
+        ])
+
+    def delete(self, session_id):
+        self._write([
+            ("DELETE FROM session_fields WHERE session_id = ?", (session_id,)),
+            ("DELETE FROM session_messages WHERE session_id = ?", (session_id,)),
+            ("DELETE FROM session_turn_text WHERE session_id = ?", (session_id,))
+        ])
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Returns the process-wide session backend selected by SESSION_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if SESSION_BACKEND == "journal":
+                _backend = JournalBackend()
+            else:
+                _backend = SQLiteBackend()
+        return _backend
+
+def set_backend(backend):
+    """Replaces the process-wide session backend (e.g. for batch jobs or benchmarks)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+def get_session_id():
+    """
+    Returns the ID of the current browser session.
+
+    The ID lives in the page's query string, so refreshing the page or
+    reconnecting to another worker process resumes the same session.
+    """
+    session_id = st.session_state.get('session_id')
+    if session_id:
+        return session_id
+    try:
+        session_id = st.query_params.get(SESSION_QUERY_PARAM)
+    except Exception:
+        session_id = None
+    if not session_id or not _SESSION_ID_PATTERN.match(session_id):
+        session_id = uuid.uuid4().hex
+        try:
+            st.query_params[SESSION_QUERY_PARAM] = session_id
+        except Exception:
+            pass # Not running inside a Streamlit script
+    st.session_state['session_id'] = session_id
+    return session_id
+
+def _remember_saved_state(messages, fields):
+    """Records what is persisted so the next save only writes the difference."""
+    st.session_state['_persisted_state'] = {
+        "message_count": len(messages),
+        "last_message": _digest(messages[-1]) if messages else None,
+        "fields": fields
+    }
+
+@metrics.timed(_SAVE_SECONDS)
 def save_session():
-    """Saves the current session state to a local JSON file."""
-    try:
-        data = {
-            "messages": st.session_state.get('messages', []),
-            "plan_generated": st.session_state.get('plan_generated', False),
-            "generated_plan_text": st.session_state.get('generated_plan_text', ""),
-            "selected_model": st.session_state.get('selected_model', "models/gemini-1.5-flash")
-        }
-        with open(SESSION_FILE, "w") as f:
-            json.dump(data, f, indent=4)
+    """Persists the turns and fields that changed since the last save for this session."""
+    try:
+        backend = get_backend()
+        session_id = get_session_id()
+        tracked = st.session_state.get('_persisted_state') or {"message_count": 0, "last_message": None, "fields": {}}
+        messages = st.session_state.get('messages', [])
+        count = tracked["message_count"]
+
+        if len(messages) < count or (count and _digest(messages[count - 1]) != tracked["last_message"]):
+            # History was rewritten rather than appended to
+            backend.replace_messages(session_id, messages)
+        elif len(messages) > count:
+            backend.append_messages(session_id, count, messages[count:])
+
+        fields = {}
+        changed = {}
+        for field, default in PERSISTED_FIELDS.items():
+            value = st.session_state.get(field, default)
+            fields[field] = _digest(value)
+            if tracked["fields"].get(field) != fields[field]:
+                changed[field] = value
+        if changed:
+            backend.set_fields(session_id, changed)
+
+        _remember_saved_state(messages, fields)
         # print("Session saved.") # Debug
     except Exception as e:
         print(f"Error saving session: {e}")
 
 def load_session():
-    """Loads session state from the local JSON file if it exists."""
-    if os.path.exists(SESSION_FILE):
-        try:
-            with open(SESSION_FILE, "r") as f:
-                data = json.load(f)
-            
-            # Restore state
-            if "messages" in data:
-                st.session_state['messages'] = data["messages"]
-            if "plan_generated" in data:
-                st.session_state['plan_generated'] = data["plan_generated"]
-            if "generated_plan_text" in data:
-                st.session_state['generated_plan_text'] = data["generated_plan_text"]
-            if "selected_model" in data:
-                st.session_state['selected_model'] = data["selected_model"]
-                
-            # print("Session loaded.") # Debug
-            return True
-        except Exception as e:
-            print(f"Error loading session: {e}")
+    """Loads this session's state from the backend if it has been saved before."""
+    try:
+        data = get_backend().load(get_session_id())
+        if not data:
             return False
-    return False
+
+        # Restore state
+        if "messages" in data:
+            st.session_state['messages'] = data["messages"]
+        for field in PERSISTED_FIELDS:
+            if field in data:
+                st.session_state[field] = data[field]
+        st.session_state['pending_turn'] = data.get("pending_turn")
+
+        fields = {field: _digest(st.session_state.get(field, default)) for field, default in PERSISTED_FIELDS.items()}
+        _remember_saved_state(st.session_state.get('messages', []), fields)
+        if data.get(PLAN_TEXT_FIELD) and not data.get("plan_asset_id"):
+            # Saved before plans moved to the asset store; the next save records the asset ID
+            set_plan_text(data[PLAN_TEXT_FIELD])
+        # print("Session loaded.") # Debug
+        return True
+    except Exception as e:
+        print(f"Error loading session: {e}")
+        return False
 
 def clear_session():
-    """Clears the local session file and resets state variables."""
-    if os.path.exists(SESSION_FILE):
-        try:
-            os.remove(SESSION_FILE)
-        except Exception as e:
-            print(f"Error deleting session file: {e}")
-    
+    """Deletes this session's saved state and resets state variables."""
+    try:
+        get_backend().delete(get_session_id())
+    except Exception as e:
+        print(f"Error deleting session: {e}")
+
     # Reset in-memory state (partially, app rerun usually handles the rest or re-init)
     st.session_state['messages'] = []
     st.session_state['plan_generated'] = False
-    st.session_state['generated_plan_text'] = ""
+    st.session_state['plan_asset_id'] = None
+    st.session_state['plan_edits'] = {}
+    st.session_state['pending_turn'] = None
+    asset_store.get_store().release_session(get_session_id())
+    st.session_state.pop('context_summary', None)
+    st.session_state.pop('context_report', None)
+    st.session_state.pop('_persisted_state', None)
+    st.session_state.pop('_plan_index', None)
+    st.session_state.pop('_plan_headings', None)
     # We might keep selected_model or reset it, user choice. Keeping it is usually better.
+
+def _generated_plan_text():
+    """
+    The plan as generated, before review edits, read from the asset store when it is not resident.
+
+    If the store has evicted the blob, the text is read back from the session
+    backend and stored again (under the same content-addressed ID).
+    """
+    asset_id = st.session_state.get('plan_asset_id')
+    if not asset_id:
+        return ""
+    store = asset_store.get_store()
+    plan_text = store.load_text(asset_id, get_session_id())
+    if plan_text is None:
+        try:
+            plan_text = get_backend().load_field(get_session_id(), PLAN_TEXT_FIELD)
+        except Exception as e:
+            print(f"Error loading plan text: {e}")
+        if plan_text:
+            store.put_text(plan_text, get_session_id())
+    return plan_text or ""
+
+def get_plan_text():
+    """
+    Returns this session's plan text with its review edits applied.
+
+    The edited text is built only when asked for (export, visuals) and is not
+    stored: only the generated plan and the section diffs are kept, so edits
+    never add plan-sized blobs to the asset store.
+    """
+    edits = st.session_state.get('plan_edits')
+    if not edits:
+        return _generated_plan_text()
+    return plan_review.materialise(_generated_plan_text(), get_plan_index(), edits)
+
+def set_plan_text(plan_text):
+    """
+    Stores a newly generated plan and drops earlier edits.
+
+    The text is saved once in the session backend, which keeps it durable,
+    and in the asset store, whose copy is the one read; session state keeps
+    only its asset ID.
+    """
+    try:
+        get_backend().set_fields(get_session_id(), {PLAN_TEXT_FIELD: plan_text or None})
+    except Exception as e:
+        print(f"Error saving plan text: {e}")
+    st.session_state['plan_asset_id'] = asset_store.get_store().put_text(plan_text, get_session_id()) if plan_text else None
+    st.session_state['plan_edits'] = {}
+
+def get_plan_revision():
+    """A value that changes whenever the plan or any of its edits does, for caching derived views."""
+    return (st.session_state.get('plan_asset_id'), _digest(st.session_state.get('plan_edits') or {}))
+
+def get_plan_index():
+    """
+    Returns the plan's review units (plan_review.index_plan), indexed once per generated plan.
+
+    Returns:
+        tuple: plan_review.ReviewUnit tuples in document order.
+    """
+    asset_id = st.session_state.get('plan_asset_id')
+    cached = st.session_state.get('_plan_index')
+    if cached and cached[0] == asset_id:
+        return cached[1]
+    units = plan_review.index_plan(_generated_plan_text())
+    st.session_state['_plan_index'] = (asset_id, units)
+    return units
+
+def get_plan_headings():
+    """
+    Returns the plan's '# ' heading titles with edits applied (plan_review.headings), for image placement.
+
+    Cached per plan revision; an edit re-reads only the edited sections, never the whole plan.
+    """
+    revision = get_plan_revision()
+    cached = st.session_state.get('_plan_headings')
+    if cached and cached[0] == revision:
+        return cached[1]
+    titles = plan_review.headings(_generated_plan_text(), get_plan_index(), st.session_state.get('plan_edits') or {})
+    st.session_state['_plan_headings'] = (revision, titles)
+    return titles
+
+def is_section_edited(number):
+    """True if review unit `number` has a saved edit."""
+    return str(number) in (st.session_state.get('plan_edits') or {})
+
+def get_section_text(number):
+    """Returns the current text of review unit `number`, edit included."""
+    return plan_review.unit_text(_generated_plan_text(), get_plan_index(), st.session_state.get('plan_edits') or {}, number)
+
+def set_section_text(number, text):
+    """
+    Saves an edit to review unit `number` as a diff against the generated text.
+
+    Only the diffs are persisted, so a save costs the size of the edits, not
+    of the plan. Setting the generated text back drops the unit's edit.
+    """
+    unit = get_plan_index()[number]
+    generated = _generated_plan_text()[unit.start:unit.end]
+    if generated.endswith("\n") and not text.endswith("\n"):
+        text += "\n" # Keeps the next heading at the start of its line
+    diff = plan_review.diff_text(generated, text)
+    edits = dict(st.session_state.get('plan_edits') or {})
+    if diff:
+        edits[str(number)] = diff
+    else:
+        edits.pop(str(number), None)
+    st.session_state['plan_edits'] = edits
+    save_session()
+
+def revert_section(number):
+    """Drops the edit to review unit `number`, restoring its generated text."""
+    unit = get_plan_index()[number]
+    set_section_text(number, _generated_plan_text()[unit.start:unit.end])
+
+def checkpoint_turn(text, model_name=None):
+    """
+    Persists the assistant reply streamed so far for the latest user message.
+
+    If the stream fails or the page is reloaded, get_pending_turn() returns it
+    so the reply can be resumed instead of regenerated. Only the text added
+    since the previous checkpoint of the same reply is written.
+    """
+    after = len(st.session_state.get('messages', []))
+    turn = st.session_state.get('pending_turn')
+    try:
+        if turn and turn["after"] == after and turn["model"] == model_name and text.startswith(turn["text"]):
+            if len(text) > len(turn["text"]):
+                get_backend().append_turn_text(get_session_id(), len(turn["text"]), text[len(turn["text"]):])
+        else:
+            save_session()
+            get_backend().set_pending_turn(get_session_id(), {"after": after, "model": model_name, "text": text})
+    except Exception as e:
+        print(f"Error saving reply checkpoint: {e}")
+    st.session_state['pending_turn'] = {"after": after, "model": model_name, "text": text}
+
+def get_pending_turn():
+    """
+    Returns the checkpointed reply to the latest message, or None.
+
+    Returns:
+        dict: after (message count it follows), model and text.
+    """
+    turn = st.session_state.get('pending_turn')
+    if turn and turn.get("after") == len(st.session_state.get('messages', [])):
+        return turn
+    return None
+
+def finish_turn(text):
+    """Records the assistant's reply as a message and drops its checkpoint."""
+    st.session_state.messages.append({"role": "assistant", "content": text})
+    save_session()
+    if st.session_state.get('pending_turn'):
+        st.session_state['pending_turn'] = None
+        try:
+            get_backend().set_pending_turn(get_session_id(), None)
+        except Exception as e:
+            print(f"Error saving reply checkpoint: {e}")
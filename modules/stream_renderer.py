@@ -0,0 +1,119 @@
+import time
+from modules import context_builder, metrics
+
+# Flush budget: whichever is reached first after the first chunk
+FLUSH_INTERVAL = 0.1 # seconds
+FLUSH_BYTES = 2048
+# Once the open tail grows past this, completed blocks are frozen into their own element
+FREEZE_BYTES = 8192
+CURSOR = "▌"
+
+_TTFT_SECONDS = metrics.histogram(
+    "grant_architect_chat_ttft_seconds", "Time from sending a chat turn (queueing included) to its first streamed chunk"
+)
+_TOKENS_PER_SECOND = metrics.histogram(
+    "grant_architect_chat_tokens_per_second", "Estimated tokens per second streamed after the first chunk",
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800)
+)
+
+def _split_point(text):
+    """
+    Returns the index just after the last blank line outside a code fence, or -1.
+
+    Markdown blocks separated by a blank line render the same on their own, so
+    everything before that point can be frozen into a finished element.
+    """
+    split = text.rfind("\n\n")
+    while split > 0:
+        head = text[:split]
+        fences = sum(1 for line in head.split("\n") if line.lstrip().startswith("```"))
+        if fences % 2 == 0:
+            return split + 2
+        split = text.rfind("\n\n", 0, split)
+    return -1
+
+class StreamRenderer:
+    """
+    Renders a streamed markdown reply into a Streamlit placeholder on a time/size budget.
+
+    Chunks are buffered and the placeholder is refreshed at most every
+    `interval` seconds unless `flush_bytes` of new text have accumulated. The
+    first chunk is shown immediately, so time-to-first-token is unchanged. Long
+    replies are split at block boundaries: completed blocks are frozen into
+    their own markdown element, so each refresh only re-sends the open tail
+    instead of the whole growing reply.
+
+    Given `started` (the clock time the request was sent), it records
+    time-to-first-token and the streaming rate in the chat metrics.
+    """
+
+    def __init__(self, placeholder, interval=FLUSH_INTERVAL, flush_bytes=FLUSH_BYTES,
+                 freeze_bytes=FREEZE_BYTES, cursor=CURSOR, clock=time.monotonic, started=None):
+        self.interval = interval
+        self.flush_bytes = flush_bytes
+        self.freeze_bytes = freeze_bytes
+        self.cursor = cursor
+        self.clock = clock
+        self._container = placeholder.container()
+        self._tail = self._container.empty()
+        self._frozen = [] # Text already rendered in finished elements
+        self._parts = [] # Open tail, not yet frozen
+        self._tail_len = 0
+        self._pending = 0
+        self._last_flush = None
+        self._started = started
+        self._first_chunk_at = None
+        self.flushes = 0
+        self.bytes_rendered = 0
+
+    @property
+    def text(self):
+        """The full reply received so far."""
+        return "".join(self._frozen) + "".join(self._parts)
+
+    def write(self, chunk):
+        """Appends a chunk and refreshes the placeholder if the budget allows."""
+        if not chunk:
+            return
+        if self._first_chunk_at is None:
+            self._first_chunk_at = self.clock()
+            if self._started is not None:
+                _TTFT_SECONDS.observe(self._first_chunk_at - self._started)
+        self._parts.append(chunk)
+        self._tail_len += len(chunk)
+        self._pending += len(chunk)
+        if (self._last_flush is None
+                or self._pending >= self.flush_bytes
+                or self.clock() - self._last_flush >= self.interval):
+            self.flush()
+
+    def _render(self, element, body):
+        element.markdown(body)
+        self.flushes += 1
+        self.bytes_rendered += len(body.encode("utf-8"))
+
+    def flush(self, final=False):
+        """Renders buffered text now. The cursor is omitted on the final flush."""
+        tail = "".join(self._parts)
+        if self._tail_len > self.freeze_bytes:
+            split = _split_point(tail)
+            if split > 0:
+                self._render(self._tail, tail[:split])
+                self._frozen.append(tail[:split])
+                tail = tail[split:]
+                self._tail = self._container.empty()
+        self._parts = [tail]
+        self._tail_len = len(tail)
+        self._render(self._tail, tail if final else tail + self.cursor)
+        self._pending = 0
+        self._last_flush = self.clock()
+
+    def finish(self):
+        """Renders the complete reply without the cursor and returns its text."""
+        self.flush(final=True)
+        text = self.text
+        if self._started is not None and self._first_chunk_at is not None:
+            elapsed = self.clock() - self._first_chunk_at
+            if elapsed > 0:
+                _TOKENS_PER_SECOND.observe(context_builder.count_tokens(text) / elapsed)
+        return text
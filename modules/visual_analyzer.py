@@ -0,0 +1,195 @@
+import math
+import string
+from collections import Counter, namedtuple
+from modules import plan_parser
+
+# Images per plan, cover included
+MAX_VISUALS = 10
+# Sections shorter than this are not worth an illustration
+MIN_SECTION_WORDS = 20
+# Keywords quoted in each image prompt
+PROMPT_KEYWORDS = 3
+# Key the cover image is stored under (matched to the cover page by image_matcher)
+COVER_SECTION = "The Cover Page"
+
+STOPWORDS = frozenset("""
+    about above after again against also among and any are around because been before being below between both but
+    can could did does doing down during each either every few for from further had has have having here how into
+    its itself just like more most much must need new not now off once only other our ours out over own per same
+    should since some such than that the their them then there these they this those through too under until upon
+    very was were what when where which while who whom why will with within without would year years you your
+    business plan section include including provide provides based well also first second third within page
+""".split())
+
+# Words that describe something a picture can show, with how strongly they do
+VISUAL_TERMS = {
+    "product": 1.0, "prototype": 1.0, "design": 0.8, "packaging": 0.9, "device": 0.9, "app": 0.7, "platform": 0.6,
+    "customer": 0.7, "community": 0.7, "people": 0.6, "team": 0.8, "staff": 0.7, "founder": 0.7,
+    "location": 0.9, "site": 0.8, "office": 0.9, "store": 0.9, "shop": 0.9, "premise": 0.9, "facility": 0.9,
+    "farm": 1.0, "orchard": 1.0, "factory": 1.0, "warehouse": 0.9, "kitchen": 0.9, "studio": 0.9,
+    "equipment": 0.9, "machinery": 0.9, "vehicle": 0.8, "fleet": 0.8, "technology": 0.6, "workshop": 0.8,
+    "growth": 0.6, "revenue": 0.5, "chart": 0.8, "timeline": 0.7, "milestone": 0.7, "roadmap": 0.7,
+    "map": 0.8, "region": 0.5, "supply": 0.5, "logistics": 0.6, "delivery": 0.6, "event": 0.7, "brand": 0.7,
+}
+
+# Prior visual value of a section by words in its title; the body's visual terms add to it
+SECTION_PRIORS = {
+    "product": 1.0, "service": 0.6, "market": 0.8, "marketing": 0.7, "sale": 0.5, "operational": 0.8,
+    "operation": 0.8, "location": 0.8, "team": 0.7, "management": 0.6, "organization": 0.5, "financial": 0.7,
+    "projection": 0.6, "implementation": 0.5, "company": 0.5, "executive": 0.4, "introduction": 0.1,
+    "funding": 0.1, "request": 0.0, "appendix": -1.0, "cover": -1.0,
+}
+
+# What to depict, chosen by the first matching word in the section title
+SUBJECTS = (
+    (("financial", "projection", "funding", "revenue", "budget"), "a clean chart of growth and key financial milestones"),
+    (("market", "marketing", "sale", "customer"), "customers engaging with the business in its target market"),
+    (("product", "service"), "the product or service in real-world use"),
+    (("team", "management", "organization", "staff"), "the leadership team working together"),
+    (("operational", "operation", "location", "facility"), "day-to-day operations at the business premises"),
+    (("implementation", "timeline", "milestone", "roadmap"), "a project roadmap with clear milestones"),
+    (("executive", "summary", "company", "introduction"), "the business at its best, conveying its mission"),
+)
+
+# Prompt template per Design Studio visual style
+STYLE_TEMPLATES = {
+    "Photorealistic": (
+        "Photorealistic photograph of {subject} for the '{section}' section of a business plan about {keywords}. "
+        "Natural lighting, professional composition, no text."
+    ),
+    "3D Rendered Isometric": (
+        "Isometric 3D render of {subject} for the '{section}' section of a business plan about {keywords}. "
+        "Soft shadows, clean pastel palette, no text."
+    ),
+    "Abstract Line Art": (
+        "Minimal abstract line art of {subject} for the '{section}' section of a business plan about {keywords}. "
+        "Single-weight strokes on a white background, no text."
+    ),
+}
+DEFAULT_TEMPLATE = "{style} illustration of {subject} for the '{section}' section of a business plan about {keywords}."
+COVER_TEMPLATE = "Professional business plan cover image for a business about {keywords}, {style}, no text."
+
+SectionScore = namedtuple("SectionScore", ["title", "score", "keywords", "words"])
+
+# Everything but letters is a word break
+_WORD_BREAKS = str.maketrans({char: " " for char in string.punctuation + string.digits + "‘’“”–—•…·"})
+
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def _terms(text):
+    """Counts content words (lower-cased, stopwords dropped, plurals folded)."""
+    counts = Counter()
+    for token, count in Counter(text.lower().translate(_WORD_BREAKS).split()).items(): # Stem each distinct word once
+        if len(token) >= 3 and token not in STOPWORDS:
+            counts[_stem(token)] += count
+    return counts
+
+def _section_terms(plan_text):
+    """
+    (title, term counts) for every top-level section, from the shared plan parse.
+
+    Counts the section's source text directly: markdown markers are not
+    letters, so they never become terms.
+    """
+    plan = plan_parser.parse_plan(plan_text)
+    return [(section.title, _terms(plan_text[section.start:section.end])) for section in plan.sections]
+
+def _rank(sections):
+    if not sections:
+        return []
+    document_frequency = Counter()
+    for _, counts in sections:
+        document_frequency.update(counts.keys())
+    total = len(sections)
+    idf = {term: math.log((total + 1) / (df + 1)) + 1 for term, df in document_frequency.items()}
+
+    scores = []
+    for title, counts in sections:
+        words = sum(counts.values())
+        weights = {term: count / words * idf[term] for term, count in counts.items()} if words else {}
+        visual = sum(weights.get(term, 0.0) * strength for term, strength in VISUAL_TERMS.items())
+        prior = max((SECTION_PRIORS.get(token, 0.0) for token in _terms(title)), default=0.0, key=abs)
+        keywords = [term for term, _ in sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:PROMPT_KEYWORDS]]
+        scores.append(SectionScore(title, prior + min(1.0, visual * 10), keywords, words))
+    return scores
+
+def rank_sections(plan_text):
+    """
+    Scores every top-level section of the plan for visual value.
+
+    Each section's body is reduced to term counts and weighted by TF-IDF
+    across sections, so terms every section repeats (the business name,
+    'grant') count for little. The score is the section title's prior plus
+    the TF-IDF mass of depictable terms (products, premises, people, charts)
+    in the body; the section's top TF-IDF terms become its prompt keywords.
+
+    Args:
+        plan_text (str): The full plan markdown.
+
+    Returns:
+        list: SectionScore(title, score, keywords, words) per top-level section, in document order.
+    """
+    return _rank(_section_terms(plan_text))
+
+def _subject(title):
+    tokens = set(_terms(title))
+    for words, subject in SUBJECTS:
+        if tokens.intersection(words):
+            return subject
+    return f"a scene illustrating {title.lower()}"
+
+def section_prompt(section_score, visual_style):
+    """Builds the image prompt for a ranked section from the visual style's template."""
+    template = STYLE_TEMPLATES.get(visual_style, DEFAULT_TEMPLATE)
+    return template.format(
+        subject=_subject(section_score.title),
+        section=section_score.title,
+        keywords=", ".join(section_score.keywords) or section_score.title.lower(),
+        style=visual_style
+    )
+
+def analyze_plan(plan_text, visual_style, max_visuals=MAX_VISUALS):
+    """
+    Chooses which sections get images and writes their prompts, without calling a model.
+
+    Reads the whole plan (not an excerpt): the cover plus the best-scoring
+    sections, up to `max_visuals` in total, in document order. Section names
+    are the plan's own headings, so the exporter places each image exactly.
+
+    Args:
+        plan_text (str): The full plan markdown.
+        visual_style (str): The user-selected visual style.
+        max_visuals (int): Images to plan, cover included.
+
+    Returns:
+        list: Visual plan entries as {"section", "prompt", "keywords"} dicts.
+    """
+    sections = _section_terms(plan_text)
+    ranked = _rank(sections)
+
+    # The cover shows what the plan as a whole talks about most
+    plan_terms = Counter()
+    for _, counts in sections:
+        plan_terms.update(counts)
+    cover_keywords = [term for term, _ in plan_terms.most_common(5)]
+    items = [{
+        "section": COVER_SECTION,
+        "prompt": COVER_TEMPLATE.format(keywords=", ".join(cover_keywords) or "a new venture", style=visual_style),
+        "keywords": cover_keywords
+    }]
+
+    candidates = [s for s in ranked if s.words >= MIN_SECTION_WORDS and s.score > 0]
+    chosen = set(sorted(range(len(candidates)), key=lambda i: -candidates[i].score)[:max(0, max_visuals - 1)])
+    for index, section_score in enumerate(candidates):
+        if index in chosen:
+            items.append({
+                "section": section_score.title,
+                "prompt": section_prompt(section_score, visual_style),
+                "keywords": section_score.keywords
+            })
+    return items